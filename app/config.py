@@ -17,6 +17,64 @@ class Settings(BaseSettings):
     MANUAL_LOG_DISTANCE: float = Field(default=100.0)  # meters
     LOG_COOLDOWN: int = Field(default=300)  # seconds (5 minutes)
     CLAIM_DECAY_RATE: float = Field(default=0.01)  # per hour
+    SERVER_AUTO_LOG: bool = Field(default=True)  # Auto-log via server-side geofencing of WS position updates
+    
+    # WebSocket fan-out across workers: "memory", "postgres" or "redis"
+    WS_BROKER: str = Field(default="memory")
+    WS_BROKER_URL: str = Field(default="")  # e.g. redis://localhost:6379/0 or unix:///run/redis.sock
+    
+    # Log cooldown table: "memory" (single worker) or "redis" (shared between workers)
+    COOLDOWN_STORE: str = Field(default="memory")
+    COOLDOWN_STORE_URL: str = Field(default="")  # Defaults to WS_BROKER_URL
+    
+    # Content-addressed photo storage (log photos are files keyed by SHA-256)
+    PHOTO_STORAGE_DIR: str = Field(default="data/photos")
+    IMAGE_WORKERS: int = Field(default=2)  # Processes rendering photo thumbnails (0 = render on demand in a thread)
+    
+    # Radius queries: "auto" (PostGIS on PostgreSQL), "postgis" or "memory" (NumPy spot index, always used on SQLite)
+    GEO_BACKEND: str = Field(default="auto")
+    
+    # Ephemeral loot: optional write-behind snapshot of active drops (empty = memory only)
+    LOOT_PERSIST_PATH: str = Field(default="")  # e.g. data/loot.json
+    LOOT_PERSIST_INTERVAL: float = Field(default=5.0)  # seconds between snapshots
+    LOOT_SPAWN_INTERVAL: float = Field(default=120.0)  # Seconds between spawn attempts per connected player
+    LOOT_SPAWN_TICK: float = Field(default=10.0)  # Seconds between spawner runs
+    
+    # Background sweeps (expired loot/buffs, claim decay, old metrics, stale tracks, unclaimed uploads); intervals in seconds
+    SCHEDULER_ENABLED: bool = Field(default=True)
+    SCHEDULER_BATCH_SIZE: int = Field(default=1000)  # Rows per DELETE/UPDATE statement
+    SCHEDULER_MAX_BATCHES: int = Field(default=50)  # Statements per job run
+    LOOT_SWEEP_INTERVAL: float = Field(default=30.0)
+    BUFF_SWEEP_INTERVAL: float = Field(default=300.0)
+    CLAIM_DECAY_INTERVAL: float = Field(default=3600.0)
+    METRICS_SWEEP_INTERVAL: float = Field(default=3600.0)
+    METRICS_RETENTION_DAYS: int = Field(default=30)
+    TRACK_SWEEP_INTERVAL: float = Field(default=900.0)
+    TRACK_STALE_MINUTES: int = Field(default=360)  # Active tracks without points for this long are ended
+    UPLOAD_SWEEP_INTERVAL: float = Field(default=600.0)  # Photo uploads never referenced by a log
+    
+    # Authenticated user principals cached per worker (see services/user_cache.py)
+    USER_CACHE_SIZE: int = Field(default=10000)  # Max cached users (LRU)
+    USER_CACHE_TTL: float = Field(default=60.0)  # Seconds before a cached user is reloaded
+    BUFF_CACHE_TTL: float = Field(default=30.0)  # Seconds before cached buff modifiers are re-checked (other workers)
+    
+    # Async engine (asyncpg/aiosqlite) for WebSocket RPCs, server auto-logs and the socket handshake;
+    # falls back to the threadpool if the driver is not installed
+    ASYNC_DB: bool = Field(default=True)
+    
+    # Threads hashing/verifying passwords with bcrypt (concurrent logins beyond this queue up)
+    AUTH_HASH_WORKERS: int = Field(default=2)
+    
+    # Per-request SQL statistics (Server-Timing header, /api/admin/queries)
+    QUERY_MONITOR_ENABLED: bool = Field(default=True)
+    N_PLUS_ONE_THRESHOLD: int = Field(default=5)  # Same statement this often in one request is reported
+    
+    # GET /metrics (Prometheus text format); if set, scrapers must send "Authorization: Bearer <token>"
+    METRICS_TOKEN: str = Field(default="")
+
+    # Sampling profiler (POST /api/admin/profile, X-Profile header on admin requests)
+    PROFILER_MAX_SECONDS: float = Field(default=60.0)  # Longest profile an admin can request
+    PROFILER_INTERVAL_MS: float = Field(default=10.0)  # Default time between stack samples
     
     # Testing/Development Settings
     TESTING: bool = Field(default=False)  # Set to True to disable spatial features for testing
@@ -1,7 +1,11 @@
 from sqlalchemy import create_engine, pool, event
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
+from contextlib import asynccontextmanager, contextmanager
+from typing import Any, Callable, Optional
+from starlette.concurrency import run_in_threadpool
 from app.config import settings
+import importlib.util
 import logging
 
 logger = logging.getLogger(__name__)
@@ -77,3 +81,151 @@ def get_db():
         yield db
     finally:
         db.close()
+
+
+@contextmanager
+def session_scope():
+    """Short-lived session for work outside a request (WebSocket messages, background jobs).
+
+    Commits on success, rolls back on error and always returns the connection to the pool.
+    """
+    db = SessionLocal()
+    try:
+        yield db
+        db.commit()
+    except Exception:
+        db.rollback()
+        raise
+    finally:
+        db.close()
+
+
+# --- Async engine (real-time paths) ---------------------------------------
+#
+# WebSocket RPCs, server auto-logs and the socket handshake run their database
+# work on an async engine (asyncpg / aiosqlite) when ASYNC_DB is set and the
+# driver is installed, so they await I/O on the event loop instead of occupying
+# a threadpool thread each. Services stay synchronous: run_db() executes them
+# through AsyncSession.run_sync, which drives the same ORM code over the async
+# connection. Without the driver (or on an in-memory SQLite database, which a
+# second engine could not see) run_db() falls back to session_scope() in the
+# threadpool. Scripts and HTTP routes keep using the sync engine.
+
+ASYNC_DRIVERS = {"postgresql": "asyncpg", "sqlite": "aiosqlite"}
+
+_async_engine = None
+_async_session_factory = None
+_async_checked = False
+
+
+def async_database_url(db_url: str) -> Optional[str]:
+    """DATABASE_URL rewritten for its async driver (None if there is no async equivalent)"""
+    scheme, sep, rest = db_url.partition("://")
+    backend = scheme.split("+", 1)[0]
+    driver = ASYNC_DRIVERS.get(backend)
+    if not sep or driver is None:
+        return None
+    if backend == "sqlite" and (rest in ("", "/", "/:memory:") or "mode=memory" in rest):
+        return None  # A second engine would open a different, empty database
+    return f"{backend}+{driver}://{rest}"
+
+
+def create_async_db_engine():
+    """Async engine for DATABASE_URL, or None if disabled or the driver is missing"""
+    from sqlalchemy.ext.asyncio import create_async_engine
+
+    if not settings.ASYNC_DB:
+        return None
+    url = async_database_url(settings.DATABASE_URL)
+    if url is None:
+        logger.info("No async engine for this DATABASE_URL; real-time paths use the threadpool")
+        return None
+    driver = url.split("://", 1)[0].split("+", 1)[1]
+    if importlib.util.find_spec(driver) is None:
+        logger.warning(f"ASYNC_DB is set but {driver} is not installed; real-time paths use the threadpool")
+        return None
+
+    if url.startswith("sqlite"):
+        logger.info("Configuring async SQLite database engine")
+        return create_async_engine(url)
+    logger.info("Configuring async PostgreSQL database engine")
+    return create_async_engine(
+        url,
+        pool_size=10,
+        max_overflow=20,
+        pool_pre_ping=True,
+        pool_recycle=3600,
+        connect_args={"timeout": 10},
+    )
+
+
+def get_async_session_factory():
+    """async_sessionmaker bound to the async engine (created on first use), or None"""
+    global _async_engine, _async_session_factory, _async_checked
+    if not _async_checked:
+        from sqlalchemy.ext.asyncio import async_sessionmaker
+
+        _async_checked = True
+        _async_engine = create_async_db_engine()
+        if _async_engine is not None:
+            # Objects stay readable after commit (no implicit lazy loads outside a greenlet)
+            _async_session_factory = async_sessionmaker(_async_engine, autoflush=False, expire_on_commit=False)
+    return _async_session_factory
+
+
+async def get_async_db():
+    """Dependency for an AsyncSession (503 if no async engine is configured)"""
+    factory = get_async_session_factory()
+    if factory is None:
+        from fastapi import HTTPException
+        raise HTTPException(status_code=503, detail="Async database engine not available")
+    async with factory() as db:
+        yield db
+
+
+@asynccontextmanager
+async def async_session_scope():
+    """session_scope() for the async engine (requires get_async_session_factory())"""
+    async with get_async_session_factory()() as db:
+        try:
+            yield db
+            await db.commit()
+        except Exception:
+            await db.rollback()
+            raise
+
+
+async def run_db(fn: Callable[..., Any], *args, blocking: bool = False) -> Any:
+    """Run fn(db, *args) in its own transaction without blocking the event loop.
+
+    AsyncSession.run_sync executes fn on the event loop thread; only its
+    database calls are awaited. Callbacks that also do blocking non-database
+    work (photo files, Redis cooldowns) or noticeable CPU work (bulk loads)
+    pass blocking=True and run on the sync engine in the threadpool instead.
+    """
+    if blocking or get_async_session_factory() is None:
+        return await run_in_threadpool(_run_sync, fn, *args)
+    async with async_session_scope() as db:
+        return await db.run_sync(fn, *args)
+
+
+def _run_sync(fn: Callable[..., Any], *args) -> Any:
+    with session_scope() as db:
+        return fn(db, *args)
+
+
+async def dispose_async_engine():
+    global _async_engine, _async_session_factory, _async_checked
+    if _async_engine is not None:
+        await _async_engine.dispose()
+    _async_engine = None
+    _async_session_factory = None
+    _async_checked = False
+
+
+def seconds_between(later, earlier):
+    """SQL expression for the seconds between two DateTime expressions (PostgreSQL or SQLite)"""
+    from sqlalchemy import func
+    if settings.DATABASE_URL.startswith("sqlite"):
+        return (func.julianday(later) - func.julianday(earlier)) * 86400.0
+    return func.extract("epoch", later - earlier)
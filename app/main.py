@@ -3,6 +3,7 @@ from fastapi import Body
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.responses import HTMLResponse, Response, JSONResponse, FileResponse
 from sqlalchemy.orm import Session
+from starlette.concurrency import run_in_threadpool
 from contextlib import asynccontextmanager
 import os
 import re
@@ -11,19 +12,22 @@ from datetime import datetime
 from zoneinfo import ZoneInfo
 import logging
 import shutil
+import time
 
 from app.database import get_db
 from app.routers import auth, spots, logs, claims, tracks, items, loot, admin, changelog, server_logs, settings as settings_router, energy
 from app.ws.handlers import websocket_endpoint
+from app.ws.connection_manager import manager as ws_manager
+from app.ws import events as ws_events
 from app.config import settings
+from app.services import metrics, profiler, query_monitor
 
 # Setup logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
-# Track server start time and connection count for diagnostics
+# Track server start time for diagnostics
 server_start_time = datetime.now()
-active_connections = 0
 
 BERLIN = ZoneInfo("Europe/Berlin")
 
@@ -43,10 +47,64 @@ async def lifespan(app: FastAPI):
     except Exception as e:
         print(f"Database initialization error: {e}")
     
+    # Per-request SQL statistics (cursor events on all engines)
+    if settings.QUERY_MONITOR_ENABLED:
+        query_monitor.install()
+    metrics.register_runtime_gauges()
+    
+    # Warm the log cooldown table from the last LOG_COOLDOWN seconds of logs
+    from app.services import cooldown_store
+    try:
+        print(f"Cooldown table warmed with {cooldown_store.warm_from_database()} recent logs")
+    except Exception as e:
+        print(f"Cooldown table warm-up failed (falls back to per-user warm-up): {e}")
+    
+    # Warm the buff modifier cache (users without an entry have no buffs)
+    from app.database import session_scope
+    from app.services import buff_service
+    try:
+        with session_scope() as db:
+            print(f"Buff modifier cache warmed with {buff_service.warm_modifier_cache(db)} buffed users")
+    except Exception as e:
+        print(f"Buff modifier cache warm-up failed (falls back to per-user lookups): {e}")
+    
+    # Load the item catalog (loot rolls and item use read it from memory)
+    from app.services import item_catalog
+    try:
+        with session_scope() as db:
+            print(f"Item catalog loaded with {len(item_catalog.load(db).items)} items")
+    except Exception as e:
+        print(f"Item catalog warm-up failed (loaded on first use): {e}")
+    
+    # Start cross-worker WebSocket fan-out
+    await ws_manager.start()
+    
+    # Push cooldown/stats/deploy events (replaces client polling)
+    ws_events.start(version=_deployed_signature())
+    
+    # Restore active loot drops and start their write-behind snapshot (LOOT_PERSIST_PATH)
+    from app.models import get_cet_now
+    from app.services import loot_store
+    loot_store.start(get_cet_now())
+    
+    # Periodic sweeps (expired loot/buffs, claim decay, old metrics, stale tracks)
+    from app.services import scheduler
+    scheduler.start()
+    
     yield
     
     # Shutdown
     print("Shutting down Claim GPS Game...")
+    await scheduler.stop()
+    await loot_store.stop()
+    await ws_events.stop()
+    await ws_manager.stop()
+    from app.services import photo_variants
+    photo_variants.shutdown()
+    from app.services import auth_service
+    auth_service.shutdown_hash_executor()
+    from app.database import dispose_async_engine
+    await dispose_async_engine()
 
 
 app = FastAPI(
@@ -84,6 +142,63 @@ async def reverse_proxy_middleware(request: Request, call_next):
     return response
 
 
+# Request count and latency per route template (/metrics)
+@app.middleware("http")
+async def metrics_middleware(request: Request, call_next):
+    started = time.perf_counter()
+    status_code = 500
+    try:
+        response = await call_next(request)
+        status_code = response.status_code
+        return response
+    finally:
+        route = request.scope.get("route")
+        path = getattr(route, "path", None) if route is not None else None
+        # Unmatched paths share one label so scanners cannot blow up the series count
+        label = path or "unmatched"
+        metrics.http_latency.observe(time.perf_counter() - started, request.method, label)
+        metrics.http_requests.inc(request.method, label, str(status_code))
+
+
+# Per-request query count / DB time (Server-Timing) and the N+1 report
+@app.middleware("http")
+async def query_monitor_middleware(request: Request, call_next):
+    if not settings.QUERY_MONITOR_ENABLED:
+        return await call_next(request)
+    
+    queries = query_monitor.begin_request()
+    started = time.perf_counter()
+    response = await call_next(request)
+    total_ms = (time.perf_counter() - started) * 1000
+    
+    response.headers["Server-Timing"] = f"{queries.server_timing()}, app;dur={total_ms:.1f}"
+    route = request.scope.get("route")
+    if route is not None and queries.count:
+        query_monitor.report.add(f"{request.method} {getattr(route, 'path', '?')}", queries)
+    return response
+
+
+# Per-request sampling profile for admins: send "X-Profile: 1", fetch the result from
+# GET /api/admin/profiles/{X-Profile-Id}
+@app.middleware("http")
+async def profile_middleware(request: Request, call_next):
+    if "x-profile" not in request.headers or not await admin.is_admin_token(request.headers.get("authorization")):
+        return await call_next(request)
+    
+    try:
+        sampler = profiler.start(f"{request.method} {request.url.path}", profiler.REQUEST_INTERVAL_MS)
+    except profiler.ProfilerBusy:
+        response = await call_next(request)
+        response.headers["X-Profile"] = "busy"
+        return response
+    try:
+        response = await call_next(request)
+    finally:
+        profile = await run_in_threadpool(profiler.stop, sampler)
+    response.headers["X-Profile-Id"] = profiler.keep_request_profile(profile)
+    return response
+
+
 # Include routers
 app.include_router(auth.router)
 app.include_router(spots.router)
@@ -101,7 +216,7 @@ app.include_router(energy.router)
 
 # Lightweight client log sink for debugging (stdout only, no auth)
 @app.post("/api/client-log")
-async def client_log(payload: dict = Body(...)):
+def client_log(payload: dict = Body(...)):
     msg = payload.get("msg", "")
     level = payload.get("level", "INFO")
     if msg:
@@ -139,7 +254,7 @@ async def client_log(payload: dict = Body(...)):
 
 # Connection diagnostics endpoint
 @app.post("/api/connection-diagnostics")
-async def connection_diagnostics(payload: dict = Body(...)):
+def connection_diagnostics(payload: dict = Body(...)):
     """Receive connection diagnostics from client"""
     timestamp = datetime.now().isoformat()
     
@@ -206,10 +321,19 @@ async def health_check():
         "status": "ok",
         "timestamp": datetime.now().isoformat(),
         "uptime_seconds": uptime_seconds,
-        "active_connections": active_connections
+        "active_connections": sum(len(sockets) for sockets in ws_manager.active_connections.values())
     })
 
 
+# Prometheus scrape endpoint
+@app.get("/metrics", include_in_schema=False)
+def prometheus_metrics(request: Request):
+    """Request latency, DB pool, WebSocket, game event and cache metrics of this worker"""
+    if settings.METRICS_TOKEN and request.headers.get("authorization") != f"Bearer {settings.METRICS_TOKEN}":
+        return Response(status_code=401)
+    return Response(content=metrics.render(), media_type=metrics.CONTENT_TYPE)
+
+
 # Heartbeat endpoint for frequent pings
 @app.post("/api/heartbeat")
 async def heartbeat(payload: dict = Body(...)):
@@ -297,6 +421,27 @@ _DEPLOYED_AT_STR = _DEPLOYED_AT.strftime('%d.%m.%Y %H:%M:%S')
 _CACHE_BUST = str(int(_DEPLOYED_AT.timestamp()))
 
 
+def _deployed_version() -> dict:
+    """Commit, deploy timestamp and asset cache-bust of the running server"""
+    # Prefer explicit env override (useful for some deploy setups)
+    commit = (os.environ.get("CLAIM_COMMIT") or "").strip()
+    if not commit:
+        repo_root = os.path.abspath(os.path.join(frontend_path, ".."))
+        commit = _read_git_commit_short(repo_root) or "deployed"
+
+    return {
+        "commit": commit,
+        "timestamp": os.environ.get("CLAIM_DEPLOYED_AT") or _DEPLOYED_AT_STR,
+        "cache_bust": os.environ.get("CLAIM_CACHE_BUST") or _CACHE_BUST,
+    }
+
+
+def _deployed_signature() -> str:
+    """Same format as the client's getCurrentDeployedSignature()"""
+    version = _deployed_version()
+    return f"{version['commit']}|{version['timestamp']}|{version['cache_bust']}"
+
+
 # Root endpoint to serve index.html
 @app.get("/", response_class=HTMLResponse)
 async def serve_frontend():
@@ -308,18 +453,7 @@ async def serve_frontend():
     with open(index_path, "r", encoding="utf-8") as f:
         raw = f.read()
 
-    # Prefer explicit env override (useful for some deploy setups)
-    commit = (os.environ.get("CLAIM_COMMIT") or "").strip()
-    if not commit:
-        repo_root = os.path.abspath(os.path.join(frontend_path, ".."))
-        commit = _read_git_commit_short(repo_root) or "deployed"
-
-    html = _inject_version_into_html(
-        raw,
-        commit=commit,
-        timestamp=os.environ.get("CLAIM_DEPLOYED_AT") or _DEPLOYED_AT_STR,
-        cache_bust=os.environ.get("CLAIM_CACHE_BUST") or _CACHE_BUST,
-    )
+    html = _inject_version_into_html(raw, **_deployed_version())
 
     response = HTMLResponse(content=html)
     response.headers["Cache-Control"] = "no-cache, no-store, must-revalidate"
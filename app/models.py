@@ -1,6 +1,6 @@
 from datetime import datetime
-from sqlalchemy import Column, Integer, String, Float, Boolean, DateTime, ForeignKey, Text, Enum as SQLEnum, LargeBinary
-from sqlalchemy.orm import relationship
+from sqlalchemy import Column, Integer, String, Float, Boolean, DateTime, ForeignKey, Text, Enum as SQLEnum, LargeBinary, Index, or_
+from sqlalchemy.orm import relationship, deferred, column_property
 from geoalchemy2 import Geography
 from geoalchemy2 import Geometry
 import enum
@@ -198,18 +198,31 @@ class Log(Base):
     xp_gained = Column(Integer, default=0)
     claim_points = Column(Integer, default=0)
     
-    # Optional photo (stored as binary data) and notes
-    photo_data = Column(LargeBinary, nullable=True)  # BLOB for image binary data
+    # Optional photo and notes. Photos live in the content-addressed photo store
+    # (app/services/photo_store.py); photo_data only holds legacy blobs until
+    # migrate_photos.py moved them out, and is never loaded by default.
+    photo_data = deferred(Column(LargeBinary, nullable=True))
+    photo_sha256 = Column(String(64), nullable=True)
+    photo_size = Column(Integer, nullable=True)
     photo_mime = Column(String(50), nullable=True)  # MIME type (image/jpeg, image/png, etc)
     notes = Column(Text, nullable=True)
     
     timestamp = Column(DateTime, default=get_cet_now, index=True)
     
+    # Client-generated idempotency key (offline sync / retried requests)
+    client_key = Column(String(64), nullable=True)
+    
     # Relationships
     user = relationship("User", back_populates="logs")
     spot = relationship("Spot", back_populates="logs")
 
 
+# Computed in SQL so listing logs never loads photo bytes
+Log.has_photo = column_property(
+    or_(Log.photo_sha256.isnot(None), Log.photo_data.isnot(None))
+)
+
+
 class Claim(Base):
     __tablename__ = "claims"
 
@@ -399,6 +412,38 @@ class EnergySettings(Base):
     user = relationship("User")
 
 
+# Composite/partial indexes for the hot query shapes.
+# New databases get them from create_all(); existing ones via migrate_indexes.py.
+HOT_PATH_INDEXES = [
+    # Cooldown checks / warm-up: user + spot + type within the cooldown window
+    Index("ix_logs_user_spot_auto_timestamp", Log.user_id, Log.spot_id, Log.is_auto, Log.timestamp),
+    # "My logs" (newest first)
+    Index("ix_logs_user_timestamp", Log.user_id, Log.timestamp.desc()),
+    # Spot log history (newest first)
+    Index("ix_logs_spot_timestamp", Log.spot_id, Log.timestamp.desc()),
+    # Idempotency of synced/retried logs (NULL keys never collide)
+    Index("uq_logs_user_client_key", Log.user_id, Log.client_key, unique=True),
+    # One stack per item: loot collection upserts into it
+    Index("uq_inventory_user_item", InventoryItem.user_id, InventoryItem.item_id, unique=True),
+    # Dominance / top claimers of a spot
+    Index("ix_claims_spot_value", Claim.spot_id, Claim.claim_value.desc()),
+    # update_claim lookup
+    Index("ix_claims_user_spot", Claim.user_id, Claim.spot_id),
+    # Track point replay / distance calculation
+    Index("ix_track_points_track_timestamp", TrackPoint.track_id, TrackPoint.timestamp),
+    # Active tracks of a user
+    Index(
+        "ix_tracks_user_active", Track.user_id,
+        postgresql_where=Track.is_active == True, sqlite_where=Track.is_active == True,
+    ),
+]
+
+# Indexes that no query uses any more; dropped by migrate_indexes.py
+RETIRED_INDEXES = [
+    "ix_spots_loot_owner_expires",  # Loot lives in the in-memory loot store
+]
+
+
 # Create tables function
 def init_db():
     """Initialize database with PostGIS/SpatiaLite extension and create all tables"""
@@ -1,26 +1,70 @@
 """Admin panel routes"""
+import asyncio
+import os
+from typing import Optional
 from fastapi import APIRouter, Depends, HTTPException, Query
+from fastapi.responses import Response
+from jose import JWTError, jwt
 from sqlalchemy.orm import Session
-from app.database import get_db
+from starlette.concurrency import run_in_threadpool
+from app.config import settings
+from app.database import get_db, run_db
 from app.schemas import UserResponse
 from app.routers.auth import get_current_user
-from app.models import User, UserRole
-from app.services import admin_service
+from app.models import UserRole
+from app.services.user_cache import UserPrincipal
+from app.services import admin_service, profiler, query_monitor, scheduler, user_cache
 
 router = APIRouter(prefix="/api/admin", tags=["admin"])
 
 
-def check_admin(current_user: User = Depends(get_current_user)) -> User:
+def check_admin(current_user: UserPrincipal = Depends(get_current_user)) -> UserPrincipal:
     """Dependency to check if user is admin"""
     if current_user.role != UserRole.ADMIN:
         raise HTTPException(status_code=403, detail="Admin access required")
     return current_user
 
 
+def _active_admin(db, username: str) -> bool:
+    principal = user_cache.get_principal(db, username)
+    return principal is not None and principal.is_active and principal.role == UserRole.ADMIN
+
+
+async def is_admin_token(authorization: Optional[str]) -> bool:
+    """Whether an Authorization header carries an admin's bearer token (for middleware)"""
+    if not authorization or not authorization.lower().startswith("bearer "):
+        return False
+    try:
+        payload = jwt.decode(authorization[7:].strip(), settings.SECRET_KEY, algorithms=[settings.ALGORITHM])
+    except JWTError:
+        return False
+    username = payload.get("sub")
+    if username is None:
+        return False
+    try:
+        return await run_db(_active_admin, username)
+    except Exception as e:
+        print(f"[WARN] Admin check failed: {e}")
+        return False
+
+
+def _profile_response(profile: profiler.Profile, fmt: str) -> Response:
+    body, media_type = profile.render(fmt)
+    extension = "speedscope.json" if fmt == "speedscope" else "collapsed.txt"
+    return Response(
+        content=body,
+        media_type=media_type,
+        headers={
+            "Content-Disposition": f'attachment; filename="profile-{os.getpid()}.{extension}"',
+            "X-Profile-Samples": str(profile.samples),
+        },
+    )
+
+
 @router.get("/settings")
-async def get_settings(
+def get_settings(
     db: Session = Depends(get_db),
-    admin: User = Depends(check_admin)
+    admin: UserPrincipal = Depends(check_admin)
 ):
     """Get all game settings"""
     # Initialize settings if needed
@@ -30,11 +74,11 @@ async def get_settings(
 
 
 @router.put("/settings/{setting_name}")
-async def update_setting(
+def update_setting(
     setting_name: str,
     value: dict,
     db: Session = Depends(get_db),
-    admin: User = Depends(check_admin)
+    admin: UserPrincipal = Depends(check_admin)
 ):
     """Update a game setting"""
     success = admin_service.update_setting(db, setting_name, value.get("value"))
@@ -44,22 +88,78 @@ async def update_setting(
 
 
 @router.get("/stats")
-async def get_stats(
+def get_stats(
     db: Session = Depends(get_db),
-    admin: User = Depends(check_admin)
+    admin: UserPrincipal = Depends(check_admin)
 ):
     """Get database statistics"""
     stats = admin_service.get_database_stats(db)
     return stats
 
 
+@router.get("/scheduler")
+def get_scheduler_stats(
+    admin: UserPrincipal = Depends(check_admin)
+):
+    """Background job runs, durations and affected rows"""
+    return scheduler.scheduler.stats()
+
+
+@router.get("/queries")
+def get_query_report(
+    reset: bool = False,
+    admin: UserPrincipal = Depends(check_admin)
+):
+    """Per-route query counts, DB time and recent N+1 suspects of this worker"""
+    snapshot = query_monitor.report.snapshot()
+    if reset:
+        query_monitor.report.clear()
+    return snapshot
+
+
+@router.post("/profile")
+async def profile_worker(
+    seconds: float = Query(10.0, gt=0),
+    fmt: str = Query("collapsed", alias="format"),
+    interval_ms: Optional[float] = Query(None, ge=1, le=1000),
+    admin: UserPrincipal = Depends(check_admin)
+):
+    """Sample all threads of this worker for `seconds` (collapsed stacks or speedscope JSON)"""
+    if fmt not in profiler.FORMATS:
+        raise HTTPException(status_code=400, detail=f"format must be one of {', '.join(profiler.FORMATS)}")
+    try:
+        sampler = profiler.start(f"worker {os.getpid()}", interval_ms)
+    except profiler.ProfilerBusy:
+        raise HTTPException(status_code=409, detail="A profile is already running")
+    try:
+        await asyncio.sleep(min(seconds, settings.PROFILER_MAX_SECONDS))
+    finally:
+        profile = await run_in_threadpool(profiler.stop, sampler)
+    return _profile_response(profile, fmt)
+
+
+@router.get("/profiles/{profile_id}")
+def get_request_profile(
+    profile_id: str,
+    fmt: str = Query("collapsed", alias="format"),
+    admin: UserPrincipal = Depends(check_admin)
+):
+    """Profile of a single request sent with the X-Profile header (id from its X-Profile-Id)"""
+    if fmt not in profiler.FORMATS:
+        raise HTTPException(status_code=400, detail=f"format must be one of {', '.join(profiler.FORMATS)}")
+    profile = profiler.get_request_profile(profile_id)
+    if profile is None:
+        raise HTTPException(status_code=404, detail="Profile not found")
+    return _profile_response(profile, fmt)
+
+
 @router.get("/users")
-async def get_users(
+def get_users(
     skip: int = Query(0, ge=0),
     limit: int = Query(50, ge=1, le=100),
     role: str = Query(None),
     db: Session = Depends(get_db),
-    admin: User = Depends(check_admin)
+    admin: UserPrincipal = Depends(check_admin)
 ):
     """Get list of users"""
     users = admin_service.get_users_list(db, skip, limit, role)
@@ -67,11 +167,11 @@ async def get_users(
 
 
 @router.put("/users/{user_id}/role")
-async def update_user_role(
+def update_user_role(
     user_id: int,
     new_role: dict,
     db: Session = Depends(get_db),
-    admin: User = Depends(check_admin)
+    admin: UserPrincipal = Depends(check_admin)
 ):
     """Update user role"""
     success = admin_service.update_user_role(db, user_id, new_role.get("role"))
@@ -81,10 +181,10 @@ async def update_user_role(
 
 
 @router.put("/users/{user_id}/toggle-active")
-async def toggle_user_active(
+def toggle_user_active(
     user_id: int,
     db: Session = Depends(get_db),
-    admin: User = Depends(check_admin)
+    admin: UserPrincipal = Depends(check_admin)
 ):
     """Toggle user active status"""
     success = admin_service.toggle_user_active(db, user_id)
@@ -94,10 +194,10 @@ async def toggle_user_active(
 
 
 @router.delete("/users/{user_id}")
-async def delete_user(
+def delete_user(
     user_id: int,
     db: Session = Depends(get_db),
-    admin: User = Depends(check_admin)
+    admin: UserPrincipal = Depends(check_admin)
 ):
     """Delete a user"""
     success = admin_service.delete_user(db, user_id)
@@ -107,11 +207,11 @@ async def delete_user(
 
 
 @router.get("/spots")
-async def get_spots(
+def get_spots(
     skip: int = Query(0, ge=0),
     limit: int = Query(50, ge=1, le=100),
     db: Session = Depends(get_db),
-    admin: User = Depends(check_admin)
+    admin: UserPrincipal = Depends(check_admin)
 ):
     """Get list of spots"""
     spots = admin_service.get_spots_list(db, skip, limit)
@@ -119,10 +219,10 @@ async def get_spots(
 
 
 @router.delete("/spots/{spot_id}")
-async def delete_spot(
+def delete_spot(
     spot_id: int,
     db: Session = Depends(get_db),
-    admin: User = Depends(check_admin)
+    admin: UserPrincipal = Depends(check_admin)
 ):
     """Delete a spot"""
     success = admin_service.delete_spot(db, spot_id)
@@ -132,10 +232,10 @@ async def delete_spot(
 
 
 @router.post("/spots")
-async def create_spot(
+def create_spot(
     spot_data: dict,
     db: Session = Depends(get_db),
-    admin: User = Depends(check_admin)
+    admin: UserPrincipal = Depends(check_admin)
 ):
     """Create a new spot"""
     spot = admin_service.create_spot(
@@ -154,21 +254,24 @@ async def create_spot(
 
 
 @router.get("/logs")
-async def get_logs(
-    skip: int = Query(0, ge=0),
+def get_logs(
     limit: int = Query(50, ge=1, le=100),
+    cursor: Optional[str] = None,
     db: Session = Depends(get_db),
-    admin: User = Depends(check_admin)
+    admin: UserPrincipal = Depends(check_admin)
 ):
-    """Get recent logs"""
-    logs = admin_service.get_logs_list(db, skip, limit)
-    return {"logs": logs}
+    """Get recent logs (pass next_cursor back as `cursor` for older logs)"""
+    try:
+        logs, next_cursor = admin_service.get_logs_list(db, limit, cursor)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return {"logs": logs, "next_cursor": next_cursor}
 
 
 @router.get("/player-colors")
-async def get_player_colors(
+def get_player_colors(
     db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user)
+    current_user: UserPrincipal = Depends(get_current_user)
 ):
     """Get all players with their colors (available to all authenticated users)"""
     players = admin_service.get_player_colors(db)
@@ -176,11 +279,11 @@ async def get_player_colors(
 
 
 @router.put("/player-colors/{user_id}")
-async def update_player_color(
+def update_player_color(
     user_id: int,
     color_data: dict,
     db: Session = Depends(get_db),
-    admin: User = Depends(check_admin)
+    admin: UserPrincipal = Depends(check_admin)
 ):
     """Update a player's color (admin only)"""
     error = admin_service.update_player_color(db, user_id, color_data.get("color"))
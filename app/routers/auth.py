@@ -2,10 +2,12 @@ from datetime import timedelta
 from fastapi import APIRouter, Depends, HTTPException, status
 from fastapi.security import OAuth2PasswordBearer, OAuth2PasswordRequestForm
 from sqlalchemy.orm import Session
+from starlette.concurrency import run_in_threadpool
 from jose import JWTError, jwt
 from app.database import get_db
 from app.schemas import UserCreate, UserResponse, Token, UserLogin
-from app.services import auth_service
+from app.services import auth_service, user_cache
+from app.services.user_cache import UserPrincipal
 from app.config import settings
 from app.models import User
 
@@ -13,11 +15,11 @@ router = APIRouter(prefix="/api/auth", tags=["auth"])
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="/api/auth/token")
 
 
-async def get_current_user(
+def get_current_user(
     token: str = Depends(oauth2_scheme),
     db: Session = Depends(get_db)
-) -> User:
-    """Get current authenticated user"""
+) -> UserPrincipal:
+    """Get current authenticated user (cached principal, not an ORM object)"""
     credentials_exception = HTTPException(
         status_code=status.HTTP_401_UNAUTHORIZED,
         detail="Could not validate credentials",
@@ -31,25 +33,42 @@ async def get_current_user(
     except JWTError:
         raise credentials_exception
     
-    user = auth_service.get_user_by_username(db, username=username)
+    user = user_cache.get_principal(db, username)
     if user is None:
         raise credentials_exception
     return user
 
 
+def get_current_db_user(
+    principal: UserPrincipal = Depends(get_current_user),
+    db: Session = Depends(get_db)
+) -> User:
+    """Current user as ORM object, for handlers that modify or return the full user"""
+    user = auth_service.get_user_by_id(db, principal.id)
+    if user is None:
+        user_cache.invalidate_user(principal.id)
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Could not validate credentials",
+            headers={"WWW-Authenticate": "Bearer"},
+        )
+    return user
+
+
 @router.post("/register", response_model=UserResponse, status_code=status.HTTP_201_CREATED)
 async def register(user_data: UserCreate, db: Session = Depends(get_db)):
     """Register a new user"""
     # Check if user already exists
-    existing_user = auth_service.get_user_by_username(db, user_data.username)
+    existing_user = await run_in_threadpool(auth_service.get_user_by_username, db, user_data.username)
     if existing_user:
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
             detail="Username already registered"
         )
     
-    # Create new user
-    user = auth_service.create_user(db, user_data)
+    # Create new user (bcrypt runs on the hashing pool, not the event loop)
+    hashed_password = await auth_service.get_password_hash_async(user_data.password)
+    user = await run_in_threadpool(auth_service.create_user, db, user_data, hashed_password)
     return user
 
 
@@ -59,7 +78,7 @@ async def login(
     db: Session = Depends(get_db)
 ):
     """Login and get access token"""
-    user = auth_service.authenticate_user(db, form_data.username, form_data.password)
+    user = await auth_service.authenticate_user_async(db, form_data.username, form_data.password)
     if not user:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
@@ -76,6 +95,6 @@ async def login(
 
 
 @router.get("/me", response_model=UserResponse)
-async def get_me(current_user: User = Depends(get_current_user)):
+def get_me(current_user: User = Depends(get_current_db_user)):
     """Get current user info"""
     return current_user
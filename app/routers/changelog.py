@@ -240,7 +240,7 @@ def get_changelog_path() -> Path:
 
 
 @router.get("/changelog")
-async def get_changelog() -> List[Dict[str, Any]]:
+def get_changelog() -> List[Dict[str, Any]]:
     """
     Parse CHANGELOG.md and return structured changelog entries.
     
@@ -5,14 +5,14 @@ from app.database import get_db
 from app.schemas import HeatmapData
 from app.services import claim_service
 from app.routers.auth import get_current_user
-from app.models import User
+from app.services.user_cache import UserPrincipal
 
 router = APIRouter(prefix="/api/claims", tags=["claims"])
 
 
 @router.get("/heatmap/me", response_model=HeatmapData)
-async def get_my_heatmap(
-    current_user: User = Depends(get_current_user),
+def get_my_heatmap(
+    current_user: UserPrincipal = Depends(get_current_user),
     db: Session = Depends(get_db)
 ):
     """Get current user's claim heatmap"""
@@ -20,9 +20,9 @@ async def get_my_heatmap(
 
 
 @router.get("/heatmap/user/{user_id}", response_model=HeatmapData)
-async def get_user_heatmap(
+def get_user_heatmap(
     user_id: int,
-    current_user: User = Depends(get_current_user),
+    current_user: UserPrincipal = Depends(get_current_user),
     db: Session = Depends(get_db)
 ):
     """Get specific user's claim heatmap"""
@@ -30,9 +30,9 @@ async def get_user_heatmap(
 
 
 @router.get("/heatmap/all", response_model=List[HeatmapData])
-async def get_all_heatmaps(
+def get_all_heatmaps(
     limit: int = 10,
-    current_user: User = Depends(get_current_user),
+    current_user: UserPrincipal = Depends(get_current_user),
     db: Session = Depends(get_db)
 ):
     """Get heatmaps for top users"""
@@ -40,9 +40,9 @@ async def get_all_heatmaps(
 
 
 @router.get("/spot/{spot_id}/dominance")
-async def get_spot_dominance(
+def get_spot_dominance(
     spot_id: int,
-    current_user: User = Depends(get_current_user),
+    current_user: UserPrincipal = Depends(get_current_user),
     db: Session = Depends(get_db)
 ):
     """Get dominance rankings for a spot"""
@@ -13,7 +13,8 @@ from typing import List, Optional
 
 from app.database import get_db
 from app.routers.auth import get_current_user
-from app.models import User, EnergyConsumptionType
+from app.models import EnergyConsumptionType
+from app.services.user_cache import UserPrincipal
 from app.schemas import (
     EnergyMetricCreate,
     EnergyMetricResponse,
@@ -34,7 +35,7 @@ router = APIRouter(
 def create_energy_metric(
     metric: EnergyMetricCreate,
     db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user)
+    current_user: UserPrincipal = Depends(get_current_user)
 ):
     """
     Record a new energy consumption metric.
@@ -55,7 +56,7 @@ def get_energy_metrics(
     hours: int = Query(default=24, ge=1, le=168),  # 1 hour to 7 days
     consumption_type: Optional[EnergyConsumptionType] = None,
     db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user)
+    current_user: UserPrincipal = Depends(get_current_user)
 ):
     """
     Get energy consumption metrics for the current user.
@@ -77,7 +78,7 @@ def get_energy_metrics(
 def get_energy_stats(
     battery_status: BatteryStatusResponse,
     db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user)
+    current_user: UserPrincipal = Depends(get_current_user)
 ):
     """
     Get comprehensive energy statistics and optimization suggestions.
@@ -97,7 +98,7 @@ def get_energy_stats(
 @router.get("/settings", response_model=EnergySettingsResponse)
 def get_energy_settings(
     db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user)
+    current_user: UserPrincipal = Depends(get_current_user)
 ):
     """
     Get energy optimization settings for the current user.
@@ -110,7 +111,7 @@ def get_energy_settings(
 def update_energy_settings(
     settings_update: EnergySettingsUpdate,
     db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user)
+    current_user: UserPrincipal = Depends(get_current_user)
 ):
     """
     Update energy optimization settings for the current user.
@@ -3,68 +3,29 @@ from fastapi import APIRouter, Depends, HTTPException, status
 from sqlalchemy.orm import Session
 from app.database import get_db
 from app.schemas import ItemResponse, InventoryItemResponse, UserStats, UseItemResponse
-from app.services import item_service
-from app.routers.auth import get_current_user
+from app.services import item_service, progression_service
+from app.ws import events
+from app.routers.auth import get_current_db_user, get_current_user
 from app.models import User, UserRole
-from sqlalchemy import func
+from app.services.user_cache import UserPrincipal
 
 router = APIRouter(prefix="/api/items", tags=["items", "stats"])
 
 
 # Stats endpoint (must be before /{item_id} to avoid path collision)
 @router.get("/stats", response_model=UserStats)
-async def get_my_stats(
-    current_user: User = Depends(get_current_user),
+def get_my_stats(
+    current_user: User = Depends(get_current_db_user),
     db: Session = Depends(get_db)
 ):
     """Get current user's game statistics"""
-    from app.models import Log, Claim, Track, InventoryItem
-    
-    # Count logs
-    total_logs = db.query(func.count(Log.id)).filter(
-        Log.user_id == current_user.id
-    ).scalar() or 0
-    
-    # Count claimed spots
-    total_spots_claimed = db.query(func.count(Claim.id)).filter(
-        Claim.user_id == current_user.id,
-        Claim.claim_value > 0
-    ).scalar() or 0
-    
-    # Count active tracks
-    active_tracks = db.query(func.count(Track.id)).filter(
-        Track.user_id == current_user.id,
-        Track.is_active == True
-    ).scalar() or 0
-    
-    # Count inventory items
-    inventory_count = db.query(func.sum(InventoryItem.quantity)).filter(
-        InventoryItem.user_id == current_user.id
-    ).scalar() or 0
-    
-    from app.services.progression_service import get_level_curve_params, level_from_xp, xp_to_next_level
-
-    base, inc = get_level_curve_params(db)
-    computed_level = level_from_xp(current_user.xp or 0, base, inc)
-    effective_level = max(int(current_user.level or 1), int(computed_level))
-    xp_to_next = xp_to_next_level(db, current_user.xp or 0, effective_level)
-    
-    return UserStats(
-        level=effective_level,
-        xp=current_user.xp or 0,
-        xp_to_next_level=xp_to_next,
-        total_claim_points=current_user.total_claim_points or 0,
-        total_logs=int(total_logs),
-        total_spots_claimed=int(total_spots_claimed),
-        active_tracks=int(active_tracks),
-        inventory_count=int(inventory_count)
-    )
+    return UserStats(**progression_service.get_user_stats(db, current_user))
 
 
 # Inventory endpoints (must be before /{item_id} to avoid path collision)
 @router.get("/inventory", response_model=List[InventoryItemResponse])
-async def get_my_inventory(
-    current_user: User = Depends(get_current_user),
+def get_my_inventory(
+    current_user: UserPrincipal = Depends(get_current_user),
     db: Session = Depends(get_db)
 ):
     """Get current user's inventory"""
@@ -74,8 +35,8 @@ async def get_my_inventory(
 
 # Items endpoints
 @router.get("", response_model=List[ItemResponse])
-async def get_all_items(
-    current_user: User = Depends(get_current_user),
+def get_all_items(
+    current_user: UserPrincipal = Depends(get_current_user),
     db: Session = Depends(get_db)
 ):
     """Get all available items"""
@@ -84,9 +45,9 @@ async def get_all_items(
 
 
 @router.get("/{item_id}", response_model=ItemResponse)
-async def get_item(
+def get_item(
     item_id: int,
-    current_user: User = Depends(get_current_user),
+    current_user: UserPrincipal = Depends(get_current_user),
     db: Session = Depends(get_db)
 ):
     """Get item by ID"""
@@ -100,9 +61,9 @@ async def get_item(
 
 
 @router.post("/{item_id}/use", response_model=UseItemResponse)
-async def use_item(
+def use_item(
     item_id: int,
-    current_user: User = Depends(get_current_user),
+    current_user: UserPrincipal = Depends(get_current_user),
     db: Session = Depends(get_db)
 ):
     """Use/consume an item from inventory"""
@@ -114,4 +75,5 @@ async def use_item(
             detail=result["error"]
         )
     
+    events.stats_changed(current_user.id)
     return UseItemResponse(**result)
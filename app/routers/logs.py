@@ -1,29 +1,44 @@
-from typing import List
-from fastapi import APIRouter, Depends, HTTPException, status, UploadFile, File
+from collections import deque
+from typing import AsyncIterator, List, Optional, Tuple
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response, status
+from fastapi.responses import FileResponse
+from multipart.multipart import MultipartParser, parse_options_header
 from sqlalchemy.orm import Session
-from sqlalchemy import text
+from sqlalchemy.exc import IntegrityError
+from starlette.concurrency import run_in_threadpool
 from app.database import get_db
-from app.schemas import LogCreate, LogResponse
-from app.services import log_service, spot_service
-from app.routers.auth import get_current_user
+from app.schemas import LogCreate, LogResponse, LogSyncRequest, LogSyncResponse
+from app.services import log_service, photo_store, photo_variants, spot_service
+from app.routers.auth import get_current_db_user, get_current_user
 from app.models import User
+from app.services.user_cache import UserPrincipal
+from app.ws import events
 
 router = APIRouter(prefix="/api/logs", tags=["logs"])
 
+PHOTO_CACHE_CONTROL = "public, max-age=31536000, immutable"
+
 
 @router.post("/", response_model=LogResponse, status_code=status.HTTP_201_CREATED)
-async def create_log(
+def create_log(
     log_data: LogCreate,
-    current_user: User = Depends(get_current_user),
+    current_user: User = Depends(get_current_db_user),
     db: Session = Depends(get_db)
 ):
-    """Create a log entry (manual or auto)"""
+    """Create a log entry (manual or auto).
+
+    With `client_key` set, retrying the request returns the log created by
+    the first attempt instead of a cooldown error.
+    """
     is_auto = log_data.is_auto  # Get is_auto from request body
     
     try:
-        # Use transaction with row-level locking to prevent race conditions
-        # This ensures multiple simultaneous log requests are serialized
-        db.execute(text("SELECT pg_advisory_xact_lock(:key)"), {"key": current_user.id * 1000000 + log_data.spot_id})
+        # Serialize simultaneous log requests of this user (cooldown check + insert)
+        log_service.lock_user_logs(db, current_user.id)
+        
+        existing = log_service.get_log_by_client_key(db, current_user.id, log_data.client_key)
+        if existing:
+            return existing
         
         # Check cooldown (separate for auto vs manual logs)
         if not spot_service.can_log_spot(db, current_user.id, log_data.spot_id, is_auto=is_auto):
@@ -44,10 +59,21 @@ async def create_log(
                 detail="Cannot log: spot not found or too far away"
             )
         
+        events.after_log(current_user.id, log_data.spot_id)
         return log
     except HTTPException:
         # Re-raise HTTP exceptions (cooldown, not found, etc.)
         raise
+    except IntegrityError:
+        # Same client_key committed by a concurrent retry
+        db.rollback()
+        existing = log_service.get_log_by_client_key(db, current_user.id, log_data.client_key)
+        if existing:
+            return existing
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail="Internal server error"
+        )
     except Exception as e:
         # Log unexpected errors
         print(f"[ERROR] Unexpected error in create_log: {e}")
@@ -58,94 +84,236 @@ async def create_log(
         )
 
 
-@router.get("/me", response_model=List[LogResponse])
-async def get_my_logs(
-    limit: int = 50,
-    current_user: User = Depends(get_current_user),
+@router.post("/sync", response_model=LogSyncResponse)
+def sync_logs(
+    payload: LogSyncRequest,
+    current_user: User = Depends(get_current_db_user),
     db: Session = Depends(get_db)
 ):
-    """Get current user's logs"""
-    logs = log_service.get_user_logs(db, current_user.id, limit)
+    """Replay logs made while offline (up to 100 per request).
+
+    Each item has a `client_key`; items already synced come back as
+    `duplicate`, so a client can resend its whole queue after a lost response.
+    Results are returned per item, in request order.
+    """
+    try:
+        results = log_service.sync_logs(db, current_user, payload.logs)
+    except Exception as e:
+        print(f"[ERROR] Unexpected error in sync_logs: {e}")
+        db.rollback()
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail="Internal server error"
+        )
+    
+    for spot_id in {r["log"].spot_id for r in results if r["status"] == "created"}:
+        events.after_log(current_user.id, spot_id)
+    return {"results": results}
+
+
+def _log_page(response: Response, page):
+    """Return a log page; the cursor for the next page goes into X-Next-Cursor"""
+    logs, next_cursor = page
+    if next_cursor:
+        response.headers["X-Next-Cursor"] = next_cursor
     return logs
 
 
+@router.get("/me", response_model=List[LogResponse])
+def get_my_logs(
+    response: Response,
+    limit: int = Query(50, ge=1, le=100),
+    cursor: Optional[str] = None,
+    current_user: UserPrincipal = Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    """Get current user's logs (pass X-Next-Cursor back as `cursor` for older logs)"""
+    try:
+        return _log_page(response, log_service.get_user_logs(db, current_user.id, limit, cursor))
+    except ValueError as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+
+
 @router.get("/spot/{spot_id}", response_model=List[LogResponse])
-async def get_spot_logs(
+def get_spot_logs(
     spot_id: int,
-    limit: int = 50,
-    current_user: User = Depends(get_current_user),
+    response: Response,
+    limit: int = Query(50, ge=1, le=100),
+    cursor: Optional[str] = None,
+    current_user: UserPrincipal = Depends(get_current_user),
     db: Session = Depends(get_db)
 ):
-    """Get logs for a specific spot"""
-    from sqlalchemy.orm import joinedload
-    from app.models import Log
-    
-    logs = db.query(Log).filter(
-        Log.spot_id == spot_id
-    ).order_by(Log.timestamp.desc()).limit(limit).all()
-    
-    # Manually add username and has_photo to each log
-    result = []
-    for log in logs:
-        user = db.query(User).filter(User.id == log.user_id).first()
-        log_dict = LogResponse.model_validate(log)
-        log_dict.username = user.username if user else "Unknown"
-        log_dict.has_photo = log.photo_data is not None and len(log.photo_data) > 0
-        log_dict.is_auto = log.is_auto  # Ensure is_auto is set
-        result.append(log_dict)
-    
-    return result
+    """Get logs for a specific spot (pass X-Next-Cursor back as `cursor` for older logs)"""
+    try:
+        return _log_page(response, log_service.get_spot_logs(db, spot_id, limit, cursor))
+    except ValueError as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
 
 
 @router.get("/{log_id}/photo")
 async def get_log_photo(
     log_id: int,
+    request: Request,
+    size: Optional[str] = None,
     db: Session = Depends(get_db)
 ):
-    """Get photo from a log entry (no auth required)"""
+    """Get photo from a log entry (no auth required).
+
+    `size=thumb` (320px) or `size=display` (1280px) return a resized WebP/JPEG
+    variant; without `size` the original upload is returned.
+    """
     from app.models import Log
-    from fastapi.responses import StreamingResponse
-    import io
     
-    log = db.query(Log).filter(Log.id == log_id).first()
-    if not log or not log.photo_data:
-        raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND,
-            detail="Photo not found"
-        )
+    if size is not None and size not in photo_variants.VARIANTS:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Unknown photo size")
     
-    # Return image with correct mime type
-    return StreamingResponse(
-        io.BytesIO(log.photo_data),
-        media_type=log.photo_mime or "image/jpeg"
+    # Async because of variant rendering; the queries run in the threadpool
+    row = await run_in_threadpool(
+        lambda: db.query(Log.photo_sha256, Log.photo_mime).filter(Log.id == log_id).first()
     )
+    if not row:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Photo not found")
+    photo_sha256, photo_mime = row
+    media_type = photo_mime or "image/jpeg"
+    
+    path = photo_store.open_path(photo_sha256)
+    if path is None:
+        # Legacy blob not yet moved out by migrate_photos.py
+        photo_data = await run_in_threadpool(
+            lambda: db.query(Log.photo_data).filter(Log.id == log_id).scalar()
+        )
+        if not photo_data:
+            raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Photo not found")
+        return Response(content=photo_data, media_type=media_type)
+    
+    # Content-addressed files never change: the digest is a strong ETag
+    etag = f'"{photo_sha256}"'
+    if size:
+        variant = await photo_variants.ensure_variant(photo_sha256, size)
+        if variant:
+            path, media_type = variant
+            etag = f'"{photo_sha256}-{size}"'
+    headers = {"ETag": etag, "Cache-Control": PHOTO_CACHE_CONTROL}
+    if etag in [tag.strip() for tag in request.headers.get("if-none-match", "").split(",")]:
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+    return FileResponse(path, media_type=media_type, headers=headers)
+
+
+async def _multipart_file(request: Request, field: str = "file") -> Tuple[str, AsyncIterator[bytes]]:
+    """(content type, data chunks) of one multipart file field, parsed as the body streams in.
+
+    Unlike request.form(), nothing is spooled: the caller's size limit stops
+    reading the request as soon as it is exceeded.
+    """
+    _, params = parse_options_header(request.headers.get("content-type", ""))
+    boundary = params.get(b"boundary")
+    if not boundary:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Missing multipart boundary")
+    
+    events = deque()  # ("headers", {name: value}) | ("data", bytes) | ("end", None)
+    header = {"field": b"", "value": b"", "headers": {}}
+    
+    def on_part_begin():
+        header["headers"] = {}
+    
+    def on_header_field(data, start, end):
+        header["field"] += data[start:end]
+    
+    def on_header_value(data, start, end):
+        header["value"] += data[start:end]
+    
+    def on_header_end():
+        header["headers"][header["field"].lower()] = header["value"]
+        header["field"] = header["value"] = b""
+    
+    parser = MultipartParser(boundary, {
+        "on_part_begin": on_part_begin,
+        "on_header_field": on_header_field,
+        "on_header_value": on_header_value,
+        "on_header_end": on_header_end,
+        "on_headers_finished": lambda: events.append(("headers", header["headers"])),
+        "on_part_data": lambda data, start, end: events.append(("data", data[start:end])),
+        "on_part_end": lambda: events.append(("end", None)),
+    })
+    body = request.stream()
+    
+    async def next_event():
+        while not events:
+            try:
+                chunk = await body.__anext__()
+            except StopAsyncIteration:
+                return None, None
+            parser.write(chunk)
+        return events.popleft()
+    
+    # Skip other parts up to the file field's headers
+    while True:
+        kind, value = await next_event()
+        if kind is None:
+            raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Missing file")
+        if kind == "headers":
+            _, disposition = parse_options_header(value.get(b"content-disposition", b""))
+            if disposition.get(b"name") == field.encode() and b"filename" in disposition:
+                mime_type = value.get(b"content-type", b"").decode("latin-1")
+                break
+    
+    async def chunks():
+        while True:
+            kind, value = await next_event()
+            if kind == "data":
+                yield value
+            elif kind == "end":
+                return
+            elif kind is None:
+                raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Incomplete upload")
+    
+    return mime_type, chunks()
 
 
 @router.post("/upload")
 async def upload_log_photo(
-    file: UploadFile = File(...),
-    current_user: User = Depends(get_current_user)
+    request: Request,
+    current_user: UserPrincipal = Depends(get_current_user)
 ):
-    """Upload a photo for a log entry (returns base64 encoded data)"""
+    """Upload a photo for a log entry.
+
+    Accepts the raw image as request body (Content-Type: image/*) or a
+    multipart form with a `file` field. The image is streamed to disk in
+    chunks; the returned `upload_token` is passed as `photo_upload_token`
+    when creating the log.
+    """
+    content_type = request.headers.get("content-type", "")
+    
+    declared_size = request.headers.get("content-length")
+    if declared_size and declared_size.isdigit() and int(declared_size) > photo_store.MAX_PHOTO_BYTES + 64 * 1024:
+        raise HTTPException(
+            status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+            detail="File too large (max 5MB)"
+        )
+    
+    if content_type.startswith("multipart/form-data"):
+        mime_type, chunks = await _multipart_file(request)
+    else:
+        mime_type = content_type.split(";")[0].strip()
+        chunks = request.stream()
+    
     # Validate file
-    if not file.content_type.startswith('image/'):
+    if not mime_type.startswith("image/"):
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
             detail="File must be an image"
         )
     
-    # Check file size (5MB limit)
-    contents = await file.read()
-    if len(contents) > 5 * 1024 * 1024:
+    try:
+        upload_info = await photo_store.save_upload(chunks, current_user.id, mime_type)
+    except photo_store.PhotoTooLarge:
         raise HTTPException(
             status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
             detail="File too large (max 5MB)"
         )
     
-    # Return binary data - frontend will include this directly with the log submission
-    import base64
     return {
-        "photo_data": base64.b64encode(contents).decode('utf-8'),
-        "mime_type": file.content_type,
-        "size": len(contents)
+        "upload_token": upload_info["upload_token"],
+        "mime_type": upload_info["mime_type"],
+        "size": upload_info["size"]
     }
@@ -1,26 +1,18 @@
 from fastapi import APIRouter, Depends, HTTPException, status
 from sqlalchemy.orm import Session
-from sqlalchemy import text
-from sqlalchemy import func
-from geoalchemy2.functions import ST_GeomFromWKB, ST_X, ST_Y
 from typing import List, Optional
 from app.database import get_db
 from app.services import loot_service
 from app.routers.auth import get_current_user
 from app.schemas import SpotResponse
-from app.models import User
+from app.services.user_cache import UserPrincipal
+from app.ws import events
 from pydantic import BaseModel
 
 
 router = APIRouter(prefix="/api/loot", tags=["loot"])
 
 
-class SpawnLootRequest(BaseModel):
-    latitude: float
-    longitude: float
-    radius_meters: int = 500
-
-
 class CollectLootRequest(BaseModel):
     loot_spot_id: int
     latitude: float
@@ -41,59 +33,15 @@ class CollectLootResponse(BaseModel):
     total_xp: int = 0
 
 
-@router.post("/spawn", response_model=List[SpotResponse])
-async def spawn_loot(
-    request: SpawnLootRequest,
-    db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user)
-):
-    """Spawn loot spots around user's current position"""
-    spots = loot_service.spawn_loot_spots_for_user(
-        db,
-        current_user.id,
-        request.latitude,
-        request.longitude,
-        request.radius_meters
-    )
-    
-    # Extract coordinates from PostGIS POINT (cast Geography to Geometry)
-    result = []
-    for spot in spots:
-        from sqlalchemy import text
-        lat = db.execute(text("SELECT ST_Y(location::geometry) FROM spots WHERE id = :id"), {"id": spot.id}).scalar()
-        lon = db.execute(text("SELECT ST_X(location::geometry) FROM spots WHERE id = :id"), {"id": spot.id}).scalar()
-        
-        result.append(SpotResponse(
-            id=spot.id,
-            name=spot.name,
-            description=spot.description,
-            latitude=lat,
-            longitude=lon,
-            is_permanent=spot.is_permanent,
-            is_loot=spot.is_loot,
-            created_at=spot.created_at,
-            creator_id=spot.creator_id,
-            loot_expires_at=spot.loot_expires_at,
-            loot_xp=spot.loot_xp
-        ))
-    
-    return result
-
-
 @router.post("/collect", response_model=CollectLootResponse)
-async def collect_loot(
+def collect_loot(
     request: CollectLootRequest,
     db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user)
+    current_user: UserPrincipal = Depends(get_current_user)
 ):
     """Collect a loot spot"""
     try:
-        # Serialize loot collection per (user, loot_spot) to avoid rare race/transaction issues
-        db.execute(
-            text("SELECT pg_advisory_xact_lock(:key)"),
-            {"key": int(current_user.id) * 1000000 + int(request.loot_spot_id)},
-        )
-
+        # Concurrent collects are serialized by the loot store's atomic claim
         result = loot_service.collect_loot(
             db,
             current_user.id,
@@ -105,6 +53,7 @@ async def collect_loot(
         if not result.get("success"):
             raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=result.get("error") or "Error")
 
+        events.stats_changed(current_user.id)
         return CollectLootResponse(**result)
     except HTTPException:
         raise
@@ -122,42 +71,18 @@ async def collect_loot(
 
 
 @router.get("/active", response_model=List[SpotResponse])
-async def get_active_loot(
-    db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user)
+def get_active_loot(
+    current_user: UserPrincipal = Depends(get_current_user)
 ):
     """Get all active loot spots for current user"""
-    spots = loot_service.get_active_loot_spots(db, current_user.id)
-    
-    # Extract coordinates from PostGIS POINT (cast Geography to Geometry)
-    result = []
-    for spot in spots:
-        from sqlalchemy import text
-        lat = db.execute(text("SELECT ST_Y(location::geometry) FROM spots WHERE id = :id"), {"id": spot.id}).scalar()
-        lon = db.execute(text("SELECT ST_X(location::geometry) FROM spots WHERE id = :id"), {"id": spot.id}).scalar()
-        
-        result.append(SpotResponse(
-            id=spot.id,
-            name=spot.name,
-            description=spot.description,
-            latitude=lat,
-            longitude=lon,
-            is_permanent=spot.is_permanent,
-            is_loot=spot.is_loot,
-            created_at=spot.created_at,
-            creator_id=spot.creator_id,
-            loot_expires_at=spot.loot_expires_at,
-            loot_xp=spot.loot_xp
-        ))
-    
-    return result
+    drops = loot_service.get_active_loot_for_user(current_user.id)
+    return [loot_service.to_spot_response(drop) for drop in drops]
 
 
 @router.post("/cleanup")
-async def cleanup_expired(
-    db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user)
+def cleanup_expired(
+    current_user: UserPrincipal = Depends(get_current_user)
 ):
     """Cleanup expired loot spots for current user"""
-    count = loot_service.cleanup_expired_loot_for_user(db, current_user.id)
+    count = loot_service.cleanup_expired_loot_for_user(current_user.id)
     return {"removed": count}
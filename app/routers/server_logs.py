@@ -111,7 +111,7 @@ def read_tail_lines(file_path: Path, max_lines: int = 200, max_bytes: int = 1000
 
 
 @router.get("/server-logs")
-async def get_server_logs() -> Dict[str, Any]:
+def get_server_logs() -> Dict[str, Any]:
     """
     Get recent server log lines from client-debug.log.
     
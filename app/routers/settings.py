@@ -3,14 +3,15 @@ from sqlalchemy.orm import Session
 from app.database import get_db
 from app.schemas import UserSettingsUpdate, UserSettingsResponse
 from app.routers.auth import get_current_user
-from app.models import User, UserSettings, get_cet_now
+from app.models import UserSettings, get_cet_now
+from app.services.user_cache import UserPrincipal
 
 router = APIRouter(prefix="/api/settings", tags=["settings"])
 
 
 @router.get("/", response_model=UserSettingsResponse)
-async def get_user_settings(
-    current_user: User = Depends(get_current_user),
+def get_user_settings(
+    current_user: UserPrincipal = Depends(get_current_user),
     db: Session = Depends(get_db)
 ):
     """Get current user's settings"""
@@ -42,9 +43,9 @@ async def get_user_settings(
 
 
 @router.put("/", response_model=UserSettingsResponse)
-async def update_user_settings(
+def update_user_settings(
     settings_update: UserSettingsUpdate,
-    current_user: User = Depends(get_current_user),
+    current_user: UserPrincipal = Depends(get_current_user),
     db: Session = Depends(get_db)
 ):
     """Update user settings"""
@@ -2,20 +2,20 @@ from typing import List, Optional
 from fastapi import APIRouter, Depends, HTTPException, status, Query
 from sqlalchemy.orm import Session
 from sqlalchemy import func, select
-from geoalchemy2.functions import ST_X, ST_Y, ST_DistanceSphere, ST_MakePoint, ST_SetSRID, ST_GeomFromWKB
 from app.database import get_db
 from app.schemas import SpotCreate, SpotResponse
-from app.services import spot_service
+from app.services import geo_service, loot_service, spot_service
 from app.routers.auth import get_current_user
 from app.models import User, UserRole, Spot, Claim
+from app.services.user_cache import UserPrincipal
 
 router = APIRouter(prefix="/api/spots", tags=["spots"])
 
 
 @router.post("/", response_model=SpotResponse, status_code=status.HTTP_201_CREATED)
-async def create_spot(
+def create_spot(
     spot_data: SpotCreate,
-    current_user: User = Depends(get_current_user),
+    current_user: UserPrincipal = Depends(get_current_user),
     db: Session = Depends(get_db)
 ):
     """Create a new spot (Creator/Admin only)"""
@@ -27,10 +27,7 @@ async def create_spot(
     
     spot = spot_service.create_spot(db, spot_data, current_user)
     
-    # Extract coordinates for response (cast Geography to Geometry using PostgreSQL syntax)
-    from sqlalchemy import text
-    lat = db.execute(text("SELECT ST_Y(location::geometry) FROM spots WHERE id = :id"), {"id": spot.id}).scalar()
-    lon = db.execute(text("SELECT ST_X(location::geometry) FROM spots WHERE id = :id"), {"id": spot.id}).scalar()
+    lat, lon = geo_service.coordinates_of(db, spot) or (None, None)
     
     return SpotResponse(
         id=spot.id,
@@ -50,11 +47,11 @@ async def create_spot(
 
 
 @router.get("/nearby", response_model=List[SpotResponse])
-async def get_nearby_spots(
+def get_nearby_spots(
     latitude: float = Query(..., ge=-90, le=90),
     longitude: float = Query(..., ge=-180, le=180),
     radius: float = Query(1000, ge=0, le=10000),
-    current_user: User = Depends(get_current_user),
+    current_user: UserPrincipal = Depends(get_current_user),
     db: Session = Depends(get_db)
 ):
     """Get spots within radius of a location"""
@@ -96,9 +93,7 @@ async def get_nearby_spots(
     
     result = []
     for spot, distance in spots_with_distance:
-        from sqlalchemy import text
-        lat = db.execute(text("SELECT ST_Y(location::geometry) FROM spots WHERE id = :id"), {"id": spot.id}).scalar()
-        lon = db.execute(text("SELECT ST_X(location::geometry) FROM spots WHERE id = :id"), {"id": spot.id}).scalar()
+        lat, lon = geo_service.coordinates_of(db, spot) or (None, None)
         
         # Get cooldown status for non-loot spots
         cooldown_status = None
@@ -106,8 +101,6 @@ async def get_nearby_spots(
             log_status = spot_service.get_log_status(db, current_user.id, spot.id)
             # Determine status based on BOTH auto and manual cooldowns
             # Show cooldown if EITHER log type is on cooldown
-            PARTIAL_COOLDOWN_THRESHOLD_SECONDS = 150  # 2.5 minutes
-            
             # Use the maximum of auto and manual cooldowns for visual indicator
             max_cooldown = max(
                 log_status["auto_cooldown_remaining"],
@@ -116,7 +109,7 @@ async def get_nearby_spots(
             
             if max_cooldown == 0:
                 cooldown_status = "ready"
-            elif max_cooldown < PARTIAL_COOLDOWN_THRESHOLD_SECONDS:
+            elif max_cooldown < spot_service.PARTIAL_COOLDOWN_THRESHOLD_SECONDS:
                 cooldown_status = "partial"
             else:
                 cooldown_status = "cooldown"
@@ -146,15 +139,19 @@ async def get_nearby_spots(
             icon_name=spot.icon_name
         ))
     
+    # Active loot comes from the in-memory loot store
+    for drop, _ in loot_service.get_loot_in_radius(latitude, longitude, radius):
+        result.append(loot_service.to_spot_response(drop))
+    
     return result
 
 
 @router.get("/{spot_id}/details")
-async def get_spot_details(
+def get_spot_details(
     spot_id: int,
     latitude: float = Query(..., ge=-90, le=90),
     longitude: float = Query(..., ge=-180, le=180),
-    current_user: User = Depends(get_current_user),
+    current_user: UserPrincipal = Depends(get_current_user),
     db: Session = Depends(get_db)
 ):
     """Get detailed info about a spot including cooldown, my claims, distance, and dominance"""
@@ -165,16 +162,10 @@ async def get_spot_details(
             detail="Spot not found"
         )
     
-    # Get spot coordinates (cast Geography to Geometry using PostgreSQL syntax)
-    from sqlalchemy import text
-    lat = db.execute(text("SELECT ST_Y(location::geometry) FROM spots WHERE id = :id"), {"id": spot.id}).scalar()
-    lon = db.execute(text("SELECT ST_X(location::geometry) FROM spots WHERE id = :id"), {"id": spot.id}).scalar()
+    lat, lon = geo_service.coordinates_of(db, spot) or (None, None)
     
-    # Calculate distance to spot using ST_DistanceSphere for accurate meters
-    point = ST_SetSRID(ST_MakePoint(longitude, latitude), 4326)
-    distance_meters = db.execute(
-        ST_DistanceSphere(spot.location, point)
-    ).scalar() or 0
+    # Great-circle distance to the spot in meters
+    distance_meters = geo_service.distance_m(db, spot, latitude, longitude) or 0
     
     # Get cooldown remaining
     cooldown_seconds = spot_service.get_cooldown_remaining(db, current_user.id, spot_id)
@@ -229,9 +220,9 @@ async def get_spot_details(
 
 
 @router.get("/{spot_id}", response_model=SpotResponse)
-async def get_spot(
+def get_spot(
     spot_id: int,
-    current_user: User = Depends(get_current_user),
+    current_user: UserPrincipal = Depends(get_current_user),
     db: Session = Depends(get_db)
 ):
     """Get spot by ID"""
@@ -242,9 +233,7 @@ async def get_spot(
             detail="Spot not found"
         )
     
-    from sqlalchemy import text
-    lat = db.execute(text("SELECT ST_Y(location::geometry) FROM spots WHERE id = :id"), {"id": spot.id}).scalar()
-    lon = db.execute(text("SELECT ST_X(location::geometry) FROM spots WHERE id = :id"), {"id": spot.id}).scalar()
+    lat, lon = geo_service.coordinates_of(db, spot) or (None, None)
     
     return SpotResponse(
         id=spot.id,
@@ -266,9 +255,9 @@ async def get_spot(
 
 
 @router.delete("/{spot_id}", status_code=status.HTTP_204_NO_CONTENT)
-async def delete_spot(
+def delete_spot(
     spot_id: int,
-    current_user: User = Depends(get_current_user),
+    current_user: UserPrincipal = Depends(get_current_user),
     db: Session = Depends(get_db)
 ):
     """Delete a spot (Admin only or creator)"""
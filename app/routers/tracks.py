@@ -2,20 +2,19 @@ from typing import List
 from fastapi import APIRouter, Depends, HTTPException, status
 from sqlalchemy.orm import Session
 from sqlalchemy import func
-from geoalchemy2.functions import ST_X, ST_Y, ST_GeomFromWKB
 from app.database import get_db
 from app.schemas import TrackCreate, TrackResponse, TrackPointCreate, TrackWithPoints, TrackPointResponse
-from app.services import tracking_service
+from app.services import geo_service, tracking_service
 from app.routers.auth import get_current_user
-from app.models import User
+from app.services.user_cache import UserPrincipal
 
 router = APIRouter(prefix="/api/tracks", tags=["tracks"])
 
 
 @router.post("/", response_model=TrackResponse, status_code=status.HTTP_201_CREATED)
-async def start_track(
+def start_track(
     track_data: TrackCreate,
-    current_user: User = Depends(get_current_user),
+    current_user: UserPrincipal = Depends(get_current_user),
     db: Session = Depends(get_db)
 ):
     """Start a new track"""
@@ -32,10 +31,10 @@ async def start_track(
 
 
 @router.post("/{track_id}/points", response_model=TrackPointResponse)
-async def add_point_to_track(
+def add_point_to_track(
     track_id: int,
     point_data: TrackPointCreate,
-    current_user: User = Depends(get_current_user),
+    current_user: UserPrincipal = Depends(get_current_user),
     db: Session = Depends(get_db)
 ):
     """Add a point to an active track"""
@@ -47,10 +46,7 @@ async def add_point_to_track(
             detail="Track not found or not active"
         )
     
-    # Extract coordinates for response (cast Geography to Geometry)
-    from sqlalchemy import text
-    lat = db.execute(text("SELECT ST_Y(location::geometry) FROM track_points WHERE id = :id"), {"id": track_point.id}).scalar()
-    lon = db.execute(text("SELECT ST_X(location::geometry) FROM track_points WHERE id = :id"), {"id": track_point.id}).scalar()
+    lat, lon = geo_service.coordinates_of(db, track_point) or (None, None)
     
     return TrackPointResponse(
         id=track_point.id,
@@ -63,9 +59,9 @@ async def add_point_to_track(
 
 
 @router.post("/{track_id}/end", response_model=TrackResponse)
-async def end_track(
+def end_track(
     track_id: int,
-    current_user: User = Depends(get_current_user),
+    current_user: UserPrincipal = Depends(get_current_user),
     db: Session = Depends(get_db)
 ):
     """End an active track"""
@@ -87,8 +83,8 @@ async def end_track(
 
 
 @router.get("/", response_model=List[TrackResponse])
-async def list_all_tracks(
-    current_user: User = Depends(get_current_user),
+def list_all_tracks(
+    current_user: UserPrincipal = Depends(get_current_user),
     db: Session = Depends(get_db)
 ):
     """Get all tracks for current user"""
@@ -96,9 +92,9 @@ async def list_all_tracks(
 
 
 @router.get("/me", response_model=List[TrackResponse])
-async def get_my_tracks(
+def get_my_tracks(
     active_only: bool = False,
-    current_user: User = Depends(get_current_user),
+    current_user: UserPrincipal = Depends(get_current_user),
     db: Session = Depends(get_db)
 ):
     """Get current user's tracks"""
@@ -107,9 +103,9 @@ async def get_my_tracks(
 
 
 @router.get("/{track_id}", response_model=TrackWithPoints)
-async def get_track_details(
+def get_track_details(
     track_id: int,
-    current_user: User = Depends(get_current_user),
+    current_user: UserPrincipal = Depends(get_current_user),
     db: Session = Depends(get_db)
 ):
     """Get track with all its points"""
@@ -124,9 +120,7 @@ async def get_track_details(
     # Convert points to response format
     points = []
     for point in track.points:
-        from sqlalchemy import text
-        lat = db.execute(text("SELECT ST_Y(location::geometry) FROM track_points WHERE id = :id"), {"id": point.id}).scalar()
-        lon = db.execute(text("SELECT ST_X(location::geometry) FROM track_points WHERE id = :id"), {"id": point.id}).scalar()
+        lat, lon = geo_service.coordinates_of(db, point) or (None, None)
         
         points.append(TrackPointResponse(
             id=point.id,
@@ -150,8 +150,20 @@ class LogCreate(BaseModel):
     longitude: float = Field(..., ge=-180, le=180)
     is_auto: bool = False  # Whether this is an auto-log
     notes: Optional[str] = None
-    photo_data: Optional[str] = None  # Base64 encoded binary data
+    photo_upload_token: Optional[str] = None  # Token from POST /api/logs/upload
+    photo_data: Optional[str] = None  # Base64 encoded binary data (legacy clients)
     photo_mime: Optional[str] = None  # MIME type
+    client_key: Optional[str] = Field(None, min_length=8, max_length=64)  # Idempotency key (retries)
+
+
+class LogSyncItem(LogCreate):
+    """A log made while offline, replayed by POST /api/logs/sync"""
+    client_key: str = Field(..., min_length=8, max_length=64)
+    client_timestamp: datetime  # When the log happened on the device
+
+
+class LogSyncRequest(BaseModel):
+    logs: List[LogSyncItem] = Field(..., max_length=100)
 
 
 class LogResponse(BaseModel):
@@ -174,6 +186,17 @@ class LogResponse(BaseModel):
         from_attributes = True
 
 
+class LogSyncResult(BaseModel):
+    client_key: str
+    status: str  # created | duplicate | cooldown | rejected
+    log: Optional[LogResponse] = None
+    detail: Optional[str] = None
+
+
+class LogSyncResponse(BaseModel):
+    results: List[LogSyncResult]
+
+
 # Claim Schemas
 class ClaimResponse(BaseModel):
     id: int
@@ -1,10 +1,11 @@
 """Admin service for managing game settings and database operations"""
 import json
 import re
-from typing import Optional, Dict, Any, List
-from sqlalchemy.orm import Session
+from typing import Optional, Dict, Any, List, Tuple
+from sqlalchemy.orm import Session, joinedload
 from sqlalchemy import func
 from app.models import GameSetting, User, Spot, Log, Claim, Track, Item, UserRole
+from app.services import log_service, spot_service, user_cache
 
 
 # Default game settings
@@ -182,7 +183,14 @@ def get_users_list(db: Session, skip: int = 0, limit: int = 50, role: Optional[s
 
 def get_spots_list(db: Session, skip: int = 0, limit: int = 50) -> List[Dict[str, Any]]:
     """Get list of spots"""
-    spots = db.query(Spot).order_by(Spot.id.desc()).offset(skip).limit(limit).all()
+    spots = (
+        db.query(Spot)
+        .options(joinedload(Spot.creator))
+        .order_by(Spot.id.desc())
+        .offset(skip)
+        .limit(limit)
+        .all()
+    )
     
     return [
         {
@@ -201,25 +209,30 @@ def get_spots_list(db: Session, skip: int = 0, limit: int = 50) -> List[Dict[str
     ]
 
 
-def get_logs_list(db: Session, skip: int = 0, limit: int = 50) -> List[Dict[str, Any]]:
-    """Get recent logs"""
-    logs = db.query(Log).order_by(Log.timestamp.desc()).offset(skip).limit(limit).all()
+def get_logs_list(db: Session, limit: int = 50, cursor: Optional[str] = None) -> Tuple[List[Dict[str, Any]], Optional[str]]:
+    """Get a page of recent logs; returns (logs, next_cursor)"""
+    query = db.query(
+        Log.id, Log.user_id, User.username, Log.spot_id, Spot.name.label("spot_name"),
+        Log.xp_gained, Log.claim_points, Log.is_auto, Log.distance, Log.timestamp,
+    ).outerjoin(User, User.id == Log.user_id).outerjoin(Spot, Spot.id == Log.spot_id)
+    rows, next_cursor = log_service.paginate_logs(query, limit, cursor)
     
-    return [
+    logs = [
         {
             "id": l.id,
             "user_id": l.user_id,
-            "user": l.user.username if l.user else "Unknown",
+            "user": l.username or "Unknown",
             "spot_id": l.spot_id,
-            "spot": l.spot.name if l.spot else "Unknown",
+            "spot": l.spot_name or "Unknown",
             "xp_gained": l.xp_gained,
             "claim_points": l.claim_points,
             "is_auto": l.is_auto,
             "distance": l.distance,
             "timestamp": l.timestamp.isoformat() if l.timestamp else None,
         }
-        for l in logs
+        for l in rows
     ]
+    return logs, next_cursor
 
 
 def update_user_role(db: Session, user_id: int, new_role: str) -> bool:
@@ -231,6 +244,7 @@ def update_user_role(db: Session, user_id: int, new_role: str) -> bool:
     try:
         user.role = UserRole[new_role.upper()]
         db.commit()
+        user_cache.invalidate_user(user_id)
         return True
     except (KeyError, ValueError):
         return False
@@ -244,6 +258,7 @@ def toggle_user_active(db: Session, user_id: int) -> bool:
     
     user.is_active = not user.is_active
     db.commit()
+    user_cache.invalidate_user(user_id)
     return True
 
 
@@ -255,6 +270,7 @@ def delete_user(db: Session, user_id: int) -> bool:
     
     db.delete(user)
     db.commit()
+    user_cache.invalidate_user(user_id)
     return True
 
 
@@ -266,6 +282,7 @@ def delete_spot(db: Session, spot_id: int) -> bool:
     
     db.delete(spot)
     db.commit()
+    spot_service.invalidate_geofences()
     return True
 
 
@@ -281,13 +298,12 @@ def create_spot(
 ) -> Optional[Spot]:
     """Create a new spot"""
     try:
-        from geoalchemy2 import func as geo_func
-        from sqlalchemy import text
+        from app.services import geo_service
         
         spot = Spot(
             name=name,
             description=description,
-            location=text(f"ST_Point({longitude}, {latitude})"),
+            location=geo_service.point_value(latitude, longitude),
             spot_type=spot_type,
             xp_reward=xp_reward,
             created_by=creator_id,
@@ -295,6 +311,7 @@ def create_spot(
         db.add(spot)
         db.commit()
         db.refresh(spot)
+        spot_service.invalidate_geofences()
         return spot
     except Exception as e:
         db.rollback()
@@ -335,4 +352,5 @@ def update_player_color(db: Session, user_id: int, color: str) -> Optional[str]:
     
     user.heatmap_color = color.upper()
     db.commit()
+    user_cache.invalidate_user(user_id)
     return None
@@ -1,8 +1,13 @@
+import asyncio
+import threading
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timedelta
-from typing import Optional
+from typing import Optional, Tuple
 from jose import JWTError, jwt
 import bcrypt
+from sqlalchemy import update
 from sqlalchemy.orm import Session
+from starlette.concurrency import run_in_threadpool
 from app.models import User, UserRole
 from app.schemas import UserCreate
 from app.config import settings
@@ -21,6 +26,44 @@ def get_password_hash(password: str) -> str:
     return hashed.decode('utf-8')
 
 
+# bcrypt costs ~100-300 ms of CPU per call. Login and registration hash on a
+# small dedicated pool (bcrypt releases the GIL): at most AUTH_HASH_WORKERS run
+# at once, and a login burst neither blocks the event loop nor ties up the
+# threadpool that serves the sync routes.
+_hash_executor: Optional[ThreadPoolExecutor] = None
+_hash_executor_lock = threading.Lock()
+
+
+def _get_hash_executor() -> ThreadPoolExecutor:
+    global _hash_executor
+    with _hash_executor_lock:
+        if _hash_executor is None:
+            _hash_executor = ThreadPoolExecutor(
+                max_workers=max(1, settings.AUTH_HASH_WORKERS), thread_name_prefix="bcrypt"
+            )
+        return _hash_executor
+
+
+async def verify_password_async(plain_password: str, hashed_password: str) -> bool:
+    """verify_password on the hashing pool"""
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(_get_hash_executor(), verify_password, plain_password, hashed_password)
+
+
+async def get_password_hash_async(password: str) -> str:
+    """get_password_hash on the hashing pool"""
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(_get_hash_executor(), get_password_hash, password)
+
+
+def shutdown_hash_executor():
+    global _hash_executor
+    with _hash_executor_lock:
+        if _hash_executor is not None:
+            _hash_executor.shutdown(wait=False, cancel_futures=True)
+            _hash_executor = None
+
+
 def create_access_token(data: dict, expires_delta: Optional[timedelta] = None) -> str:
     """Create JWT access token"""
     to_encode = data.copy()
@@ -33,9 +76,14 @@ def create_access_token(data: dict, expires_delta: Optional[timedelta] = None) -
     return encoded_jwt
 
 
+def get_user_for_login(db: Session, username: str) -> Optional[User]:
+    """Get user by username, case-insensitive"""
+    return db.query(User).filter(User.username.ilike(username)).first()
+
+
 def authenticate_user(db: Session, username: str, password: str) -> Optional[User]:
     """Authenticate a user (case-insensitive username)"""
-    user = db.query(User).filter(User.username.ilike(username)).first()
+    user = get_user_for_login(db, username)
     if not user:
         return None
     if not verify_password(password, user.hashed_password):
@@ -43,9 +91,20 @@ def authenticate_user(db: Session, username: str, password: str) -> Optional[Use
     return user
 
 
-def create_user(db: Session, user_data: UserCreate) -> User:
-    """Create a new user"""
-    hashed_password = get_password_hash(user_data.password)
+async def authenticate_user_async(db: Session, username: str, password: str) -> Optional[User]:
+    """authenticate_user for async routes: lookup in the threadpool, bcrypt on the hashing pool"""
+    user = await run_in_threadpool(get_user_for_login, db, username)
+    if not user:
+        return None
+    if not await verify_password_async(password, user.hashed_password):
+        return None
+    return user
+
+
+def create_user(db: Session, user_data: UserCreate, hashed_password: Optional[str] = None) -> User:
+    """Create a new user (hashes the password unless `hashed_password` is given)"""
+    if hashed_password is None:
+        hashed_password = get_password_hash(user_data.password)
     
     # Create user (need to commit to get the ID)
     db_user = User(
@@ -75,7 +134,7 @@ def get_user_by_id(db: Session, user_id: int) -> Optional[User]:
     return db.query(User).filter(User.id == user_id).first()
 
 
-def update_user_xp(db: Session, user: User, xp_gain: int) -> User:
+def update_user_xp(db: Session, user: User, xp_gain: int, commit: bool = True) -> User:
     """Update user XP and handle level-ups"""
     user.xp += xp_gain
 
@@ -89,6 +148,40 @@ def update_user_xp(db: Session, user: User, xp_gain: int) -> User:
     if computed_level > current_level:
         user.level = computed_level
     
-    db.commit()
-    db.refresh(user)
+    if commit:
+        db.commit()
+        db.refresh(user)
     return user
+
+
+def award_xp(db: Session, user_id: int, xp_gain: int) -> Optional[Tuple[int, int, bool]]:
+    """Add XP with an atomic UPDATE ... RETURNING instead of load-modify-store (no commit).
+
+    Returns (xp, level, level_up), or None if the user does not exist.
+    """
+    row = db.execute(
+        update(User)
+        .where(User.id == user_id)
+        .values(xp=User.xp + xp_gain)
+        .returning(User.xp, User.level)
+        .execution_options(synchronize_session=False)
+    ).first()
+    if row is None:
+        return None
+
+    from app.services.progression_service import get_level_curve_params, level_from_xp
+
+    xp, level = int(row.xp or 0), int(row.level or 1)
+    base, inc = get_level_curve_params(db)
+    computed_level = level_from_xp(xp, base, inc)
+
+    # Never decrease level (keeps legacy players intact if curve changes)
+    if computed_level <= level:
+        return xp, level, False
+    db.execute(
+        update(User)
+        .where(User.id == user_id, User.level < computed_level)
+        .values(level=computed_level)
+        .execution_options(synchronize_session=False)
+    )
+    return xp, computed_level, True
@@ -1,12 +1,17 @@
 from __future__ import annotations
 
+import threading
+import time
 from dataclasses import dataclass
-from datetime import timedelta
-from typing import Tuple
+from datetime import datetime, timedelta
+from typing import Dict, Optional, Tuple
 
+from sqlalchemy import delete, select
 from sqlalchemy.orm import Session
 
+from app.config import settings
 from app.models import UserBuff, get_cet_now
+from app.services import metrics
 
 
 @dataclass(frozen=True)
@@ -16,33 +21,28 @@ class BuffModifiers:
     range_bonus_m: float = 0.0
 
 
-def cleanup_expired_buffs(db: Session, user_id: int) -> int:
-    """Delete expired buffs for a user. Returns number of deleted rows."""
-    now = get_cet_now()
-    deleted = (
-        db.query(UserBuff)
-        .filter(UserBuff.user_id == user_id, UserBuff.expires_at <= now)
-        .delete(synchronize_session=False)
-    )
-    if deleted:
-        db.commit()
-    return int(deleted or 0)
+def cleanup_expired_buffs(db: Session, now: Optional[datetime] = None, batch_size: Optional[int] = None) -> int:
+    """Delete expired buffs of all users (at most batch_size rows). Returns number of deleted rows.
 
+    Runs from the background scheduler; lookups simply ignore expired rows.
+    """
+    now = now or get_cet_now()
+    expired = select(UserBuff.id).where(UserBuff.expires_at <= now)
+    if batch_size:
+        expired = expired.order_by(UserBuff.id).limit(batch_size)
+    deleted = db.execute(
+        delete(UserBuff).where(UserBuff.id.in_(expired)).execution_options(synchronize_session=False)
+    ).rowcount
+    db.commit()
+    return int(deleted or 0)
 
-def get_active_modifiers(db: Session, user_id: int) -> BuffModifiers:
-    """Compute effective modifiers from all active buffs (expired ones are cleaned up)."""
-    cleanup_expired_buffs(db, user_id)
-
-    now = get_cet_now()
-    buffs = (
-        db.query(UserBuff)
-        .filter(UserBuff.user_id == user_id, UserBuff.expires_at > now)
-        .all()
-    )
 
+def _combine(buffs) -> Tuple[BuffModifiers, Optional[datetime]]:
+    """Combined modifiers of active buffs and the earliest time one of them expires"""
     xp_multiplier = 1.0
     claim_multiplier = 1.0
     range_bonus_m = 0.0
+    earliest_expiry = None
 
     for buff in buffs:
         try:
@@ -51,12 +51,126 @@ def get_active_modifiers(db: Session, user_id: int) -> BuffModifiers:
             range_bonus_m += float(buff.range_bonus_m or 0.0)
         except Exception:
             continue
+        if earliest_expiry is None or buff.expires_at < earliest_expiry:
+            earliest_expiry = buff.expires_at
 
-    return BuffModifiers(
+    modifiers = BuffModifiers(
         xp_multiplier=xp_multiplier,
         claim_multiplier=claim_multiplier,
         range_bonus_m=range_bonus_m,
     )
+    return modifiers, earliest_expiry
+
+
+class ModifierCache:
+    """Per-user combined modifiers, valid until the user's earliest active buff expires.
+
+    After warm() every user without an entry is known to have no buffs, so
+    the common no-buff lookup needs no query. Entries are recomputed once
+    their earliest expiry passes or after create_buff_from_item_effects.
+    Buffs created by another worker (or a script) are not invalidated here,
+    so the warm state and every entry are also re-checked after
+    BUFF_CACHE_TTL seconds.
+    """
+
+    _STALE = object()
+
+    def __init__(self):
+        # user_id -> (modifiers, earliest expiry, monotonic time it was loaded)
+        self._entries: Dict[int, object] = {}
+        self._lock = threading.Lock()
+        self._warm_all = False
+        self._warmed_at = 0.0
+        self._last_prune = time.monotonic()
+        # Bumped by every invalidation; a load that raced with one is not stored
+        self._generation = 0
+
+    @staticmethod
+    def _fresh(loaded_at: float) -> bool:
+        return time.monotonic() - loaded_at < max(0.0, float(settings.BUFF_CACHE_TTL))
+
+    def warm(self, db: Session, now: datetime) -> int:
+        """Load all active buffs; returns the number of users with buffs"""
+        loaded_at = time.monotonic()
+        by_user: Dict[int, list] = {}
+        for buff in db.query(UserBuff).filter(UserBuff.expires_at > now):
+            by_user.setdefault(buff.user_id, []).append(buff)
+        with self._lock:
+            self._entries = {
+                user_id: _combine(buffs) + (loaded_at,) for user_id, buffs in by_user.items()
+            }
+            self._warm_all = True
+            self._warmed_at = loaded_at
+            self._generation += 1
+        return len(by_user)
+
+    def get(self, db: Session, user_id: int, now: datetime) -> BuffModifiers:
+        entry = self._entries.get(user_id)
+        if entry is None and self._warm_all and self._fresh(self._warmed_at):
+            metrics.cache_lookups.inc("buff_modifiers", "hit")
+            return NO_BUFFS
+        if entry is not None and entry is not self._STALE:
+            modifiers, earliest_expiry, loaded_at = entry
+            if (earliest_expiry is None or now < earliest_expiry) and self._fresh(loaded_at):
+                metrics.cache_lookups.inc("buff_modifiers", "hit")
+                return modifiers
+
+        metrics.cache_lookups.inc("buff_modifiers", "miss")
+        loaded_at = time.monotonic()
+        with self._lock:
+            generation = self._generation
+        buffs = (
+            db.query(UserBuff)
+            .filter(UserBuff.user_id == user_id, UserBuff.expires_at > now)
+            .all()
+        )
+        modifiers, earliest_expiry = _combine(buffs)
+        with self._lock:
+            if generation != self._generation:
+                # Invalidated while we queried (e.g. a buff was just created): the next lookup reloads
+                return modifiers
+            if self._warm_all and earliest_expiry is None and self._fresh(self._warmed_at):
+                self._entries.pop(user_id, None)
+            else:
+                self._entries[user_id] = (modifiers, earliest_expiry, loaded_at)
+            self._prune(loaded_at)
+        return modifiers
+
+    def _prune(self, now: float):
+        """Drop expired entries about once per TTL (called with the lock held)"""
+        ttl = max(0.0, float(settings.BUFF_CACHE_TTL))
+        if now - self._last_prune < ttl:
+            return
+        self._last_prune = now
+        self._entries = {
+            user_id: entry for user_id, entry in self._entries.items()
+            if entry is self._STALE or now - entry[2] < ttl
+        }
+
+    def invalidate(self, user_id: int):
+        with self._lock:
+            self._generation += 1
+            self._entries[user_id] = self._STALE
+
+    def clear(self):
+        with self._lock:
+            self._generation += 1
+            self._entries.clear()
+            self._warm_all = False
+
+
+NO_BUFFS = BuffModifiers()
+modifier_cache = ModifierCache()
+
+
+def warm_modifier_cache(db: Session) -> int:
+    """Load all active buffs into the modifier cache (called at startup)"""
+    return modifier_cache.warm(db, get_cet_now())
+
+
+def get_active_modifiers(db: Session, user_id: int) -> BuffModifiers:
+    """Compute effective modifiers from all active buffs (cached until the next buff expires)."""
+    return modifier_cache.get(db, user_id, get_cet_now())
 
 
 def create_buff_from_item_effects(
@@ -87,4 +201,5 @@ def create_buff_from_item_effects(
     db.add(buff)
     db.commit()
     db.refresh(buff)
+    modifier_cache.invalidate(user_id)
     return buff
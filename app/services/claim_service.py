@@ -1,8 +1,9 @@
 from typing import List
 from sqlalchemy.orm import Session
-from sqlalchemy import func, text
+from sqlalchemy import func
 from app.models import Claim, User, Spot
 from app.schemas import HeatmapData, HeatmapPoint
+from app.services import geo_service
 
 
 def get_user_heatmap(db: Session, user_id: int) -> HeatmapData:
@@ -22,15 +23,12 @@ def get_user_heatmap(db: Session, user_id: int) -> HeatmapData:
         Claim.claim_value > 0
     ).all()
     
+    coordinates = geo_service.coordinates_map(db, [spot for _, spot in claims])
     points = []
     for claim, spot in claims:
-        # Extract coordinates from PostGIS geometry (cast Geography to Geometry)
-        coords = db.execute(
-            text("SELECT ST_X(location::geometry), ST_Y(location::geometry) FROM spots WHERE id = :id"), 
-            {"id": spot.id}
-        ).fetchone()
+        coords = coordinates.get(spot.id)
         if coords:
-            lon, lat = coords
+            lat, lon = coords
             points.append(HeatmapPoint(
                 latitude=lat,
                 longitude=lon,
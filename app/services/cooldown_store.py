@@ -0,0 +1,221 @@
+"""
+Per-(user, spot) log cooldown table.
+
+Holds the last auto and manual log time for every (user, spot) pair that is
+still inside LOG_COOLDOWN, so cooldown checks are memory lookups instead of
+`Log` queries. The table is warmed from the last LOG_COOLDOWN seconds of logs
+at startup (and lazily per user if that did not happen), and
+log_service.commit_logs writes through to it while the user's log lock is
+still held.
+
+The default backend lives in process memory and is only correct with a single
+worker. Set COOLDOWN_STORE=redis to share the table between workers.
+"""
+import logging
+import threading
+import time
+from datetime import datetime, timedelta
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+
+from sqlalchemy.orm import Session
+
+from app.config import settings
+from app.database import session_scope
+from app.models import Log, get_cet_now
+
+logger = logging.getLogger(__name__)
+
+_EPOCH = datetime(1970, 1, 1)
+
+
+def to_seconds(timestamp: datetime) -> float:
+    """Log timestamps are naive CET; compare them on a plain seconds scale"""
+    return (timestamp - _EPOCH).total_seconds()
+
+
+class MemoryCooldownBackend:
+    """(user_id, spot_id) -> [last_auto, last_manual] in this process"""
+
+    SWEEP_INTERVAL_SECONDS = 60
+
+    def __init__(self):
+        self._entries: Dict[Tuple[int, int], List[float]] = {}
+        self._lock = threading.Lock()
+        self._last_sweep = time.monotonic()
+
+    def get(self, user_id: int, spot_id: int) -> Tuple[float, float]:
+        entry = self._entries.get((user_id, spot_id))
+        if entry is None:
+            return 0.0, 0.0
+        return entry[0], entry[1]
+
+    def record(self, user_id: int, spot_id: int, is_auto: bool, at: float, ttl_seconds: int) -> float:
+        """Store `at` if newer; returns the previous value"""
+        index = 0 if is_auto else 1
+        with self._lock:
+            entry = self._entries.setdefault((user_id, spot_id), [0.0, 0.0])
+            previous = entry[index]
+            entry[index] = max(previous, at)
+
+            if time.monotonic() - self._last_sweep > self.SWEEP_INTERVAL_SECONDS:
+                self._last_sweep = time.monotonic()
+                # Entries older than the cooldown behave exactly like missing ones
+                cutoff = at - ttl_seconds
+                self._entries = {
+                    key: value for key, value in self._entries.items() if max(value) > cutoff
+                }
+        return previous
+
+    def revert(self, user_id: int, spot_id: int, is_auto: bool, at: float, previous: float):
+        """Undo record() unless a newer log was recorded since"""
+        index = 0 if is_auto else 1
+        with self._lock:
+            entry = self._entries.get((user_id, spot_id))
+            if entry is not None and entry[index] == at:
+                entry[index] = previous
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+
+class RedisCooldownBackend:
+    """Shared table in Redis: one hash per (user, spot) expiring after the cooldown"""
+
+    # HSET only if newer, then refresh the TTL; returns the previous value
+    _RECORD_SCRIPT = """
+local current = redis.call('HGET', KEYS[1], ARGV[1]) or '0'
+if tonumber(current) < tonumber(ARGV[2]) then
+    redis.call('HSET', KEYS[1], ARGV[1], ARGV[2])
+end
+redis.call('EXPIRE', KEYS[1], ARGV[3])
+return current
+"""
+
+    # Restore the previous value unless a newer log was recorded since
+    _REVERT_SCRIPT = """
+if redis.call('HGET', KEYS[1], ARGV[1]) == ARGV[2] then
+    if tonumber(ARGV[3]) > 0 then
+        redis.call('HSET', KEYS[1], ARGV[1], ARGV[3])
+    else
+        redis.call('HDEL', KEYS[1], ARGV[1])
+    end
+end
+"""
+
+    def __init__(self, url: str, prefix: str = "claim:cooldown"):
+        import redis
+
+        self._redis = redis.Redis.from_url(url)
+        self._redis.ping()
+        self._prefix = prefix
+        self._record = self._redis.register_script(self._RECORD_SCRIPT)
+        self._revert = self._redis.register_script(self._REVERT_SCRIPT)
+
+    def _key(self, user_id: int, spot_id: int) -> str:
+        return f"{self._prefix}:{user_id}:{spot_id}"
+
+    def get(self, user_id: int, spot_id: int) -> Tuple[float, float]:
+        auto, manual = self._redis.hmget(self._key(user_id, spot_id), "auto", "manual")
+        return float(auto or 0.0), float(manual or 0.0)
+
+    def record(self, user_id: int, spot_id: int, is_auto: bool, at: float, ttl_seconds: int) -> float:
+        field = "auto" if is_auto else "manual"
+        return float(self._record(keys=[self._key(user_id, spot_id)], args=[field, at, max(1, int(ttl_seconds))]))
+
+    def revert(self, user_id: int, spot_id: int, is_auto: bool, at: float, previous: float):
+        field = "auto" if is_auto else "manual"
+        self._revert(keys=[self._key(user_id, spot_id)], args=[field, at, previous])
+
+    def clear(self):
+        for key in self._redis.scan_iter(match=f"{self._prefix}:*"):
+            self._redis.delete(key)
+
+
+class CooldownStore:
+    """Cooldown lookups with write-through from create_log"""
+
+    def __init__(self, backend=None):
+        self.backend = backend or MemoryCooldownBackend()
+        self._warm_all = False
+        self._warm_users: Set[int] = set()
+
+    @staticmethod
+    def _ttl() -> int:
+        return int(settings.LOG_COOLDOWN)
+
+    def _load(self, rows: Iterable[Tuple[int, int, bool, datetime]]) -> int:
+        count = 0
+        for user_id, spot_id, is_auto, timestamp in rows:
+            if timestamp is None:
+                continue
+            self.backend.record(user_id, spot_id, bool(is_auto), to_seconds(timestamp), self._ttl())
+            count += 1
+        return count
+
+    def _recent_logs(self, db: Session, now: datetime):
+        cutoff = now - timedelta(seconds=self._ttl())
+        return db.query(Log.user_id, Log.spot_id, Log.is_auto, Log.timestamp).filter(Log.timestamp > cutoff)
+
+    def warm(self, db: Session, now: datetime) -> int:
+        """Load all logs of the last LOG_COOLDOWN seconds"""
+        count = self._load(self._recent_logs(db, now))
+        self._warm_all = True
+        return count
+
+    def ensure_user(self, db: Session, user_id: int, now: datetime):
+        """Load a user's recent logs unless the table is already warm for them"""
+        if self._warm_all or user_id in self._warm_users:
+            return
+        self._load(self._recent_logs(db, now).filter(Log.user_id == user_id))
+        self._warm_users.add(user_id)
+
+    def record(self, user_id: int, spot_id: int, is_auto: bool, timestamp: datetime) -> float:
+        """Write-through for a log about to be committed; returns the value to pass to revert()"""
+        return self.backend.record(user_id, spot_id, is_auto, to_seconds(timestamp), self._ttl())
+
+    def revert(self, user_id: int, spot_id: int, is_auto: bool, timestamp: datetime, previous: float):
+        """Undo record() after the log's transaction failed"""
+        self.backend.revert(user_id, spot_id, is_auto, to_seconds(timestamp), previous)
+
+    def last_logs(self, db: Session, user_id: int, spot_id: int, now: datetime) -> Tuple[Optional[float], Optional[float]]:
+        """Seconds since the last (auto, manual) log inside the cooldown window, None if there is none"""
+        self.ensure_user(db, user_id, now)
+        now_s = to_seconds(now)
+        ttl = self._ttl()
+        result = []
+        for at in self.backend.get(user_id, spot_id):
+            elapsed = now_s - at
+            result.append(elapsed if at and elapsed < ttl else None)
+        return result[0], result[1]
+
+    def clear(self):
+        self.backend.clear()
+        self._warm_all = False
+        self._warm_users.clear()
+
+
+def warm_from_database() -> int:
+    """Warm the shared store from recent logs (called at startup)"""
+    with session_scope() as db:
+        return store.warm(db, get_cet_now())
+
+
+def create_store() -> CooldownStore:
+    """Build the store configured by COOLDOWN_STORE ("memory" or "redis")"""
+    kind = (settings.COOLDOWN_STORE or "memory").lower()
+    if kind == "redis":
+        url = settings.COOLDOWN_STORE_URL or settings.WS_BROKER_URL
+        try:
+            return CooldownStore(RedisCooldownBackend(url))
+        except Exception as e:
+            logger.error(f"Redis cooldown store unavailable ({e}); using in-process store")
+    elif kind != "memory":
+        logger.warning(f"Unknown COOLDOWN_STORE '{settings.COOLDOWN_STORE}'; using in-process store")
+    return CooldownStore()
+
+
+store = create_store()
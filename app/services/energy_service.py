@@ -9,7 +9,7 @@ This service provides functionality for:
 """
 
 from sqlalchemy.orm import Session
-from sqlalchemy import func, desc
+from sqlalchemy import delete, desc, func, select
 from typing import List, Dict, Optional
 from datetime import datetime, timedelta
 import logging
@@ -346,22 +346,28 @@ class EnergyService:
         return settings
 
     @staticmethod
-    def cleanup_old_metrics(db: Session, days: int = 30) -> int:
+    def cleanup_old_metrics(db: Session, days: int = 30, batch_size: Optional[int] = None) -> int:
         """
         Clean up old energy metrics to save database space.
         
         Args:
             db: Database session
             days: Number of days to keep
+            batch_size: Delete at most this many records (None: all)
             
         Returns:
             Number of deleted records
         """
         cutoff_date = get_cet_now() - timedelta(days=days)
         
-        deleted = db.query(EnergyMetric).filter(
-            EnergyMetric.timestamp < cutoff_date
-        ).delete()
+        old = select(EnergyMetric.id).where(EnergyMetric.timestamp < cutoff_date)
+        if batch_size:
+            old = old.order_by(EnergyMetric.id).limit(batch_size)
+        deleted = db.execute(
+            delete(EnergyMetric)
+            .where(EnergyMetric.id.in_(old))
+            .execution_options(synchronize_session=False)
+        ).rowcount or 0
         
         db.commit()
         
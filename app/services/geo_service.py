@@ -0,0 +1,308 @@
+"""
+Geodesic helpers that work without PostGIS round trips.
+
+Location columns are PostGIS Geography on PostgreSQL and WKT text on SQLite
+(see models.get_location_column). Everything here accepts both:
+
+- point_value()/line_value() build column values for inserts,
+- point_coordinates() decodes a loaded column value (WKT or EWKB) in Python,
+  so distance checks are a haversine on coordinates already in memory,
+- spots_within() answers radius queries with ST_DWithin on PostGIS or with a
+  vectorized bounding-box + haversine scan over cached coordinate arrays
+  (SQLite, or GEO_BACKEND=memory).
+"""
+import math
+import re
+import struct
+import threading
+import time
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+
+from sqlalchemy import text
+from sqlalchemy.orm import Session
+
+from app.config import settings
+
+try:
+    import numpy as np
+except ImportError:  # pragma: no cover - NumPy is optional, loops are used instead
+    np = None
+
+EARTH_RADIUS_M = 6371008.8  # Mean earth radius (same sphere as ST_DistanceSphere)
+METERS_PER_DEGREE_LAT = math.pi * EARTH_RADIUS_M / 180.0
+
+_WKT_POINT_RE = re.compile(r"POINT\s*\(\s*([-+0-9.eE]+)\s+([-+0-9.eE]+)\s*\)", re.IGNORECASE)
+_HEX_RE = re.compile(r"^[0-9a-fA-F]+$")
+_POINT_TABLES = ("spots", "logs", "track_points")
+
+LatLon = Tuple[float, float]
+
+
+def haversine_m(lat1: float, lon1: float, lat2: float, lon2: float) -> float:
+    """Great-circle distance between two WGS84 points in meters"""
+    phi1 = math.radians(lat1)
+    phi2 = math.radians(lat2)
+    dphi = phi2 - phi1
+    dlmb = math.radians(lon2 - lon1)
+    a = math.sin(dphi / 2) ** 2 + math.cos(phi1) * math.cos(phi2) * math.sin(dlmb / 2) ** 2
+    return 2 * EARTH_RADIUS_M * math.asin(min(1.0, math.sqrt(a)))
+
+
+def path_length_m(points: Sequence[LatLon]) -> float:
+    """Length of a polyline of (lat, lon) points in meters"""
+    return sum(
+        haversine_m(lat1, lon1, lat2, lon2)
+        for (lat1, lon1), (lat2, lon2) in zip(points, points[1:])
+    )
+
+
+def parse_point_wkt(value) -> Optional[LatLon]:
+    """Parse 'POINT(lon lat)' (optionally 'SRID=4326;POINT(...)') into (lat, lon)"""
+    if value is None:
+        return None
+    match = _WKT_POINT_RE.search(str(value))
+    if not match:
+        return None
+    lon, lat = float(match.group(1)), float(match.group(2))
+    return lat, lon
+
+
+def _parse_wkb_point(data: bytes) -> Optional[LatLon]:
+    """(lat, lon) of a WKB/EWKB point"""
+    if len(data) < 21:
+        return None
+    order = "<" if data[0] == 1 else ">"
+    (geometry_type,) = struct.unpack(order + "I", data[1:5])
+    offset = 5
+    if geometry_type & 0x20000000:  # EWKB with SRID
+        offset += 4
+    if (geometry_type & 0x0FFFFFFF) % 1000 != 1:
+        return None
+    lon, lat = struct.unpack(order + "dd", data[offset:offset + 16])
+    return lat, lon
+
+
+def point_coordinates(value) -> Optional[LatLon]:
+    """(lat, lon) of a loaded POINT column value: WKT text (SQLite) or WKB/EWKB elements (PostGIS)"""
+    if value is None:
+        return None
+    data = getattr(value, "data", value)
+    if isinstance(data, memoryview):
+        data = bytes(data)
+    if isinstance(data, str):
+        point = parse_point_wkt(data)
+        if point is not None or not _HEX_RE.match(data):
+            return point
+        data = bytes.fromhex(data)
+    try:
+        return _parse_wkb_point(bytes(data))
+    except (struct.error, TypeError, ValueError):
+        return None
+
+
+def point_value(latitude: float, longitude: float):
+    """Column value for a POINT location (WKT text on SQLite, Geography on PostGIS)"""
+    wkt = f"POINT({longitude} {latitude})"
+    if settings.is_sqlite():
+        return wkt
+    from geoalchemy2.elements import WKTElement
+    return WKTElement(wkt, srid=4326)
+
+
+def line_value(points: Sequence[LatLon]):
+    """Column value for a LINESTRING of (lat, lon) points"""
+    wkt = "LINESTRING({})".format(", ".join(f"{lon} {lat}" for lat, lon in points))
+    if settings.is_sqlite():
+        return wkt
+    from geoalchemy2.elements import WKTElement
+    return WKTElement(wkt, srid=4326)
+
+
+def load_coordinates(db: Session, table: str, ids: Optional[Iterable[int]] = None) -> Dict[int, LatLon]:
+    """Load (lat, lon) of rows of a table with a POINT location in a single query"""
+    if table not in _POINT_TABLES:
+        raise ValueError(f"No point locations in table {table}")
+    ids = None if ids is None else [int(i) for i in ids]
+    if ids is not None and not ids:
+        return {}
+
+    if settings.is_postgresql():
+        sql = f"SELECT id, ST_Y(location::geometry), ST_X(location::geometry) FROM {table}"
+    else:
+        sql = f"SELECT id, location FROM {table}"
+    params = {}
+    if ids is not None:
+        placeholders = ", ".join(f":id{i}" for i in range(len(ids)))
+        sql += f" WHERE id IN ({placeholders})"
+        params = {f"id{i}": row_id for i, row_id in enumerate(ids)}
+
+    coordinates: Dict[int, LatLon] = {}
+    for row in db.execute(text(sql), params):
+        if settings.is_postgresql():
+            if row[1] is not None and row[2] is not None:
+                coordinates[row[0]] = (float(row[1]), float(row[2]))
+        else:
+            point = parse_point_wkt(row[1])
+            if point:
+                coordinates[row[0]] = point
+    return coordinates
+
+
+def load_spot_coordinates(db: Session, spot_ids: Optional[Iterable[int]] = None) -> Dict[int, LatLon]:
+    """Load (lat, lon) for spots in a single query (all spots if spot_ids is None)"""
+    return load_coordinates(db, "spots", spot_ids)
+
+
+def coordinates_of(db: Session, instance) -> Optional[LatLon]:
+    """(lat, lon) of a Spot/Log/TrackPoint; decoded in Python, queried only if the column isn't loaded"""
+    point = point_coordinates(instance.__dict__.get("location"))
+    if point is not None:
+        return point
+    return load_coordinates(db, instance.__tablename__, [instance.id]).get(instance.id)
+
+
+def coordinates_map(db: Session, instances: Iterable) -> Dict[int, LatLon]:
+    """{id: (lat, lon)} for rows of one table, with at most one query for undecodable rows"""
+    result: Dict[int, LatLon] = {}
+    missing = []
+    table = None
+    for instance in instances:
+        table = instance.__tablename__
+        point = point_coordinates(instance.__dict__.get("location"))
+        if point is None:
+            missing.append(instance.id)
+        else:
+            result[instance.id] = point
+    if missing:
+        result.update(load_coordinates(db, table, missing))
+    return result
+
+
+def distance_m(db: Session, instance, latitude: float, longitude: float) -> Optional[float]:
+    """Distance in meters from a point to a Spot/Log/TrackPoint (None if it has no location)"""
+    point = coordinates_of(db, instance)
+    if point is None:
+        return None
+    return haversine_m(latitude, longitude, point[0], point[1])
+
+
+# --- Radius queries ---------------------------------------------------------
+
+
+class SpotIndex:
+    """Spot coordinates as arrays for vectorized radius scans.
+
+    Fully reloaded every RELOAD_SECONDS (or after invalidate()); in between,
+    each lookup only fetches spots with a higher id than the newest known one,
+    so spots created by other workers show up immediately. Deleted or expired
+    spots may linger in the arrays: callers join hits against the spots table.
+    """
+
+    RELOAD_SECONDS = 300
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._ids: list = []
+        self._lats: list = []
+        self._lons: list = []
+        self._arrays = None  # (ids, lats, lons) as NumPy arrays when available
+        self._max_id = 0
+        self._loaded_at: Optional[float] = None
+
+    def invalidate(self):
+        self._loaded_at = None
+
+    def __len__(self) -> int:
+        return len(self._ids)
+
+    def _append(self, coordinates: Dict[int, LatLon]):
+        for spot_id in sorted(coordinates):
+            lat, lon = coordinates[spot_id]
+            self._ids.append(spot_id)
+            self._lats.append(lat)
+            self._lons.append(lon)
+            self._max_id = max(self._max_id, spot_id)
+        if np is not None:
+            self._arrays = (
+                np.asarray(self._ids, dtype=np.int64),
+                np.asarray(self._lats, dtype=np.float64),
+                np.asarray(self._lons, dtype=np.float64),
+            )
+
+    def refresh(self, db: Session):
+        """Full reload when stale, otherwise pick up newly created spots"""
+        with self._lock:
+            if self._loaded_at is None or time.monotonic() - self._loaded_at > self.RELOAD_SECONDS:
+                self._ids, self._lats, self._lons = [], [], []
+                self._max_id = 0
+                self._append(load_spot_coordinates(db))
+                self._loaded_at = time.monotonic()
+                return
+            max_id = self._max_id
+        rows = db.execute(
+            text("SELECT id FROM spots WHERE id > :max_id"), {"max_id": max_id}
+        ).fetchall()
+        if rows:
+            new = load_spot_coordinates(db, [row[0] for row in rows])
+            with self._lock:
+                self._append({k: v for k, v in new.items() if k > self._max_id})
+
+    def within(self, latitude: float, longitude: float, radius_m: float) -> List[Tuple[int, float]]:
+        """(spot_id, distance_m) of all indexed spots within radius_m"""
+        dlat = radius_m / METERS_PER_DEGREE_LAT
+        cos_lat = max(math.cos(math.radians(latitude)), 1e-6)
+        dlon = min(180.0, dlat / cos_lat)
+
+        if np is None or self._arrays is None:
+            hits = []
+            for spot_id, lat, lon in zip(self._ids, self._lats, self._lons):
+                if abs(lat - latitude) > dlat or abs(lon - longitude) > dlon:
+                    continue
+                distance = haversine_m(latitude, longitude, lat, lon)
+                if distance <= radius_m:
+                    hits.append((spot_id, distance))
+            return hits
+
+        ids, lats, lons = self._arrays
+        # Bounding box first: the haversine only runs on the few candidates
+        box = (np.abs(lats - latitude) <= dlat) & (np.abs(lons - longitude) <= dlon)
+        ids, lats, lons = ids[box], lats[box], lons[box]
+        phi1 = math.radians(latitude)
+        phi2 = np.radians(lats)
+        a = (
+            np.sin((phi2 - phi1) / 2) ** 2
+            + math.cos(phi1) * np.cos(phi2) * np.sin(np.radians(lons - longitude) / 2) ** 2
+        )
+        distances = 2 * EARTH_RADIUS_M * np.arcsin(np.minimum(1.0, np.sqrt(a)))
+        inside = distances <= radius_m
+        return list(zip(ids[inside].tolist(), distances[inside].tolist()))
+
+
+spot_index = SpotIndex()
+
+
+def uses_postgis() -> bool:
+    """Radius queries in PostGIS (default on PostgreSQL) or on the in-memory index"""
+    backend = (settings.GEO_BACKEND or "auto").lower()
+    if backend == "memory":
+        return False
+    return settings.is_postgresql()
+
+
+def spots_within(db: Session, latitude: float, longitude: float, radius_m: float, *criteria) -> list:
+    """(Spot, distance_m) for spots within radius_m matching the extra filter criteria"""
+    from app.models import Spot
+
+    if uses_postgis():
+        from geoalchemy2.functions import ST_Distance, ST_DWithin, ST_MakePoint, ST_SetSRID
+        point = ST_SetSRID(ST_MakePoint(longitude, latitude), 4326)
+        return db.query(
+            Spot, ST_Distance(Spot.location, point).label('distance')
+        ).filter(ST_DWithin(Spot.location, point, radius_m), *criteria).all()
+
+    spot_index.refresh(db)
+    distances = dict(spot_index.within(latitude, longitude, radius_m))
+    if not distances:
+        return []
+    spots = db.query(Spot).filter(Spot.id.in_(list(distances)), *criteria).all()
+    return [(spot, distances[spot.id]) for spot in spots]
@@ -0,0 +1,193 @@
+"""
+Server-side geofencing for auto-logs.
+
+Position updates arriving over the WebSocket are matched against an in-memory
+grid index of permanent spots. When a player is inside a spot's auto-log radius
+and the in-memory cooldown table says the spot is ready, the server creates the
+auto-log itself (same rules as POST /api/logs/) and pushes the result to the
+player. This replaces the client's once-per-second proximity polling and the
+duplicate HTTP round trip.
+"""
+import math
+import threading
+import time
+from dataclasses import dataclass
+from typing import Dict, List, Optional, Set, Tuple
+
+from sqlalchemy.orm import Session
+
+from app.config import settings
+from app.database import run_db
+from app.models import Spot
+from app.schemas import LogCreate, LogResponse
+from app.services import auth_service, geo_service, log_service, spot_service
+from app.ws import events
+
+# Grid cell size in degrees (~220m north-south); auto-log radii are far smaller
+CELL_DEG = 0.002
+# Positions with worse GPS accuracy are ignored (same threshold as the client)
+MAX_ACCURACY_M = 50.0
+
+
+@dataclass(frozen=True)
+class SpotFence:
+    spot_id: int
+    latitude: float
+    longitude: float
+    radius_m: float
+
+
+class GeofenceEngine:
+    """Grid index of spot fences plus an in-memory (user, spot) cooldown table"""
+
+    RELOAD_SECONDS = 300  # Spots rarely change; also reloaded on invalidate()
+    RETRY_AFTER_FAILURE_SECONDS = 30
+
+    def __init__(self):
+        self._grid: Dict[Tuple[int, int], List[SpotFence]] = {}
+        self._loaded_at: Optional[float] = None
+        self._lock = threading.Lock()
+        # (user_id, spot_id) -> unix time when the next auto-log attempt is allowed
+        self._ready_at: Dict[Tuple[int, int], float] = {}
+        self._in_flight: Set[Tuple[int, int]] = set()
+
+    @staticmethod
+    def _cell(latitude: float, longitude: float) -> Tuple[int, int]:
+        return int(math.floor(latitude / CELL_DEG)), int(math.floor(longitude / CELL_DEG))
+
+    def build(self, fences: List[SpotFence]):
+        """Replace the index with the given fences"""
+        grid: Dict[Tuple[int, int], List[SpotFence]] = {}
+        for fence in fences:
+            grid.setdefault(self._cell(fence.latitude, fence.longitude), []).append(fence)
+        with self._lock:
+            self._grid = grid
+            self._loaded_at = time.monotonic()
+
+    def load(self, db: Session):
+        """(Re)load permanent spots and the auto-log radius from the database"""
+        radius_m = log_service.get_game_setting(db, "auto_log_distance", settings.AUTO_LOG_DISTANCE)
+        spot_ids = [
+            row[0] for row in db.query(Spot.id).filter(
+                Spot.is_permanent == True,
+                Spot.is_loot == False,
+                Spot.is_active.isnot(False),
+            )
+        ]
+        coordinates = geo_service.load_spot_coordinates(db, spot_ids)
+        self.build([
+            SpotFence(spot_id, lat, lon, float(radius_m))
+            for spot_id, (lat, lon) in coordinates.items()
+        ])
+
+    def invalidate(self):
+        """Force a reload on the next position update (spot created/deleted)"""
+        self._loaded_at = None
+
+    def needs_reload(self) -> bool:
+        return self._loaded_at is None or time.monotonic() - self._loaded_at > self.RELOAD_SECONDS
+
+    def fences_containing(self, latitude: float, longitude: float) -> List[SpotFence]:
+        """All fences whose radius contains the point"""
+        row, col = self._cell(latitude, longitude)
+        grid = self._grid
+        hits = []
+        for d_row in (-1, 0, 1):
+            for d_col in (-1, 0, 1):
+                for fence in grid.get((row + d_row, col + d_col), ()):
+                    if geo_service.haversine_m(latitude, longitude, fence.latitude, fence.longitude) <= fence.radius_m:
+                        hits.append(fence)
+        return hits
+
+    def claim_candidates(self, user_id: int, latitude: float, longitude: float) -> List[int]:
+        """Spots the user is inside whose cooldown has passed; marks them in flight"""
+        now = time.time()
+        claimed = []
+        with self._lock:
+            for fence in self.fences_containing(latitude, longitude):
+                key = (user_id, fence.spot_id)
+                if key in self._in_flight or self._ready_at.get(key, 0.0) > now:
+                    continue
+                self._in_flight.add(key)
+                claimed.append(fence.spot_id)
+        return claimed
+
+    def release(self, user_id: int, spot_id: int, retry_after_seconds: float):
+        """Finish an attempt; the spot is not retried for retry_after_seconds"""
+        key = (user_id, spot_id)
+        with self._lock:
+            self._in_flight.discard(key)
+            self._ready_at[key] = time.time() + max(0.0, retry_after_seconds)
+            if len(self._ready_at) > 50000:
+                # Drop entries whose cooldown has passed (they behave like missing ones)
+                now = time.time()
+                self._ready_at = {k: v for k, v in self._ready_at.items() if v > now}
+
+
+engine = GeofenceEngine()
+
+
+def _auto_log(db: Session, user_id: int, spot_id: int, latitude: float, longitude: float) -> Tuple[Optional[dict], float]:
+    """Create an auto-log with the same rules as the HTTP route.
+
+    Returns (log payload or None, seconds until the next attempt is useful).
+    """
+    user = auth_service.get_user_by_id(db, user_id)
+    if user is None or not user.is_active:
+        return None, GeofenceEngine.RETRY_AFTER_FAILURE_SECONDS
+
+    log_service.lock_user_logs(db, user_id)
+    if not spot_service.can_log_spot(db, user_id, spot_id, is_auto=True):
+        status = spot_service.get_log_status(db, user_id, spot_id)
+        return None, max(1, status["auto_cooldown_remaining"])
+
+    log_data = LogCreate(spot_id=spot_id, latitude=latitude, longitude=longitude, is_auto=True)
+    log = log_service.create_log(db, user, log_data, is_auto=True)
+    if log is None:
+        return None, GeofenceEngine.RETRY_AFTER_FAILURE_SECONDS
+
+    events.after_log(user_id, spot_id)
+    payload = LogResponse.model_validate(log).model_dump(mode="json")
+    payload["spot_name"] = log.spot.name if log.spot else None
+    return payload, settings.LOG_COOLDOWN
+
+
+def _reload(db: Session):
+    engine.load(db)
+
+
+async def process_position(
+    user_id: int,
+    latitude: Optional[float],
+    longitude: Optional[float],
+    accuracy: Optional[float] = None
+) -> List[dict]:
+    """Feed a position update; returns the auto-logs created for it"""
+    if not settings.SERVER_AUTO_LOG or latitude is None or longitude is None:
+        return []
+    if accuracy is not None and accuracy > MAX_ACCURACY_M:
+        return []
+
+    if engine.needs_reload():
+        try:
+            # Full spot scan plus grid build: too long for the event loop thread
+            await run_db(_reload, blocking=True)
+        except Exception as e:
+            print(f"[ERROR] Geofence index reload failed: {type(e).__name__}: {e}")
+            engine.build([])  # Retry after RELOAD_SECONDS instead of on every update
+
+    created = []
+    for spot_id in engine.claim_candidates(user_id, float(latitude), float(longitude)):
+        retry_after = GeofenceEngine.RETRY_AFTER_FAILURE_SECONDS
+        try:
+            # Cooldown checks may call Redis: keep them off the event loop
+            payload, retry_after = await run_db(
+                _auto_log, user_id, spot_id, float(latitude), float(longitude), blocking=True
+            )
+            if payload:
+                created.append(payload)
+        except Exception as e:
+            print(f"[ERROR] Server auto-log failed for user {user_id}, spot {spot_id}: {type(e).__name__}: {e}")
+        finally:
+            engine.release(user_id, spot_id, retry_after)
+    return created
@@ -0,0 +1,188 @@
+"""
+Immutable in-memory item catalog.
+
+Items change only through item_service.create_item / initialize_default_items,
+so the whole table is loaded once into a frozen snapshot together with the
+precomputed data the hot paths need:
+
+- buff durations per item (use_item no longer string-matches item names),
+- a Walker alias table over rarity weights, so a loot item roll is O(1)
+  and needs no query.
+
+Writers in this process call invalidate(); the snapshot is additionally
+reloaded every RELOAD_SECONDS so items created by other workers or by the
+init_items.py script show up without a restart.
+"""
+import random
+import threading
+import time
+from dataclasses import dataclass
+from typing import Dict, List, Optional, Sequence, Tuple
+
+from sqlalchemy.orm import Session
+
+from app.models import Item
+
+RELOAD_SECONDS = 300
+
+# Relative drop weight of a single item of each rarity
+RARITY_WEIGHTS = {
+    "common": 60.0,
+    "rare": 25.0,
+    "epic": 10.0,
+    "legendary": 5.0,
+}
+
+# Buff duration (seconds) of items whose duration differs from the default
+BUFF_DURATIONS = {
+    "xp boost": 3600,
+    "mega xp boost": 1800,
+    "range extender": 3600,
+    "claim amplifier": 3600,
+}
+DEFAULT_BUFF_DURATION = 3600  # Any other item with an effect, so it visibly works
+
+
+@dataclass(frozen=True)
+class CatalogItem:
+    """Read-only copy of an Item row (serializable with ItemResponse)"""
+
+    id: int
+    name: str
+    description: Optional[str]
+    item_type: Optional[str]
+    rarity: str
+    xp_boost: float
+    claim_boost: float
+    range_boost: float
+    icon_url: Optional[str]
+    duration_seconds: int
+
+    @property
+    def has_effect(self) -> bool:
+        return self.xp_boost != 0 or self.claim_boost != 0 or self.range_boost != 0
+
+
+def buff_duration(name: Optional[str], has_effect: bool) -> int:
+    """Buff duration of an item in seconds (0: using it creates no buff)"""
+    if not has_effect:
+        return 0
+    return BUFF_DURATIONS.get((name or "").strip().lower(), DEFAULT_BUFF_DURATION)
+
+
+def build_alias_table(weights: Sequence[float]) -> Tuple[List[float], List[int]]:
+    """Walker/Vose alias table: (probabilities, aliases) for O(1) weighted sampling"""
+    n = len(weights)
+    total = float(sum(weights))
+    if n == 0 or total <= 0:
+        return [], []
+    scaled = [w * n / total for w in weights]
+    prob = [1.0] * n
+    alias = list(range(n))
+    small = [i for i, p in enumerate(scaled) if p < 1.0]
+    large = [i for i, p in enumerate(scaled) if p >= 1.0]
+    while small and large:
+        s, l = small.pop(), large.pop()
+        prob[s] = scaled[s]
+        alias[s] = l
+        scaled[l] -= 1.0 - scaled[s]
+        (small if scaled[l] < 1.0 else large).append(l)
+    # Leftovers are 1.0 up to rounding error
+    return prob, alias
+
+
+@dataclass(frozen=True)
+class Catalog:
+    """One loaded version of the item table"""
+
+    version: int
+    items: Tuple[CatalogItem, ...]
+    by_id: Dict[int, CatalogItem]
+    _prob: Tuple[float, ...]
+    _alias: Tuple[int, ...]
+
+    def get(self, item_id: Optional[int]) -> Optional[CatalogItem]:
+        return self.by_id.get(item_id)
+
+    def sample(self, rng: random.Random = random) -> Optional[CatalogItem]:
+        """Rarity-weighted random item (None if the catalog is empty)"""
+        if not self.items:
+            return None
+        column = rng.randrange(len(self.items))
+        if rng.random() < self._prob[column]:
+            return self.items[column]
+        return self.items[self._alias[column]]
+
+
+def _to_entry(item: Item) -> CatalogItem:
+    xp_boost = float(item.xp_boost or 0.0)
+    claim_boost = float(item.claim_boost or 0.0)
+    range_boost = float(item.range_boost or 0.0)
+    has_effect = xp_boost != 0 or claim_boost != 0 or range_boost != 0
+    return CatalogItem(
+        id=item.id,
+        name=item.name,
+        description=item.description,
+        item_type=item.item_type,
+        rarity=(item.rarity or "common").lower(),
+        xp_boost=xp_boost,
+        claim_boost=claim_boost,
+        range_boost=range_boost,
+        icon_url=item.icon_url,
+        duration_seconds=buff_duration(item.name, has_effect),
+    )
+
+
+def build(items: Sequence[Item], version: int = 0) -> Catalog:
+    entries = tuple(sorted((_to_entry(item) for item in items), key=lambda entry: entry.id))
+    prob, alias = build_alias_table([RARITY_WEIGHTS.get(entry.rarity, RARITY_WEIGHTS["common"]) for entry in entries])
+    return Catalog(
+        version=version,
+        items=entries,
+        by_id={entry.id: entry for entry in entries},
+        _prob=tuple(prob),
+        _alias=tuple(alias),
+    )
+
+
+_lock = threading.Lock()
+_catalog: Optional[Catalog] = None
+_loaded_at = 0.0
+_version = 0
+
+
+def load(db: Session) -> Catalog:
+    """Reload the catalog from the items table"""
+    global _catalog, _loaded_at, _version
+    items = db.query(Item).all()
+    with _lock:
+        _version += 1
+        _catalog = build(items, _version)
+        _loaded_at = time.monotonic()
+        return _catalog
+
+
+def get(db: Session) -> Catalog:
+    """Current catalog; only queries when it was invalidated or is older than RELOAD_SECONDS"""
+    catalog = _catalog
+    if catalog is None or time.monotonic() - _loaded_at > RELOAD_SECONDS:
+        catalog = load(db)
+    return catalog
+
+
+def get_item(db: Session, item_id: Optional[int]) -> Optional[CatalogItem]:
+    """Catalog entry by id, reloading once if the id is unknown (item created elsewhere)"""
+    if item_id is None:
+        return None
+    catalog = get(db)
+    item = catalog.get(item_id)
+    if item is None and time.monotonic() - _loaded_at > 1.0:
+        item = load(db).get(item_id)
+    return item
+
+
+def invalidate():
+    """Drop the snapshot; the next get() loads a new version"""
+    global _catalog
+    with _lock:
+        _catalog = None
@@ -1,8 +1,10 @@
+from datetime import datetime
 from typing import List, Optional
+from sqlalchemy.dialects import postgresql, sqlite
 from sqlalchemy.orm import Session
 from app.models import Item, InventoryItem, User
 from app.schemas import ItemCreate
-from app.services import buff_service
+from app.services import buff_service, item_catalog
 
 
 def create_item(db: Session, item_data: ItemCreate) -> Item:
@@ -19,6 +21,7 @@ def create_item(db: Session, item_data: ItemCreate) -> Item:
     db.add(item)
     db.commit()
     db.refresh(item)
+    item_catalog.invalidate()
     return item
 
 
@@ -45,6 +48,22 @@ def add_to_inventory(db: Session, user_id: int, item_id: int, quantity: int = 1)
     return inventory_item
 
 
+def increment_inventory(
+    db: Session, user_id: int, item_id: int, quantity: int = 1, acquired_at: Optional[datetime] = None
+) -> None:
+    """Add to the user's stack of an item in one INSERT ... ON CONFLICT statement (no commit)"""
+    dialect = postgresql if db.get_bind().dialect.name == "postgresql" else sqlite
+    values = {"user_id": user_id, "item_id": item_id, "quantity": quantity}
+    if acquired_at is not None:
+        values["acquired_at"] = acquired_at
+    stmt = dialect.insert(InventoryItem).values(**values)
+    stmt = stmt.on_conflict_do_update(
+        index_elements=[InventoryItem.user_id, InventoryItem.item_id],
+        set_={"quantity": InventoryItem.quantity + stmt.excluded.quantity},
+    )
+    db.execute(stmt)
+
+
 def get_user_inventory(db: Session, user_id: int) -> List[InventoryItem]:
     """Get all items in user's inventory"""
     return db.query(InventoryItem).filter(
@@ -71,14 +90,14 @@ def remove_from_inventory(db: Session, user_id: int, item_id: int, quantity: int
     return True
 
 
-def get_all_items(db: Session) -> List[Item]:
-    """Get all available items"""
-    return db.query(Item).all()
+def get_all_items(db: Session) -> List[item_catalog.CatalogItem]:
+    """Get all available items (from the item catalog)"""
+    return list(item_catalog.get(db).items)
 
 
-def get_item_by_id(db: Session, item_id: int) -> Optional[Item]:
-    """Get item by ID"""
-    return db.query(Item).filter(Item.id == item_id).first()
+def get_item_by_id(db: Session, item_id: int) -> Optional[item_catalog.CatalogItem]:
+    """Get item by ID (from the item catalog)"""
+    return item_catalog.get_item(db, item_id)
 
 
 def use_item(db: Session, user_id: int, item_id: int) -> dict:
@@ -94,23 +113,12 @@ def use_item(db: Session, user_id: int, item_id: int) -> dict:
     if not inventory_item or inventory_item.quantity <= 0:
         return {"success": False, "error": "Item not in inventory"}
     
-    item = inventory_item.item
-
-    # Determine buff duration (seconds). No DB schema for duration yet, so keep mapping in code.
-    duration_seconds = 0
-    name = (item.name or "").strip().lower()
-    if name == "xp boost":
-        duration_seconds = 3600
-    elif name == "mega xp boost":
-        duration_seconds = 1800
-    elif name == "range extender":
-        duration_seconds = 3600
-    elif name == "claim amplifier":
-        duration_seconds = 3600
-    else:
-        # Default: if it has an effect, give it 1h so it visibly works.
-        if (item.xp_boost or 0) != 0 or (item.claim_boost or 0) != 0 or (item.range_boost or 0) != 0:
-            duration_seconds = 3600
+    item = item_catalog.get_item(db, item_id)
+    if item is None:
+        return {"success": False, "error": "Item not found"}
+
+    # Buff durations are precomputed per item in the catalog
+    duration_seconds = item.duration_seconds
     
     # Apply effects (now persisted as temporary buffs)
     effects = {
@@ -121,9 +129,7 @@ def use_item(db: Session, user_id: int, item_id: int) -> dict:
 
     # Persist buff so it affects subsequent actions (logs / loot)
     created_buff = None
-    if duration_seconds > 0 and (
-        (item.xp_boost or 0) != 0 or (item.claim_boost or 0) != 0 or (item.range_boost or 0) != 0
-    ):
+    if duration_seconds > 0:
         created_buff = buff_service.create_buff_from_item_effects(
             db,
             user_id=user_id,
@@ -209,4 +215,5 @@ def initialize_default_items(db: Session):
             db.add(item)
     
     db.commit()
+    item_catalog.invalidate()
     print(f"Initialized {len(default_items)} default items")
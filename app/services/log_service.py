@@ -1,15 +1,16 @@
+import base64
 from datetime import datetime, timedelta
-from typing import List, Optional
-from sqlalchemy.orm import Session
-from sqlalchemy import func
-from geoalchemy2.functions import ST_Distance, ST_SetSRID, ST_MakePoint, ST_DistanceSphere
-from geoalchemy2.elements import WKTElement
-from geoalchemy2.types import Geography
+from typing import List, Optional, Tuple
+from sqlalchemy.orm import Session, load_only
+from sqlalchemy import DateTime, case, func, literal, select, tuple_, update
+from sqlalchemy.exc import IntegrityError
 from app.models import Log, Spot, User, Claim, GameSetting
-from app.schemas import LogCreate
+from app.schemas import LogCreate, LogSyncItem
 from app.config import settings
+from app.database import seconds_between
 import pytz
-from app.services import buff_service
+from app.services import buff_service, geo_service, metrics, photo_store, photo_variants
+from app.services.cooldown_store import store as cooldown_store
 
 # CET timezone
 CET = pytz.timezone('Europe/Berlin')
@@ -80,26 +81,45 @@ def get_game_setting(db: Session, setting_name: str, default_value: float) -> fl
     except (ValueError, TypeError):
         return default_value
 
+def lock_user_logs(db: Session, user_id: int):
+    """Serialize log creation per user until the transaction ends.
+
+    Locks the user row (which create_log updates anyway); SQLite ignores FOR
+    UPDATE and serializes writers by itself.
+    """
+    db.query(User.id).filter(User.id == user_id).with_for_update().first()
+
+
+def get_log_by_client_key(db: Session, user_id: int, client_key: Optional[str]) -> Optional[Log]:
+    """A log already created for this idempotency key"""
+    if not client_key:
+        return None
+    return db.query(Log).filter(Log.user_id == user_id, Log.client_key == client_key).first()
+
+
 def create_log(
     db: Session,
     user: User,
     log_data: LogCreate,
-    is_auto: bool = False
+    is_auto: bool = False,
+    timestamp: Optional[datetime] = None,
+    commit: bool = True
 ) -> Optional[Log]:
-    """Create a log entry for a spot visit"""
+    """Create a log entry for a spot visit.
+
+    `timestamp` backdates the log (offline sync). With commit=False the log is
+    only flushed; the caller commits with commit_logs() and then calls
+    after_log_committed().
+    """
     # Get spot
     spot = db.query(Spot).filter(Spot.id == log_data.spot_id).first()
     if not spot:
         return None
     
-    # Calculate distance using PostGIS ST_DistanceSphere (returns meters)
-    user_point = ST_SetSRID(ST_MakePoint(log_data.longitude, log_data.latitude), 4326)
-    distance = db.query(
-        ST_DistanceSphere(
-            spot.location,
-            user_point
-        )
-    ).scalar()
+    # Great-circle distance in meters (same sphere as ST_DistanceSphere, no DB round trip)
+    distance = geo_service.distance_m(db, spot, log_data.latitude, log_data.longitude)
+    if distance is None:
+        return None
     
     # Active buffs (XP/Claim multipliers, optional range bonus)
     modifiers = buff_service.get_active_modifiers(db, user.id)
@@ -128,15 +148,15 @@ def create_log(
         # Manual logs with photos/notes get bonus
         base_xp = manual_base_xp
         claim_points = manual_claim_points
-        if log_data.photo_data or log_data.notes:
+        if log_data.photo_upload_token or log_data.photo_data or log_data.notes:
             base_xp += manual_bonus_xp
             claim_points += manual_bonus_claim_points
 
     # --- RPG XP improvements: novelty + diminishing returns + movement bonus (applies to auto & manual) ---
-    now = get_current_cet()
+    now = timestamp or get_current_cet()
     last_spot_log = (
         db.query(Log)
-        .filter(Log.user_id == user.id, Log.spot_id == spot.id)
+        .filter(Log.user_id == user.id, Log.spot_id == spot.id, Log.timestamp <= now)
         .order_by(Log.timestamp.desc())
         .first()
     )
@@ -152,15 +172,15 @@ def create_log(
 
     last_user_log = (
         db.query(Log)
-        .filter(Log.user_id == user.id)
+        .filter(Log.user_id == user.id, Log.timestamp <= now)
         .order_by(Log.timestamp.desc())
         .first()
     )
 
     move_dist_m: Optional[float] = None
-    if last_user_log and getattr(last_user_log, 'location', None) is not None:
+    if last_user_log is not None:
         try:
-            move_dist_m = db.query(ST_DistanceSphere(last_user_log.location, user_point)).scalar()
+            move_dist_m = geo_service.distance_m(db, last_user_log, log_data.latitude, log_data.longitude)
         except Exception:
             move_dist_m = None
     move_bonus = _movement_bonus_xp(move_dist_m)
@@ -188,30 +208,37 @@ def create_log(
         pass
     
     # Create log
-    log_point = f'POINT({log_data.longitude} {log_data.latitude})'
-    
-    # Process photo if provided (convert base64 to binary)
-    photo_data = None
+    # Process photo if provided (streamed upload or base64 -> content-addressed photo store)
+    photo_sha256 = None
+    photo_size = None
     photo_mime = None
-    if log_data.photo_data and log_data.photo_mime:
-        import base64
+    if log_data.photo_upload_token:
+        claimed = photo_store.claim_upload(log_data.photo_upload_token, user.id)
+        if claimed:
+            photo_sha256, photo_size, photo_mime = claimed
+        else:
+            print("[WARN] Unknown or expired photo upload token, logging without photo")
+    elif log_data.photo_data and log_data.photo_mime:
         try:
-            photo_data = base64.b64decode(log_data.photo_data)
+            photo_sha256, photo_size = photo_store.put_bytes(base64.b64decode(log_data.photo_data))
             photo_mime = log_data.photo_mime
-        except Exception:
-            pass  # Ignore photo errors, log without it
+        except Exception as e:
+            print(f"[WARN] Photo could not be stored, logging without it: {e}")
     
     log = Log(
         user_id=user.id,
         spot_id=spot.id,
-        location=WKTElement(log_point, srid=4326),
+        location=geo_service.point_value(log_data.latitude, log_data.longitude),
         distance=distance,
         is_auto=is_auto,
         xp_gained=xp_gained,
         claim_points=claim_points,
         notes=log_data.notes,
-        photo_data=photo_data,
-        photo_mime=photo_mime
+        photo_sha256=photo_sha256,
+        photo_size=photo_size,
+        photo_mime=photo_mime,
+        timestamp=now,
+        client_key=log_data.client_key
     )
 
     # Attach applied buff info (transient, for API response)
@@ -231,7 +258,7 @@ def create_log(
     db.add(log)
     
     # Update user XP
-    update_user_xp(db, user, xp_gained)
+    update_user_xp(db, user, xp_gained, commit=False)
 
     # Track total claim points for rankings
     try:
@@ -240,28 +267,218 @@ def create_log(
         pass
     
     # Update or create claim
-    update_claim(db, user.id, spot.id, claim_points)
+    update_claim(db, user.id, spot.id, claim_points, commit=False)
     
-    db.commit()
+    if not commit:
+        db.flush()
+        return log
+    
+    commit_logs(db, [log])
     db.refresh(log)
+    after_log_committed(log)
     return log
 
 
-def get_user_logs(db: Session, user_id: int, limit: int = 50) -> List[Log]:
-    """Get recent logs for a user"""
-    return db.query(Log).filter(
-        Log.user_id == user_id
-    ).order_by(Log.timestamp.desc()).limit(limit).all()
+def commit_logs(db: Session, logs: List[Log]):
+    """Commit new logs, writing them through to the cooldown table first.
+
+    The entries are recorded while lock_user_logs still holds the user row:
+    a request waiting on that lock checks the table (can_log_spot) as soon as
+    the commit releases it. They are reverted if the commit fails.
+    """
+    entries = [(log.user_id, log.spot_id, bool(log.is_auto), log.timestamp) for log in logs]
+    recorded = []
+    try:
+        for entry in entries:
+            recorded.append((entry, cooldown_store.record(*entry)))
+        db.commit()
+    except Exception:
+        for entry, previous in reversed(recorded):
+            cooldown_store.revert(*entry, previous)
+        raise
+
+
+def after_log_committed(log: Log):
+    metrics.logs_created.inc("auto" if log.is_auto else "manual")
+    # Thumbnail/display versions are rendered in the image process pool
+    photo_variants.schedule(log.photo_sha256)
+
+
+# --- Offline sync ---
+#
+# Clients queue logs made without connectivity and replay them in one request.
+# Every item carries a client-generated idempotency key (unique per user), so
+# a batch that is retried after a lost response creates nothing twice. Items
+# are checked in client time order against the cooldown rules, including the
+# other items of the same batch, and written in one transaction.
+
+SYNC_MAX_AGE = timedelta(hours=24)
+
+
+def _to_cet(value: datetime) -> datetime:
+    """Naive CET like Log.timestamp (naive client times are taken as CET)"""
+    if value.tzinfo is not None:
+        return value.astimezone(CET).replace(tzinfo=None)
+    return value
+
+
+def _in_cooldown(recent: List[Tuple[datetime, bool]], at: datetime, is_auto: bool) -> bool:
+    """Same rules as spot_service.can_log_spot, evaluated at `at` in both directions"""
+    cooldown = settings.LOG_COOLDOWN
+    for timestamp, other_is_auto in recent:
+        if other_is_auto and not is_auto:
+            continue  # Auto logs never block manual logs
+        if abs((at - timestamp).total_seconds()) < cooldown:
+            return True
+    return False
+
+
+def sync_logs(db: Session, user: User, items: List[LogSyncItem]) -> List[dict]:
+    """Create a batch of offline logs; returns one result per item in request order"""
+    lock_user_logs(db, user.id)
+    now = get_current_cet()
+    results: List[Optional[dict]] = [None] * len(items)
+
+    keys = {item.client_key for item in items}
+    existing = {
+        log.client_key: log
+        for log in db.query(Log).filter(Log.user_id == user.id, Log.client_key.in_(keys))
+    }
+
+    pending = []
+    for index, item in enumerate(items):
+        at = min(_to_cet(item.client_timestamp), now)  # Device clocks running ahead
+        if now - at > SYNC_MAX_AGE:
+            results[index] = {"client_key": item.client_key, "status": "rejected", "detail": "Log is too old to sync"}
+        else:
+            pending.append((at, index, item))
+    pending.sort(key=lambda entry: (entry[0], entry[1]))
+
+    # Logs around the batch's time range, for cooldown checks (one query)
+    recent: dict = {}
+    if pending:
+        window = timedelta(seconds=settings.LOG_COOLDOWN)
+        rows = db.query(Log.spot_id, Log.timestamp, Log.is_auto).filter(
+            Log.user_id == user.id,
+            Log.spot_id.in_({item.spot_id for _, _, item in pending}),
+            Log.timestamp > pending[0][0] - window,
+            Log.timestamp < pending[-1][0] + window,
+        )
+        for spot_id, timestamp, is_auto in rows:
+            recent.setdefault(spot_id, []).append((timestamp, bool(is_auto)))
+
+    created = []
+    for at, index, item in pending:
+        result = {"client_key": item.client_key}
+        results[index] = result
+        if item.client_key in existing:
+            result.update(status="duplicate", log=existing[item.client_key])
+            continue
+        if _in_cooldown(recent.get(item.spot_id, []), at, item.is_auto):
+            result.update(status="cooldown", detail="Cooldown active")
+            continue
+
+        savepoint = db.begin_nested()
+        try:
+            log = create_log(db, user, item, item.is_auto, timestamp=at, commit=False)
+        except IntegrityError:
+            # Same key committed by a concurrent request
+            savepoint.rollback()
+            result.update(status="duplicate", log=get_log_by_client_key(db, user.id, item.client_key))
+            continue
+        if log is None:
+            savepoint.rollback()
+            result.update(status="rejected", detail="Spot not found or too far away")
+            continue
+        savepoint.commit()
+
+        existing[item.client_key] = log
+        recent.setdefault(item.spot_id, []).append((at, bool(item.is_auto)))
+        created.append(log)
+        result.update(status="created", log=log)
+
+    commit_logs(db, created)
+    for log in created:
+        db.refresh(log)
+        after_log_committed(log)
+    return results
+
+
+# --- Log history (keyset pagination) ---
+#
+# Pages are ordered by (timestamp, id) descending and continue from an opaque
+# cursor holding the last row's (timestamp, id), so a page deep in the history
+# costs the same index range scan as the first one (no OFFSET). Only the list
+# columns are loaded; has_photo is computed in SQL and usernames are joined in
+# the same statement.
+
+LOG_LIST_COLUMNS = (
+    Log.id, Log.user_id, Log.spot_id, Log.distance, Log.is_auto,
+    Log.xp_gained, Log.claim_points, Log.notes, Log.timestamp, Log.has_photo,
+)
+
+
+def encode_cursor(timestamp: datetime, log_id: int) -> str:
+    raw = f"{timestamp.isoformat()}|{log_id}".encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str) -> Tuple[datetime, int]:
+    """(timestamp, id) of a cursor; raises ValueError if it is malformed"""
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)).decode()
+        timestamp, log_id = raw.rsplit("|", 1)
+        return datetime.fromisoformat(timestamp), int(log_id)
+    except Exception:
+        raise ValueError("Invalid cursor")
+
 
+def paginate_logs(query, limit: int, cursor: Optional[str] = None) -> Tuple[list, Optional[str]]:
+    """Apply keyset pagination to a query selecting from logs.
 
-def get_spot_logs(db: Session, spot_id: int, limit: int = 50) -> List[Log]:
-    """Get recent logs for a spot"""
-    return db.query(Log).filter(
-        Log.spot_id == spot_id
-    ).order_by(Log.timestamp.desc()).limit(limit).all()
+    Returns (rows, next_cursor); next_cursor is None on the last page. Rows
+    must expose `timestamp` and `id` (Log entities or labeled columns) or be
+    (Log, ...) tuples.
+    """
+    if cursor:
+        timestamp, log_id = decode_cursor(cursor)
+        query = query.filter(tuple_(Log.timestamp, Log.id) < tuple_(timestamp, log_id))
+    rows = query.order_by(Log.timestamp.desc(), Log.id.desc()).limit(limit + 1).all()
 
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        last = rows[-1][0] if isinstance(rows[-1][0], Log) else rows[-1]
+        next_cursor = encode_cursor(last.timestamp, last.id)
+    return rows, next_cursor
 
-def update_claim(db: Session, user_id: int, spot_id: int, points: int):
+
+def _log_history(db: Session, limit: int, cursor: Optional[str], *criteria) -> Tuple[List[Log], Optional[str]]:
+    query = db.query(Log, User.username).outerjoin(User, User.id == Log.user_id).options(
+        load_only(*LOG_LIST_COLUMNS)
+    ).filter(*criteria)
+    rows, next_cursor = paginate_logs(query, limit, cursor)
+
+    logs = []
+    for log, username in rows:
+        log.username = username or "Unknown"  # Transient, for LogResponse
+        logs.append(log)
+    return logs, next_cursor
+
+
+def get_user_logs(db: Session, user_id: int, limit: int = 50,
+                  cursor: Optional[str] = None) -> Tuple[List[Log], Optional[str]]:
+    """Get a page of a user's logs, newest first; returns (logs, next_cursor)"""
+    return _log_history(db, limit, cursor, Log.user_id == user_id)
+
+
+def get_spot_logs(db: Session, spot_id: int, limit: int = 50,
+                  cursor: Optional[str] = None) -> Tuple[List[Log], Optional[str]]:
+    """Get a page of a spot's logs, newest first; returns (logs, next_cursor)"""
+    return _log_history(db, limit, cursor, Log.spot_id == spot_id)
+
+
+def update_claim(db: Session, user_id: int, spot_id: int, points: int, commit: bool = True):
     """Update or create claim for user at spot"""
     claim = db.query(Claim).filter(
         Claim.user_id == user_id,
@@ -282,20 +499,33 @@ def update_claim(db: Session, user_id: int, spot_id: int, points: int):
         )
         db.add(claim)
     
-    db.commit()
+    if commit:
+        db.commit()
 
 
-def apply_claim_decay(db: Session):
-    """Apply time-based decay to all claims"""
-    claims = db.query(Claim).all()
-    now = get_current_cet()
-    
-    for claim in claims:
-        hours_since_decay = (now - claim.last_decay).total_seconds() / 3600
-        decay_amount = hours_since_decay * settings.CLAIM_DECAY_RATE
-        
-        claim.claim_value = max(0, claim.claim_value - decay_amount)
-        claim.dominance = max(0, claim.dominance - decay_amount * 0.1)
-        claim.last_decay = now
-    
+def apply_claim_decay(db: Session, now: Optional[datetime] = None, batch_size: Optional[int] = None) -> int:
+    """Apply time-based decay to claims not decayed since `now` (set-based; at most batch_size rows).
+
+    Returns the number of decayed claims.
+    """
+    now = now or get_current_cet()
+    hours = seconds_between(literal(now, DateTime), Claim.last_decay) / 3600.0
+    decay_amount = hours * settings.CLAIM_DECAY_RATE
+    claim_value = Claim.claim_value - decay_amount
+    dominance = Claim.dominance - decay_amount * 0.1
+
+    pending = select(Claim.id).where(Claim.last_decay < now).order_by(Claim.id)
+    if batch_size:
+        pending = pending.limit(batch_size)
+    result = db.execute(
+        update(Claim)
+        .where(Claim.id.in_(pending))
+        .values(
+            claim_value=case((claim_value > 0, claim_value), else_=0.0),
+            dominance=case((dominance > 0, dominance), else_=0.0),
+            last_decay=now,
+        )
+        .execution_options(synchronize_session=False)
+    )
     db.commit()
+    return int(result.rowcount or 0)
@@ -1,14 +1,18 @@
 from sqlalchemy.orm import Session
-from sqlalchemy import and_, text, func
 from datetime import datetime, timedelta
-from geoalchemy2.elements import WKTElement
-from app.models import Spot, User, Item, InventoryItem, get_cet_now
+from app.models import get_cet_now
 from app.config import settings
+from app.schemas import SpotResponse
 import random
 import math
-from typing import List, Optional
-from app.services import buff_service
-from app.services.auth_service import update_user_xp
+from typing import List, Optional, Tuple
+from app.services import buff_service, geo_service, item_catalog, metrics
+from app.services.auth_service import award_xp
+from app.services.item_service import increment_inventory
+from app.services.loot_store import LootDrop, store
+
+# Active loot spots per user
+MAX_ACTIVE_LOOT = 5
 
 
 def get_current_cet():
@@ -16,122 +20,84 @@ def get_current_cet():
     return get_cet_now()
 
 
-def spawn_loot_spots_for_user(db: Session, user_id: int, latitude: float, longitude: float, radius_meters: int = 500) -> List[Spot]:
+def to_spot_response(drop: LootDrop) -> SpotResponse:
+    """Loot drop in the shape of a map spot"""
+    return SpotResponse(
+        id=drop.id,
+        name=f"Loot ({drop.xp} XP)",
+        description="Mysterious loot appeared!",
+        latitude=drop.latitude,
+        longitude=drop.longitude,
+        is_permanent=False,
+        is_loot=True,
+        created_at=drop.created_at,
+        creator_id=None,
+        loot_expires_at=drop.expires_at,
+        loot_xp=drop.xp
+    )
+
+
+def spawn_loot(
+    db: Session,
+    user_id: int,
+    latitude: float,
+    longitude: float,
+    radius_min: float,
+    radius_max: float,
+    now: Optional[datetime] = None
+) -> Optional[LootDrop]:
     """
-    Spawn loot spots around user's current position.
-    Returns list of newly spawned loot spots.
+    Spawn one loot drop at a random spot radius_min..radius_max meters around a position.
+    Returns None if the user already has MAX_ACTIVE_LOOT active drops.
     """
+    current_time = now or get_current_cet()
+    if len(store.active_for(user_id, current_time)) >= MAX_ACTIVE_LOOT:
+        return None
+    
+    angle = random.uniform(0, 2 * math.pi)  # Random angle in radians
+    distance = random.uniform(min(radius_min, radius_max), radius_max)
+    
+    # Calculate offset lat/lng using proper trigonometry
+    # 1 degree latitude = ~111,000 meters
+    # 1 degree longitude = ~111,000 * cos(latitude) meters
+    lat_offset = (distance * math.cos(angle)) / 111000
+    lng_offset = (distance * math.sin(angle)) / (111000 * math.cos(math.radians(latitude)))
+    
+    # Random loot contents
+    loot_xp = random.randint(10, 50)
+    expires_at = current_time + timedelta(minutes=random.randint(5, 15))
+    
+    # Optionally spawn with item (30% chance)
+    item = item_catalog.get(db).sample() if random.random() < 0.3 else None
+    
+    drop = store.add(
+        owner_id=user_id,
+        latitude=latitude + lat_offset,
+        longitude=longitude + lng_offset,
+        xp=loot_xp,
+        expires_at=expires_at,
+        now=current_time,
+        item_id=item.id if item else None,
+        item_name=item.name if item else None
+    )
+    metrics.loot_events.inc("spawned")
+    return drop
+
+
+def notify_loot_spawn(drop: LootDrop):
+    """Push a loot_spawn event to the drop's owner (safe to call from worker threads)"""
+    from app.ws import events
     from app.ws.connection_manager import manager
-    import asyncio
-    
-    user = db.query(User).filter(User.id == user_id).first()
-    if not user:
-        return []
-    
-    # Check if user already has active loot spots nearby
-    current_time = get_current_cet()
-    existing_loot = db.query(Spot).filter(
-        and_(
-            Spot.owner_id == user_id,
-            Spot.is_loot == True,
-            Spot.loot_expires_at > current_time
-        )
-    ).all()
-    
-    # Limit to max 5 active loot spots per user
-    if len(existing_loot) >= 5:
-        return []
-    
-    # Spawn only 1 loot spot randomly around user
-    num_spots = 1
-    spawned_spots = []
-    
-    for _ in range(num_spots):
-        # Random offset within radius (50-300m around player)
-        angle = random.uniform(0, 2 * math.pi)  # Random angle in radians
-        distance = random.uniform(50, min(300, radius_meters))
-        
-        # Calculate offset lat/lng using proper trigonometry
-        # 1 degree latitude = ~111,000 meters
-        # 1 degree longitude = ~111,000 * cos(latitude) meters
-        lat_offset = (distance * math.cos(angle)) / 111000
-        lng_offset = (distance * math.sin(angle)) / (111000 * math.cos(math.radians(latitude)))
-        
-        loot_lat = latitude + lat_offset
-        loot_lng = longitude + lng_offset
-        
-        # Random loot contents
-        loot_xp = random.randint(10, 50)
-        expires_at = current_time + timedelta(minutes=random.randint(5, 15))
-        
-        # Optionally spawn with item (30% chance)
-        loot_item_id = None
-        item_name = None
-        if random.random() < 0.3:
-            items = db.query(Item).all()
-            if items:
-                item = random.choice(items)
-                loot_item_id = item.id
-                item_name = item.name
-        
-        # Create loot spot
-        point = f'POINT({loot_lng} {loot_lat})'
-        loot_spot = Spot(
-            name=f"Loot ({loot_xp} XP)",
-            description="Mysterious loot appeared!",
-            location=WKTElement(point, srid=4326),
-            is_permanent=False,
-            is_loot=True,
-            owner_id=user_id,
-            loot_expires_at=expires_at,
-            loot_xp=loot_xp,
-            loot_item_id=loot_item_id,
-            created_at=current_time
-        )
-        
-        db.add(loot_spot)
-        db.flush()  # Get the ID but don't commit yet
-        
-        # Store for WebSocket notification after commit
-        spawned_spots.append({
-            'spot': loot_spot,
-            'lat': loot_lat,
-            'lng': loot_lng,
-            'item_name': item_name
-        })
-    
-    db.commit()
-    
-    # Refresh and send WebSocket notifications
-    result_spots = []
-    for spot_data in spawned_spots:
-        spot = spot_data['spot']
-        db.refresh(spot)
-        result_spots.append(spot)
-    # Refresh and send WebSocket notifications
-    result_spots = []
-    for spot_data in spawned_spots:
-        spot = spot_data['spot']
-        db.refresh(spot)
-        result_spots.append(spot)
-        
-        # Send WebSocket notification
-        try:
-            asyncio.create_task(
-                manager.send_loot_spawn(
-                    user_id=user_id,
-                    spot_id=spot.id,
-                    latitude=spot_data['lat'],
-                    longitude=spot_data['lng'],
-                    xp=spot.loot_xp,
-                    item_name=spot_data['item_name'],
-                    expires_at=spot.loot_expires_at.isoformat() if spot.loot_expires_at else None
-                )
-            )
-        except:
-            pass  # WebSocket notification is not critical
     
-    return result_spots
+    events.emit(manager.send_loot_spawn(
+        user_id=drop.owner_id,
+        spot_id=drop.id,
+        latitude=drop.latitude,
+        longitude=drop.longitude,
+        xp=drop.xp,
+        item_name=drop.item_name,
+        expires_at=drop.expires_at.isoformat()
+    ))
 
 
 def collect_loot(db: Session, user_id: int, loot_spot_id: int, user_lat: float, user_lng: float) -> dict:
@@ -140,48 +106,19 @@ def collect_loot(db: Session, user_id: int, loot_spot_id: int, user_lat: float,
     First-come-first-serve: Any user can collect any loot spot.
     Returns dict with rewards.
     """
-    loot_spot = db.query(Spot).filter(
-        and_(
-            Spot.id == loot_spot_id,
-            Spot.is_loot == True
-        )
-    ).first()
+    current_time = get_current_cet()
+    drop = store.get(loot_spot_id)
     
-    if not loot_spot:
+    if not drop:
         return {"success": False, "error": "Loot spot not found or already collected"}
     
     # Check if expired
-    current_time = get_current_cet()
-    if loot_spot.loot_expires_at and loot_spot.loot_expires_at < current_time:
-        # Delete expired loot
-        db.delete(loot_spot)
-        db.commit()
+    if drop.expires_at <= current_time:
+        store.expire(current_time)
         return {"success": False, "error": "Loot expired"}
     
     # Check distance
-    distance_query = text("""
-        SELECT ST_Distance(
-            ST_GeographyFromText(:user_location),
-            location
-        ) as distance
-        FROM spots
-        WHERE id = :spot_id
-    """)
-    
-    try:
-        result = db.execute(distance_query, {
-            "user_location": f"SRID=4326;POINT({user_lng} {user_lat})",
-            "spot_id": loot_spot_id
-        }).fetchone()
-    except Exception:
-        return {"success": False, "error": "Distance calculation failed"}
-
-    distance = None
-    if result and result[0] is not None:
-        try:
-            distance = float(result[0])
-        except Exception:
-            distance = None
+    distance = geo_service.haversine_m(user_lat, user_lng, drop.latitude, drop.longitude)
     
     modifiers = buff_service.get_active_modifiers(db, user_id)
     try:
@@ -189,119 +126,79 @@ def collect_loot(db: Session, user_id: int, loot_spot_id: int, user_lat: float,
     except Exception:
         max_distance = float(settings.MANUAL_LOG_DISTANCE)
 
-    if distance is None or distance > max_distance:
-        distance_str = "unknown" if distance is None else f"{distance:.0f}m"
+    if distance > max_distance:
         return {
             "success": False,
-            "error": f"Too far away (distance: {distance_str}, max: {max_distance:.0f}m)"
+            "error": f"Too far away (distance: {distance:.0f}m, max: {max_distance:.0f}m)"
         }
     
-    # Collect rewards
-    user = db.query(User).filter(User.id == user_id).first()
-    if not user:
-        return {"success": False, "error": "User not found"}
+    # Claim the drop: only one concurrent collector gets it
+    drop = store.claim(loot_spot_id, current_time)
+    if not drop:
+        return {"success": False, "error": "Loot spot not found or already collected"}
     
-    base_xp = int(loot_spot.loot_xp or 0)
+    # One short transaction: XP via UPDATE ... RETURNING, item via upsert
     try:
-        boosted_xp = int(round(float(base_xp) * float(modifiers.xp_multiplier)))
-    except Exception:
-        boosted_xp = base_xp
+        base_xp = int(drop.xp or 0)
+        try:
+            boosted_xp = int(round(float(base_xp) * float(modifiers.xp_multiplier)))
+        except Exception:
+            boosted_xp = base_xp
 
-    rewards = {
-        "xp": boosted_xp,
-        "items": []
-    }
+        rewards = {
+            "xp": boosted_xp,
+            "items": []
+        }
 
-    # Add XP (use common leveling logic)
-    old_level = int(user.level or 1)
-    update_user_xp(db, user, boosted_xp)
-    level_up = int(user.level or 1) > old_level
-    
-    # Add item to inventory if present
-    if loot_spot.loot_item_id:
-        item = db.query(Item).filter(Item.id == loot_spot.loot_item_id).first()
+        awarded = award_xp(db, user_id, boosted_xp)
+        if awarded is None:
+            db.rollback()
+            store.restore(drop)
+            return {"success": False, "error": "User not found"}
+        total_xp, new_level, level_up = awarded
+        
+        # Add item to inventory if present
+        item = item_catalog.get_item(db, drop.item_id)
         if item:
-            # Check if user already has this item
-            inventory_item = db.query(InventoryItem).filter(
-                and_(
-                    InventoryItem.user_id == user_id,
-                    InventoryItem.item_id == item.id
-                )
-            ).first()
-            
-            if inventory_item:
-                inventory_item.quantity += 1
-            else:
-                inventory_item = InventoryItem(
-                    user_id=user_id,
-                    item_id=item.id,
-                    quantity=1,
-                    acquired_at=current_time
-                )
-                db.add(inventory_item)
-            
+            increment_inventory(db, user_id, item.id, acquired_at=current_time)
             rewards["items"].append({
                 "id": item.id,
                 "name": item.name,
                 "rarity": item.rarity
             })
+        
+        db.commit()
+    except Exception:
+        # Rewards were not granted: the loot stays collectable
+        db.rollback()
+        store.restore(drop)
+        raise
     
-    # Delete loot spot after collection
-    db.delete(loot_spot)
-    db.commit()
-    db.refresh(user)
-    
+    metrics.loot_events.inc("collected")
     return {
         "success": True,
         "rewards": rewards,
         "level_up": level_up,
-        "new_level": user.level if level_up else None,
-        "total_xp": user.xp
+        "new_level": new_level if level_up else None,
+        "total_xp": total_xp
     }
 
 
-def cleanup_expired_loot(db: Session):
+def cleanup_expired_loot() -> int:
     """Remove all expired loot spots"""
-    current_time = get_current_cet()
-    expired_loot = db.query(Spot).filter(
-        and_(
-            Spot.is_loot == True,
-            Spot.loot_expires_at < current_time
-        )
-    ).all()
-    
-    for loot in expired_loot:
-        db.delete(loot)
-    
-    db.commit()
-    return len(expired_loot)
+    return len(store.expire(get_current_cet()))
 
 
-def cleanup_expired_loot_for_user(db: Session, user_id: int):
-    """Remove expired loot spots for a specific user"""
-    current_time = get_current_cet()
-    expired_loot = db.query(Spot).filter(
-        and_(
-            Spot.owner_id == user_id,
-            Spot.is_loot == True,
-            Spot.loot_expires_at < current_time
-        )
-    ).all()
-    
-    for loot in expired_loot:
-        db.delete(loot)
-    
-    db.commit()
-    return len(expired_loot)
+def cleanup_expired_loot_for_user(user_id: int) -> int:
+    """Remove expired loot spots; returns how many of them belonged to the user"""
+    return sum(1 for drop in store.expire(get_current_cet()) if drop.owner_id == user_id)
 
 
-def get_active_loot_for_user(db: Session, user_id: int) -> List[Spot]:
+def get_active_loot_for_user(user_id: int) -> List[LootDrop]:
     """Get all active (non-expired) loot spots for a user"""
-    current_time = get_current_cet()
-    return db.query(Spot).filter(
-        and_(
-            Spot.owner_id == user_id,
-            Spot.is_loot == True,
-            Spot.loot_expires_at > current_time
-        )
-    ).all()
+    return store.active_for(user_id, get_current_cet())
+
+
+def get_loot_in_radius(latitude: float, longitude: float, radius_meters: float) -> List[Tuple[LootDrop, float]]:
+    """Active loot drops of all players within radius of a point, with distances"""
+    return store.within(latitude, longitude, radius_meters, get_current_cet())
@@ -0,0 +1,98 @@
+"""
+Server-driven loot spawning.
+
+Instead of every client calling /api/loot/spawn on a timer, a scheduler job
+(see scheduler.py) walks the players connected to this worker every
+LOOT_SPAWN_TICK seconds. Each player gets a spawn attempt every
+LOOT_SPAWN_INTERVAL seconds; attempts are offset by a random phase per
+player, so the work is spread evenly over the ticks instead of arriving in
+bursts. An attempt uses the player's last WebSocket position, succeeds with
+the `loot_spawn_rate` game setting, places the drop `loot_spawn_radius_min`
+to `loot_spawn_radius_max` meters away (max MAX_ACTIVE_LOOT per player) and
+pushes a `loot_spawn` event.
+"""
+import random
+import threading
+import time
+from datetime import datetime
+from typing import Dict, List, Tuple
+
+from sqlalchemy.orm import Session
+
+from app.config import settings
+from app.services import admin_service, loot_service
+
+# Positions older than this are not used for spawning (player stopped moving/reporting)
+POSITION_MAX_AGE_SECONDS = 300
+
+_SETTING_NAMES = ("loot_spawn_rate", "loot_spawn_radius_min", "loot_spawn_radius_max")
+
+
+def spawn_settings(db: Session) -> Tuple[float, float, float]:
+    """(spawn rate, min radius, max radius) from the game settings, with their defaults"""
+    values = []
+    for name in _SETTING_NAMES:
+        value = admin_service.get_setting(db, name)
+        values.append(float(admin_service.DEFAULT_SETTINGS[name]["value"] if value is None else value))
+    return values[0], values[1], values[2]
+
+
+class LootSpawner:
+    """Per-player spawn schedule over the positions of connected players"""
+
+    def __init__(self):
+        self._next_attempt: Dict[int, float] = {}
+        self._lock = threading.Lock()
+
+    def due_players(
+        self, positions: Dict[int, Tuple[float, float, float]], now: float, limit: int
+    ) -> List[Tuple[int, float, float]]:
+        """(user_id, latitude, longitude) of up to `limit` players whose spawn attempt is due"""
+        interval = max(1.0, float(settings.LOOT_SPAWN_INTERVAL))
+        due = []
+        with self._lock:
+            for user_id in list(self._next_attempt):
+                if user_id not in positions:
+                    del self._next_attempt[user_id]
+            for user_id, (latitude, longitude, reported_at) in positions.items():
+                next_attempt = self._next_attempt.get(user_id)
+                if next_attempt is None:
+                    # Random phase: spreads players evenly over the interval
+                    self._next_attempt[user_id] = now + random.uniform(0, interval)
+                    continue
+                if next_attempt > now or len(due) >= limit:
+                    continue
+                self._next_attempt[user_id] = now + interval
+                if now - reported_at <= POSITION_MAX_AGE_SECONDS:
+                    due.append((user_id, latitude, longitude))
+        return due
+
+    def tick(self, db: Session, now: datetime, limit: int, positions=None) -> int:
+        """Run due spawn attempts; returns the number of attempts"""
+        if positions is None:
+            from app.ws.connection_manager import manager
+            positions = dict(manager.positions)
+        due = self.due_players(positions, time.monotonic(), limit)
+        if not due:
+            return 0
+
+        rate, radius_min, radius_max = spawn_settings(db)
+        for user_id, latitude, longitude in due:
+            if random.random() >= rate:
+                continue
+            drop = loot_service.spawn_loot(db, user_id, latitude, longitude, radius_min, radius_max, now)
+            if drop is not None:
+                loot_service.notify_loot_spawn(drop)
+        return len(due)
+
+    def clear(self):
+        with self._lock:
+            self._next_attempt.clear()
+
+
+spawner = LootSpawner()
+
+
+def run(db: Session, now: datetime, batch_size: int) -> int:
+    """Scheduler job: one batch of spawn attempts"""
+    return spawner.tick(db, now, batch_size)
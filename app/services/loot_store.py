@@ -0,0 +1,300 @@
+"""
+Ephemeral loot drops.
+
+Loot lives for 5-15 minutes, so it is kept in process memory instead of the
+spots table:
+
+- drops by id, with negative ids so they never collide with spot ids on the
+  map or in the client's marker cache,
+- a min-heap of (expires_at, id) so expired drops are swept without scanning,
+- one spatial grid per owner for the nearby and per-user queries,
+- claim() removes a drop under the lock, so exactly one collector wins.
+
+With LOOT_PERSIST_PATH set, the active drops are written behind to a JSON
+snapshot every LOOT_PERSIST_INTERVAL seconds (and on shutdown) and restored
+at startup, so a restart or crash loses at most a few seconds of drops.
+
+Like the memory cooldown store this is only correct with a single worker.
+"""
+import asyncio
+import heapq
+import json
+import logging
+import math
+import os
+import tempfile
+import threading
+from dataclasses import asdict, dataclass
+from datetime import datetime
+from typing import Dict, List, Optional, Set, Tuple
+
+from starlette.concurrency import run_in_threadpool
+
+from app.config import settings
+from app.services.geo_service import METERS_PER_DEGREE_LAT, haversine_m
+
+logger = logging.getLogger(__name__)
+
+CELL_DEGREES = 0.01  # Grid cell edge (~1.1 km north-south)
+
+Cell = Tuple[int, int]
+
+
+@dataclass(frozen=True)
+class LootDrop:
+    id: int
+    owner_id: int
+    latitude: float
+    longitude: float
+    xp: int
+    item_id: Optional[int]
+    item_name: Optional[str]
+    created_at: datetime
+    expires_at: datetime
+
+    def to_json(self) -> dict:
+        data = asdict(self)
+        data["created_at"] = self.created_at.isoformat()
+        data["expires_at"] = self.expires_at.isoformat()
+        return data
+
+    @classmethod
+    def from_json(cls, data: dict) -> "LootDrop":
+        data = dict(data)
+        data["created_at"] = datetime.fromisoformat(data["created_at"])
+        data["expires_at"] = datetime.fromisoformat(data["expires_at"])
+        return cls(**data)
+
+
+def _cell(latitude: float, longitude: float) -> Cell:
+    return math.floor(latitude / CELL_DEGREES), math.floor(longitude / CELL_DEGREES)
+
+
+class LootStore:
+    """Active loot drops with expiry heap and per-owner spatial grids"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._drops: Dict[int, LootDrop] = {}
+        self._heap: List[Tuple[datetime, int]] = []
+        self._grids: Dict[int, Dict[Cell, Set[int]]] = {}
+        self._next_id = -1
+        self.dirty = False
+
+    def __len__(self) -> int:
+        return len(self._drops)
+
+    # --- Mutations (underscored helpers expect the lock to be held) ---------
+
+    def _insert(self, drop: LootDrop):
+        self._drops[drop.id] = drop
+        heapq.heappush(self._heap, (drop.expires_at, drop.id))
+        cells = self._grids.setdefault(drop.owner_id, {})
+        cells.setdefault(_cell(drop.latitude, drop.longitude), set()).add(drop.id)
+        self._next_id = min(self._next_id, drop.id - 1)
+        self.dirty = True
+
+    def _remove(self, drop_id: int) -> Optional[LootDrop]:
+        # The heap entry stays behind and is skipped when it surfaces
+        drop = self._drops.pop(drop_id, None)
+        if drop is None:
+            return None
+        cells = self._grids.get(drop.owner_id, {})
+        key = _cell(drop.latitude, drop.longitude)
+        ids = cells.get(key)
+        if ids is not None:
+            ids.discard(drop_id)
+            if not ids:
+                del cells[key]
+        if not cells:
+            self._grids.pop(drop.owner_id, None)
+        self.dirty = True
+        return drop
+
+    def _expire(self, now: datetime) -> List[LootDrop]:
+        expired = []
+        while self._heap and self._heap[0][0] <= now:
+            expires_at, drop_id = heapq.heappop(self._heap)
+            drop = self._drops.get(drop_id)
+            if drop is not None and drop.expires_at == expires_at:
+                expired.append(self._remove(drop_id))
+        return expired
+
+    def add(
+        self,
+        owner_id: int,
+        latitude: float,
+        longitude: float,
+        xp: int,
+        expires_at: datetime,
+        now: datetime,
+        item_id: Optional[int] = None,
+        item_name: Optional[str] = None,
+    ) -> LootDrop:
+        with self._lock:
+            drop = LootDrop(
+                id=self._next_id,
+                owner_id=owner_id,
+                latitude=latitude,
+                longitude=longitude,
+                xp=xp,
+                item_id=item_id,
+                item_name=item_name,
+                created_at=now,
+                expires_at=expires_at,
+            )
+            self._insert(drop)
+            return drop
+
+    def claim(self, drop_id: int, now: datetime) -> Optional[LootDrop]:
+        """Atomically take an active drop out of the store (None if gone or expired)"""
+        with self._lock:
+            self._expire(now)
+            return self._remove(drop_id)
+
+    def restore(self, drop: LootDrop):
+        """Put a claimed drop back (its reward could not be granted)"""
+        with self._lock:
+            if drop.id not in self._drops:
+                self._insert(drop)
+
+    def expire(self, now: datetime) -> List[LootDrop]:
+        """Remove and return all drops expired at `now`"""
+        with self._lock:
+            return self._expire(now)
+
+    def clear(self):
+        with self._lock:
+            self._drops.clear()
+            self._heap.clear()
+            self._grids.clear()
+            self._next_id = -1
+            self.dirty = False
+
+    # --- Queries ------------------------------------------------------------
+
+    def get(self, drop_id: int) -> Optional[LootDrop]:
+        return self._drops.get(drop_id)
+
+    def active_for(self, owner_id: int, now: datetime) -> List[LootDrop]:
+        with self._lock:
+            self._expire(now)
+            cells = self._grids.get(owner_id, {})
+            drops = [self._drops[drop_id] for ids in cells.values() for drop_id in ids]
+        return sorted(drops, key=lambda drop: drop.created_at)
+
+    def within(
+        self, latitude: float, longitude: float, radius_m: float, now: datetime, owner_id: Optional[int] = None
+    ) -> List[Tuple[LootDrop, float]]:
+        """(drop, distance_m) of active drops within radius_m (of one owner, or everyone's)"""
+        dlat = radius_m / METERS_PER_DEGREE_LAT
+        dlon = min(180.0, dlat / max(math.cos(math.radians(latitude)), 1e-6))
+        lat_lo, lon_lo = _cell(latitude - dlat, longitude - dlon)
+        lat_hi, lon_hi = _cell(latitude + dlat, longitude + dlon)
+
+        hits = []
+        with self._lock:
+            self._expire(now)
+            grids = [self._grids.get(owner_id, {})] if owner_id is not None else list(self._grids.values())
+            for cells in grids:
+                for lat_cell in range(lat_lo, lat_hi + 1):
+                    for lon_cell in range(lon_lo, lon_hi + 1):
+                        for drop_id in cells.get((lat_cell, lon_cell), ()):
+                            drop = self._drops[drop_id]
+                            distance = haversine_m(latitude, longitude, drop.latitude, drop.longitude)
+                            if distance <= radius_m:
+                                hits.append((drop, distance))
+        return hits
+
+    # --- Write-behind snapshot ----------------------------------------------
+
+    def snapshot(self) -> List[dict]:
+        with self._lock:
+            self.dirty = False
+            return [drop.to_json() for drop in self._drops.values()]
+
+    def load(self, rows: List[dict], now: datetime) -> int:
+        """Restore drops from a snapshot, skipping expired ones"""
+        count = 0
+        with self._lock:
+            for row in rows:
+                drop = LootDrop.from_json(row)
+                if drop.expires_at > now and drop.id not in self._drops:
+                    self._insert(drop)
+                    count += 1
+            self.dirty = False
+        return count
+
+
+store = LootStore()
+
+_flush_task: Optional[asyncio.Task] = None
+
+
+def save_snapshot(path: str):
+    """Write the active drops to `path` atomically"""
+    rows = store.snapshot()
+    directory = os.path.dirname(os.path.abspath(path))
+    os.makedirs(directory, exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=directory, prefix=".loot-", suffix=".json")
+    try:
+        with os.fdopen(fd, "w") as handle:
+            json.dump(rows, handle)
+        os.replace(tmp_path, path)
+    except Exception:
+        store.dirty = True
+        if os.path.exists(tmp_path):
+            os.unlink(tmp_path)
+        raise
+
+
+def load_snapshot(path: str, now: datetime) -> int:
+    """Restore drops saved by save_snapshot (0 if there is no snapshot)"""
+    if not os.path.exists(path):
+        return 0
+    with open(path) as handle:
+        return store.load(json.load(handle), now)
+
+
+async def _flush_loop(path: str, interval: float):
+    while True:
+        await asyncio.sleep(interval)
+        if not store.dirty:
+            continue
+        try:
+            await run_in_threadpool(save_snapshot, path)
+        except Exception as e:
+            print(f"[WARN] Loot snapshot failed: {e}")
+            logger.warning("Loot snapshot to %s failed: %s", path, e)
+
+
+def start(now: datetime):
+    """Restore the last snapshot and start writing behind (no-op without LOOT_PERSIST_PATH)"""
+    global _flush_task
+    path = settings.LOOT_PERSIST_PATH
+    if not path:
+        return
+    try:
+        print(f"Restored {load_snapshot(path, now)} active loot drops from {path}")
+    except Exception as e:
+        print(f"[WARN] Loot snapshot restore failed: {e}")
+    _flush_task = asyncio.get_running_loop().create_task(
+        _flush_loop(path, max(0.5, float(settings.LOOT_PERSIST_INTERVAL)))
+    )
+
+
+async def stop():
+    """Stop the write-behind task and write a final snapshot"""
+    global _flush_task
+    if _flush_task is None:
+        return
+    _flush_task.cancel()
+    try:
+        await _flush_task
+    except asyncio.CancelledError:
+        pass
+    _flush_task = None
+    try:
+        await run_in_threadpool(save_snapshot, settings.LOOT_PERSIST_PATH)
+    except Exception as e:
+        print(f"[WARN] Final loot snapshot failed: {e}")
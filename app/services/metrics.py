@@ -0,0 +1,252 @@
+"""
+Prometheus-style metrics (GET /metrics, text exposition format 0.0.4).
+
+Counters and histograms are written on hot paths (every request, log, socket
+send), so they take no lock: each thread increments its own shard (a plain
+dict reached through threading.local) and a scrape sums the shards. A shard is
+only registered, under a lock, the first time a thread touches a metric.
+Values that already live elsewhere (pool usage, socket counts, cache
+hit/miss counters) are gauges read by a callback at scrape time.
+"""
+import bisect
+import math
+import threading
+from typing import Callable, Dict, Iterable, List, Optional, Sequence, Tuple
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+FANOUT_BUCKETS = (0, 1, 2, 5, 10, 25, 50, 100, 250, 1000)
+
+Labels = Tuple[str, ...]
+
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(names: Sequence[str], values: Sequence) -> str:
+    if not names:
+        return ""
+    return "{" + ",".join(f'{name}="{_escape(value)}"' for name, value in zip(names, values)) + "}"
+
+
+def _format_value(value: float) -> str:
+    if value == math.inf:
+        return "+Inf"
+    if float(value).is_integer():
+        return str(int(value))
+    return repr(float(value))
+
+
+class _Metric:
+    kind = ""
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._local = threading.local()
+        self._shards: List[dict] = []
+        self._shards_lock = threading.Lock()
+
+    def _shard(self) -> dict:
+        shard = getattr(self._local, "shard", None)
+        if shard is None:
+            shard = {}
+            with self._shards_lock:
+                self._shards.append(shard)
+            self._local.shard = shard
+        return shard
+
+    def _shard_items(self) -> Iterable[Tuple[Labels, object]]:
+        with self._shards_lock:
+            shards = list(self._shards)
+        for shard in shards:
+            # Copy: the owning thread may add a label set while we read
+            yield from list(shard.items())
+
+    def header(self) -> List[str]:
+        return [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+
+    def clear(self):
+        with self._shards_lock:
+            for shard in self._shards:
+                shard.clear()
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def inc(self, *labels, amount: float = 1):
+        shard = self._shard()
+        shard[labels] = shard.get(labels, 0) + amount
+
+    def values(self) -> Dict[Labels, float]:
+        totals: Dict[Labels, float] = {}
+        for labels, value in self._shard_items():
+            totals[labels] = totals.get(labels, 0) + value
+        return totals
+
+    def render(self) -> List[str]:
+        lines = self.header()
+        for labels, value in sorted(self.values().items()):
+            lines.append(f"{self.name}{_format_labels(self.labelnames, labels)} {_format_value(value)}")
+        return lines
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = (), buckets=LATENCY_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(buckets)
+
+    def observe(self, value: float, *labels):
+        shard = self._shard()
+        state = shard.get(labels)
+        if state is None:
+            # Per-bucket (non-cumulative) counts, then sum and count
+            state = shard[labels] = [0] * (len(self.buckets) + 1) + [0.0, 0]
+        state[bisect.bisect_left(self.buckets, value)] += 1
+        state[-2] += value
+        state[-1] += 1
+
+    def values(self) -> Dict[Labels, list]:
+        totals: Dict[Labels, list] = {}
+        for labels, state in self._shard_items():
+            total = totals.get(labels)
+            if total is None:
+                totals[labels] = list(state)
+            else:
+                for i, value in enumerate(state):
+                    total[i] += value
+        return totals
+
+    def render(self) -> List[str]:
+        lines = self.header()
+        bounds = list(self.buckets) + [math.inf]
+        for labels, state in sorted(self.values().items()):
+            cumulative = 0
+            for bound, count in zip(bounds, state):
+                cumulative += count
+                le = _format_labels(self.labelnames + ("le",), labels + (_format_value(bound),))
+                lines.append(f"{self.name}_bucket{le} {cumulative}")
+            suffix = _format_labels(self.labelnames, labels)
+            lines.append(f"{self.name}_sum{suffix} {_format_value(state[-2])}")
+            lines.append(f"{self.name}_count{suffix} {state[-1]}")
+        return lines
+
+
+class Gauge(_Metric):
+    """Read at scrape time: fn() returns a number or {label values tuple: number}"""
+
+    kind = "gauge"
+
+    def __init__(self, name: str, documentation: str, fn: Callable, labelnames: Sequence[str] = ()):
+        super().__init__(name, documentation, labelnames)
+        self.fn = fn
+
+    def render(self) -> List[str]:
+        lines = self.header()
+        try:
+            value = self.fn()
+        except Exception:
+            return lines
+        samples = value.items() if isinstance(value, dict) else [((), value)]
+        for labels, sample in sorted(samples):
+            if sample is not None:
+                lines.append(f"{self.name}{_format_labels(self.labelnames, labels)} {_format_value(sample)}")
+        return lines
+
+
+class CallbackCounter(Gauge):
+    """Counter kept by its owner (e.g. a cache's hit/miss attributes), read at scrape time"""
+
+    kind = "counter"
+
+
+class Registry:
+    def __init__(self):
+        self._metrics: Dict[str, _Metric] = {}
+
+    def register(self, metric: _Metric) -> _Metric:
+        self._metrics[metric.name] = metric
+        return metric
+
+    def get(self, name: str) -> Optional[_Metric]:
+        return self._metrics.get(name)
+
+    def render(self) -> str:
+        lines: List[str] = []
+        for metric in self._metrics.values():
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+    def clear(self):
+        for metric in self._metrics.values():
+            metric.clear()
+
+
+registry = Registry()
+
+
+def counter(name: str, documentation: str, labelnames: Sequence[str] = ()) -> Counter:
+    return registry.register(Counter(name, documentation, labelnames))
+
+
+def histogram(name: str, documentation: str, labelnames: Sequence[str] = (), buckets=LATENCY_BUCKETS) -> Histogram:
+    return registry.register(Histogram(name, documentation, labelnames, buckets))
+
+
+def gauge(name: str, documentation: str, fn: Callable, labelnames: Sequence[str] = ()) -> Gauge:
+    return registry.register(Gauge(name, documentation, fn, labelnames))
+
+
+def callback_counter(name: str, documentation: str, fn: Callable, labelnames: Sequence[str] = ()) -> CallbackCounter:
+    return registry.register(CallbackCounter(name, documentation, fn, labelnames))
+
+
+# --- Metrics written on the hot paths -----------------------------------------
+
+http_requests = counter("claim_http_requests_total", "HTTP requests by route and status", ("method", "route", "status"))
+http_latency = histogram("claim_http_request_duration_seconds", "HTTP request latency by route", ("method", "route"))
+ws_fanout = histogram(
+    "claim_ws_fanout_sockets", "Local sockets a WebSocket message was delivered to", ("event_type",), FANOUT_BUCKETS
+)
+logs_created = counter("claim_logs_created_total", "Logs created", ("kind",))
+loot_events = counter("claim_loot_total", "Loot drops spawned and collected", ("event",))
+cache_lookups = counter("claim_cache_lookups_total", "Cache lookups by cache and result", ("cache", "result"))
+
+
+def register_runtime_gauges():
+    """Gauges over state owned by other modules (imported lazily to avoid import cycles)"""
+    from app.database import engine
+    from app.services import user_cache
+    from app.ws.connection_manager import manager
+
+    def pool_stats():
+        pool = engine.pool
+        if not hasattr(pool, "checkedout"):
+            return {}  # SQLite StaticPool: one shared connection
+        return {
+            ("size",): pool.size(),
+            ("checked_out",): pool.checkedout(),
+            ("overflow",): max(0, pool.overflow()),
+            ("checked_in",): pool.checkedin(),
+        }
+
+    gauge("claim_db_pool_connections", "Database pool connections by state", pool_stats, ("state",))
+    gauge("claim_ws_connected_users", "Users with at least one socket on this worker",
+          lambda: len(manager.active_connections))
+    gauge("claim_ws_connections", "Open sockets on this worker",
+          lambda: sum(len(sockets) for sockets in manager.active_connections.values()))
+    gauge("claim_user_cache_entries", "Cached authenticated users", lambda: len(user_cache.principals))
+    callback_counter(
+        "claim_user_cache_lookups_total", "Authenticated user cache lookups by result",
+        lambda: {("hit",): user_cache.principals.hits, ("miss",): user_cache.principals.misses}, ("result",),
+    )
+
+
+def render() -> str:
+    return registry.render()
@@ -0,0 +1,206 @@
+"""
+Content-addressed photo storage on the filesystem.
+
+Photos are stored once per SHA-256 digest under PHOTO_STORAGE_DIR as
+``<dir>/<aa>/<bb>/<sha256>``. Log rows only keep the digest, size and MIME
+type, so log queries never load image bytes, and identical uploads share one
+file. Files are immutable, which lets the photo endpoint serve them with
+long-lived caching and the digest as ETag.
+"""
+import hashlib
+import json
+import os
+import re
+import secrets
+import tempfile
+import time
+from typing import AsyncIterator, Optional, Tuple
+
+from starlette.concurrency import run_in_threadpool
+
+from app.config import settings
+
+_SHA256_RE = re.compile(r"^[0-9a-f]{64}$")
+
+
+def storage_dir() -> str:
+    return os.path.abspath(settings.PHOTO_STORAGE_DIR)
+
+
+def path_for(sha256: str) -> str:
+    """Filesystem path of a stored photo (the digest is validated, never trusted as a path)"""
+    if not _SHA256_RE.match(sha256 or ""):
+        raise ValueError("Invalid photo digest")
+    return os.path.join(storage_dir(), sha256[:2], sha256[2:4], sha256)
+
+
+def exists(sha256: str) -> bool:
+    try:
+        return os.path.isfile(path_for(sha256))
+    except ValueError:
+        return False
+
+
+def _commit_temp_file(tmp_path: str, sha256: str) -> str:
+    """Atomically move a fully written temp file into place (no-op if the digest already exists)"""
+    final_path = path_for(sha256)
+    if os.path.exists(final_path):
+        os.unlink(tmp_path)
+        return final_path
+    os.makedirs(os.path.dirname(final_path), exist_ok=True)
+    os.chmod(tmp_path, 0o644)
+    os.replace(tmp_path, final_path)
+    return final_path
+
+
+def put_bytes(data: bytes) -> Tuple[str, int]:
+    """Store photo bytes; returns (sha256, size)"""
+    sha256 = hashlib.sha256(data).hexdigest()
+    if exists(sha256):
+        return sha256, len(data)
+
+    os.makedirs(storage_dir(), exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=storage_dir(), prefix=".upload-")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            f.write(data)
+            f.flush()
+            os.fsync(f.fileno())
+        _commit_temp_file(tmp_path, sha256)
+    except Exception:
+        if os.path.exists(tmp_path):
+            os.unlink(tmp_path)
+        raise
+    return sha256, len(data)
+
+
+def open_path(sha256: Optional[str]) -> Optional[str]:
+    """Path of a stored photo, or None if missing"""
+    if not sha256:
+        return None
+    try:
+        path = path_for(sha256)
+    except ValueError:
+        return None
+    return path if os.path.isfile(path) else None
+
+
+# --- Direct uploads -------------------------------------------------------
+#
+# POST /api/logs/upload streams the image in chunks into
+# <dir>/uploads/<token> (hashing on the way) and writes a small sidecar
+# <token>.json. LogCreate.photo_upload_token then claims the upload, which
+# moves the file into the content store with a rename - no base64, no copy.
+
+UPLOAD_CHUNK_SIZE = 64 * 1024
+UPLOAD_TTL_SECONDS = 3600
+MAX_PHOTO_BYTES = 5 * 1024 * 1024
+
+_TOKEN_RE = re.compile(r"^[A-Za-z0-9_-]{20,64}$")
+
+
+class PhotoTooLarge(Exception):
+    pass
+
+
+def uploads_dir() -> str:
+    return os.path.join(storage_dir(), "uploads")
+
+
+def _upload_paths(token: str) -> Tuple[str, str]:
+    if not _TOKEN_RE.match(token or ""):
+        raise ValueError("Invalid upload token")
+    base = os.path.join(uploads_dir(), token)
+    return base, base + ".json"
+
+
+async def save_upload(chunks: AsyncIterator[bytes], user_id: int, mime_type: str,
+                      max_bytes: Optional[int] = None) -> dict:
+    """Stream an upload to disk; memory use is bounded by the chunk size.
+
+    Every filesystem call runs in the threadpool. Unclaimed uploads are
+    removed by the scheduler (cleanup_expired_uploads), not per request.
+    """
+    max_bytes = max_bytes or MAX_PHOTO_BYTES
+    await run_in_threadpool(os.makedirs, uploads_dir(), exist_ok=True)
+
+    token = secrets.token_urlsafe(24)
+    data_path, meta_path = _upload_paths(token)
+    part_path = data_path + ".part"
+    digest = hashlib.sha256()
+    size = 0
+    f = await run_in_threadpool(open, part_path, "wb")
+    try:
+        async for chunk in chunks:
+            if not chunk:
+                continue
+            size += len(chunk)
+            if size > max_bytes:
+                raise PhotoTooLarge(f"File too large (max {max_bytes // (1024 * 1024)}MB)")
+            digest.update(chunk)
+            await run_in_threadpool(f.write, chunk)
+        await run_in_threadpool(f.close)
+        await run_in_threadpool(os.replace, part_path, data_path)
+    except BaseException:
+        # Also runs on cancellation, so no await here
+        f.close()
+        if os.path.exists(part_path):
+            os.unlink(part_path)
+        raise
+
+    meta = {
+        "user_id": user_id,
+        "mime_type": mime_type,
+        "sha256": digest.hexdigest(),
+        "size": size,
+        "created_at": time.time(),
+    }
+    await run_in_threadpool(_write_meta, meta_path, meta)
+    return {"upload_token": token, **meta}
+
+
+def _write_meta(meta_path: str, meta: dict):
+    with open(meta_path, "w", encoding="utf-8") as f:
+        json.dump(meta, f)
+
+
+def claim_upload(token: str, user_id: int) -> Optional[Tuple[str, int, str]]:
+    """Move an upload into the content store; returns (sha256, size, mime_type) or None"""
+    try:
+        data_path, meta_path = _upload_paths(token)
+        with open(meta_path, "r", encoding="utf-8") as f:
+            meta = json.load(f)
+    except (ValueError, OSError):
+        return None
+
+    if meta.get("user_id") != user_id or time.time() - meta.get("created_at", 0) > UPLOAD_TTL_SECONDS:
+        return None
+    if not os.path.isfile(data_path):
+        return None
+
+    sha256 = meta["sha256"]
+    try:
+        _commit_temp_file(data_path, sha256)
+        os.unlink(meta_path)
+    except OSError:
+        return None  # Claimed concurrently
+    return sha256, int(meta["size"]), meta.get("mime_type") or "image/jpeg"
+
+
+def cleanup_expired_uploads() -> int:
+    """Delete uploads that were never referenced by a log"""
+    removed = 0
+    cutoff = time.time() - UPLOAD_TTL_SECONDS
+    try:
+        entries = os.scandir(uploads_dir())
+    except FileNotFoundError:
+        return 0
+    with entries:
+        for entry in entries:
+            try:
+                if entry.stat().st_mtime < cutoff:
+                    os.unlink(entry.path)
+                    removed += 1
+            except OSError:
+                pass
+    return removed
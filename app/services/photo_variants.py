@@ -0,0 +1,159 @@
+"""
+Resized photo variants (thumbnail / display) generated off the event loop.
+
+After a log photo is stored, a small thumbnail for spot log lists and a
+capped-resolution display version for the photo viewer are rendered in a
+ProcessPoolExecutor (PIL releases the GIL only partially, and decoding large
+JPEGs is CPU heavy). Variants are written next to the original in the
+content-addressed store as ``<sha256>.<variant>.<ext>``.
+
+Pillow is optional: without it only the original is served.
+"""
+import asyncio
+import os
+import threading
+from concurrent.futures import Future, ProcessPoolExecutor
+from multiprocessing import get_context
+from typing import Dict, Optional, Tuple
+
+from starlette.concurrency import run_in_threadpool
+
+from app.config import settings
+from app.services import photo_store
+
+try:
+    from PIL import Image, ImageOps, features
+except ImportError:  # pragma: no cover - Pillow is optional
+    Image = None
+
+# name -> (longest edge in px, encoder quality)
+VARIANTS: Dict[str, Tuple[int, int]] = {
+    "thumb": (320, 70),
+    "display": (1280, 82),
+}
+
+# Refuse to decode absurd images (decompression bombs)
+MAX_SOURCE_PIXELS = 40_000_000
+
+_executor: Optional[ProcessPoolExecutor] = None
+_executor_lock = threading.Lock()
+_in_flight: Dict[str, Future] = {}
+
+
+def is_available() -> bool:
+    return Image is not None
+
+
+def _output_format() -> Tuple[str, str, str]:
+    """(PIL format, file extension, MIME type) for variants"""
+    if features.check("webp"):
+        return "WEBP", "webp", "image/webp"
+    return "JPEG", "jpg", "image/jpeg"
+
+
+def variant_path(sha256: str, variant: str) -> Optional[Tuple[str, str]]:
+    """(path, mime type) of an existing variant, or None"""
+    if variant not in VARIANTS:
+        return None
+    base = photo_store.path_for(sha256)
+    for ext, mime in (("webp", "image/webp"), ("jpg", "image/jpeg")):
+        path = f"{base}.{variant}.{ext}"
+        if os.path.isfile(path):
+            return path, mime
+    return None
+
+
+def render_variants(source: str) -> Dict[str, str]:
+    """Render all missing variants of a stored photo file (runs in a worker process)"""
+    if not os.path.isfile(source):
+        return {}
+
+    Image.MAX_IMAGE_PIXELS = MAX_SOURCE_PIXELS
+    pil_format, ext, _ = _output_format()
+    written = {}
+    with Image.open(source) as original:
+        image = ImageOps.exif_transpose(original)
+        if image.mode not in ("RGB", "L"):
+            image = image.convert("RGB")
+
+        for variant, (edge, quality) in VARIANTS.items():
+            target = f"{source}.{variant}.{ext}"
+            if os.path.isfile(target):
+                continue
+            resized = image.copy()
+            resized.thumbnail((edge, edge), Image.LANCZOS)
+            tmp = f"{target}.tmp-{os.getpid()}"
+            save_options = {"quality": quality}
+            if pil_format == "JPEG":
+                save_options.update(optimize=True, progressive=True)
+            else:
+                save_options.update(method=4)
+            resized.save(tmp, pil_format, **save_options)
+            os.chmod(tmp, 0o644)
+            os.replace(tmp, target)
+            written[variant] = target
+    return written
+
+
+def _get_executor() -> ProcessPoolExecutor:
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            # spawn: never fork a process that runs threads (uvicorn, DB pool, broker)
+            _executor = ProcessPoolExecutor(
+                max_workers=max(1, settings.IMAGE_WORKERS),
+                mp_context=get_context("spawn"),
+            )
+        return _executor
+
+
+def _submit(sha256: str) -> Future:
+    """Queue rendering for a photo (deduplicated while in flight)"""
+    with _executor_lock:
+        future = _in_flight.get(sha256)
+        if future is not None:
+            return future
+    future = _get_executor().submit(render_variants, photo_store.path_for(sha256))
+    with _executor_lock:
+        _in_flight[sha256] = future
+    future.add_done_callback(lambda _: _in_flight.pop(sha256, None))
+    return future
+
+
+def schedule(sha256: Optional[str]):
+    """Fire-and-forget rendering after a photo was accepted"""
+    if not sha256 or not is_available() or settings.IMAGE_WORKERS <= 0:
+        return
+    try:
+        _submit(sha256).add_done_callback(_log_failure)
+    except Exception as e:
+        print(f"[WARN] Could not queue photo variants for {sha256}: {e}")
+
+
+def _log_failure(future: Future):
+    if future.exception() is not None:
+        print(f"[WARN] Photo variant rendering failed: {future.exception()}")
+
+
+async def ensure_variant(sha256: str, variant: str) -> Optional[Tuple[str, str]]:
+    """Path and MIME type of a variant, rendering it first if needed (None: serve the original)"""
+    existing = variant_path(sha256, variant)
+    if existing or not is_available():
+        return existing
+    try:
+        if settings.IMAGE_WORKERS <= 0:
+            await run_in_threadpool(render_variants, photo_store.path_for(sha256))
+        else:
+            await asyncio.wrap_future(_submit(sha256))
+    except Exception as e:
+        print(f"[WARN] Photo variant rendering failed for {sha256}: {e}")
+        return None
+    return variant_path(sha256, variant)
+
+
+def shutdown():
+    global _executor
+    with _executor_lock:
+        if _executor is not None:
+            _executor.shutdown(wait=False, cancel_futures=True)
+            _executor = None
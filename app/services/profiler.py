@@ -0,0 +1,188 @@
+"""
+On-demand sampling profiler.
+
+A background thread snapshots the stacks of all other threads of this worker
+(sys._current_frames) every PROFILER_INTERVAL_MS and counts identical stacks.
+Each stack is rooted at its thread name, so the event loop and the threadpool
+show up as separate towers. Results render as
+
+- collapsed stacks ("thread;outer;inner 42" per line) for flamegraph.pl,
+  inferno or speedscope's import, or
+- speedscope JSON (https://www.speedscope.app/file-format-schema.json).
+
+Sampling costs one stack walk per thread per interval, so it only runs while
+an admin asks for it: POST /api/admin/profile for a time-bounded profile of
+the whole worker, or the X-Profile header on a single request (see main.py).
+Only one profile runs at a time.
+"""
+import json
+import os
+import sys
+import threading
+import time
+import uuid
+from collections import Counter, OrderedDict
+from typing import Dict, List, Optional, Tuple
+
+from app.config import settings
+
+FORMATS = ("collapsed", "speedscope")
+KEPT_REQUEST_PROFILES = 20
+REQUEST_INTERVAL_MS = 2.0  # Single requests are short: sample them more densely
+
+_ROOT = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+Frame = Tuple[str, str, int]  # (function, file, first line)
+
+
+class ProfilerBusy(Exception):
+    """Another profile is already running in this worker"""
+
+
+def _short_path(filename: str) -> str:
+    if filename.startswith(_ROOT + os.sep):
+        return os.path.relpath(filename, _ROOT)
+    parts = filename.replace("\\", "/").split("/")
+    # Keep the package-relative tail of library paths (".../site-packages/sqlalchemy/orm/query.py")
+    if "site-packages" in parts:
+        parts = parts[parts.index("site-packages") + 1:]
+    return "/".join(parts[-3:])
+
+
+class Profile:
+    """Aggregated samples: (frames root to leaf) -> count"""
+
+    def __init__(self, name: str, interval: float):
+        self.name = name
+        self.interval = interval
+        self.stacks: Counter = Counter()
+        self.samples = 0
+        self.duration = 0.0
+
+    def collapsed(self) -> str:
+        lines = []
+        for stack, count in self.stacks.most_common():
+            names = [frame[0] if not frame[1] else f"{frame[0]} ({frame[1]}:{frame[2]})" for frame in stack]
+            lines.append(f"{';'.join(name.replace(';', ',') for name in names)} {count}")
+        return "\n".join(lines) + "\n"
+
+    def speedscope(self) -> dict:
+        frames: List[dict] = []
+        index: Dict[Frame, int] = {}
+        samples, weights = [], []
+        for stack, count in self.stacks.most_common():
+            sample = []
+            for frame in stack:
+                if frame not in index:
+                    index[frame] = len(frames)
+                    entry = {"name": frame[0]}
+                    if frame[1]:
+                        entry.update(file=frame[1], line=frame[2])
+                    frames.append(entry)
+                sample.append(index[frame])
+            samples.append(sample)
+            weights.append(round(count * self.interval, 6))
+        return {
+            "$schema": "https://www.speedscope.app/file-format-schema.json",
+            "name": self.name,
+            "exporter": "claim-profiler",
+            "shared": {"frames": frames},
+            "profiles": [{
+                "type": "sampled",
+                "name": self.name,
+                "unit": "seconds",
+                "startValue": 0,
+                "endValue": round(sum(weights), 6),
+                "samples": samples,
+                "weights": weights,
+            }],
+        }
+
+    def render(self, fmt: str) -> Tuple[str, str]:
+        """(body, media type) in the requested format"""
+        if fmt == "speedscope":
+            return json.dumps(self.speedscope()), "application/json"
+        return self.collapsed(), "text/plain; charset=utf-8"
+
+
+class Sampler:
+    """Background thread sampling every other thread into a Profile"""
+
+    def __init__(self, profile: Profile):
+        self.profile = profile
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="profiler", daemon=True)
+
+    def _sample(self):
+        own = threading.get_ident()
+        names = {thread.ident: thread.name for thread in threading.enumerate()}
+        for ident, frame in sys._current_frames().items():
+            if ident == own:
+                continue
+            stack = []
+            while frame is not None:
+                code = frame.f_code
+                stack.append((code.co_name, _short_path(code.co_filename), code.co_firstlineno))
+                frame = frame.f_back
+            stack.append((f"thread:{names.get(ident, ident)}", "", 0))
+            stack.reverse()
+            self.profile.stacks[tuple(stack)] += 1
+        self.profile.samples += 1
+
+    def _run(self):
+        started = time.perf_counter()
+        while not self._stop.wait(self.profile.interval):
+            self._sample()
+        self.profile.duration = time.perf_counter() - started
+
+    def start(self):
+        self._thread.start()
+
+    def stop(self) -> Profile:
+        self._stop.set()
+        self._thread.join()
+        return self.profile
+
+
+_running = threading.Lock()
+_request_profiles: "OrderedDict[str, Profile]" = OrderedDict()
+_request_profiles_lock = threading.Lock()
+
+
+def interval_seconds(interval_ms: Optional[float] = None) -> float:
+    return max(1.0, float(interval_ms or settings.PROFILER_INTERVAL_MS)) / 1000.0
+
+
+def start(name: str, interval_ms: Optional[float] = None) -> Sampler:
+    """Start sampling; raises ProfilerBusy if a profile is already running"""
+    if not _running.acquire(blocking=False):
+        raise ProfilerBusy()
+    try:
+        sampler = Sampler(Profile(name, interval_seconds(interval_ms)))
+        sampler.start()
+    except Exception:
+        _running.release()
+        raise
+    return sampler
+
+
+def stop(sampler: Sampler) -> Profile:
+    try:
+        return sampler.stop()
+    finally:
+        _running.release()
+
+
+def keep_request_profile(profile: Profile) -> str:
+    """Store a per-request profile for GET /api/admin/profiles/{id}; returns its id"""
+    profile_id = uuid.uuid4().hex[:12]
+    with _request_profiles_lock:
+        _request_profiles[profile_id] = profile
+        while len(_request_profiles) > KEPT_REQUEST_PROFILES:
+            _request_profiles.popitem(last=False)
+    return profile_id
+
+
+def get_request_profile(profile_id: str) -> Optional[Profile]:
+    with _request_profiles_lock:
+        return _request_profiles.get(profile_id)
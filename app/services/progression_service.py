@@ -12,14 +12,11 @@ DEFAULT_LEVEL_XP_BASE = 100
 DEFAULT_LEVEL_XP_INCREMENT = 10
 
 
-def _get_int_setting(db: Session, setting_name: str, default_value: int) -> int:
-    setting = db.query(GameSetting).filter(
-        GameSetting.setting_name == setting_name
-    ).first()
-    if not setting:
+def _parse_int(value, default_value: int) -> int:
+    if value is None:
         return int(default_value)
     try:
-        return int(setting.setting_value)
+        return int(value)
     except (TypeError, ValueError):
         return int(default_value)
 
@@ -30,8 +27,14 @@ def get_level_curve_params(db: Session) -> Tuple[int, int]:
     base: XP needed for the first level-up (Level 1 -> 2)
     increment: additional XP added per next level-up (linear increase)
     """
-    base = _get_int_setting(db, "level_xp_base", DEFAULT_LEVEL_XP_BASE)
-    inc = _get_int_setting(db, "level_xp_increment", DEFAULT_LEVEL_XP_INCREMENT)
+    # Both settings in one query (runs on every XP award)
+    values = dict(
+        db.query(GameSetting.setting_name, GameSetting.setting_value)
+        .filter(GameSetting.setting_name.in_(("level_xp_base", "level_xp_increment")))
+        .all()
+    )
+    base = _parse_int(values.get("level_xp_base"), DEFAULT_LEVEL_XP_BASE)
+    inc = _parse_int(values.get("level_xp_increment"), DEFAULT_LEVEL_XP_INCREMENT)
     if base < 1:
         base = DEFAULT_LEVEL_XP_BASE
     if inc < 0:
@@ -91,3 +94,42 @@ def xp_to_next_level(db: Session, xp: int, current_level: int) -> int:
     if remaining < 0:
         return 0
     return int(remaining)
+
+
+def get_user_stats(db: Session, user) -> dict:
+    """Game statistics for a user (payload of GET /api/items/stats and `stats_update` pushes)."""
+    from sqlalchemy import func
+    from app.models import Log, Claim, Track, InventoryItem
+
+    total_logs = db.query(func.count(Log.id)).filter(
+        Log.user_id == user.id
+    ).scalar() or 0
+
+    total_spots_claimed = db.query(func.count(Claim.id)).filter(
+        Claim.user_id == user.id,
+        Claim.claim_value > 0
+    ).scalar() or 0
+
+    active_tracks = db.query(func.count(Track.id)).filter(
+        Track.user_id == user.id,
+        Track.is_active == True
+    ).scalar() or 0
+
+    inventory_count = db.query(func.sum(InventoryItem.quantity)).filter(
+        InventoryItem.user_id == user.id
+    ).scalar() or 0
+
+    base, inc = get_level_curve_params(db)
+    computed_level = level_from_xp(user.xp or 0, base, inc)
+    effective_level = max(int(user.level or 1), int(computed_level))
+
+    return {
+        "level": effective_level,
+        "xp": user.xp or 0,
+        "xp_to_next_level": xp_to_next_level(db, user.xp or 0, effective_level),
+        "total_claim_points": user.total_claim_points or 0,
+        "total_logs": int(total_logs),
+        "total_spots_claimed": int(total_spots_claimed),
+        "active_tracks": int(active_tracks),
+        "inventory_count": int(inventory_count),
+    }
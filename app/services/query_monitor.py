@@ -0,0 +1,185 @@
+"""
+Per-request SQL instrumentation.
+
+Cursor events on every SQLAlchemy engine count the statements a request
+issues, their total time and how often the same statement (fingerprint)
+repeats. The HTTP middleware in main.py opens a RequestQueries for each
+request and reports it:
+
+- as a `Server-Timing: db;dur=..;desc="N queries"` response header,
+- into a rolling per-route report (GET /api/admin/queries),
+- as a warning when one fingerprint repeats N_PLUS_ONE_THRESHOLD times in a
+  request, which is almost always a lazy load or a query inside a loop.
+
+The request's collector lives in a ContextVar, so queries from the threadpool
+(sync routes and dependencies copy the context) land in the right request.
+capture() collects every query regardless of request; the `query_budget`
+test fixture is built on it.
+"""
+import logging
+import re
+import threading
+import time
+from collections import Counter, deque
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Deque, Dict, List, Optional
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+from app.config import settings
+
+logger = logging.getLogger(__name__)
+
+RECENT_OFFENDERS = 50  # N+1 requests kept for the admin report
+
+_IN_LIST = re.compile(r"\((?:\s*(?:\?|%\(\w+\)s|\$\d+|:\w+)\s*,)+\s*(?:\?|%\(\w+\)s|\$\d+|:\w+)\s*\)")
+_WHITESPACE = re.compile(r"\s+")
+
+
+def fingerprint(statement: str) -> str:
+    """Statement with whitespace and expanded IN lists collapsed"""
+    return _IN_LIST.sub("(?)", _WHITESPACE.sub(" ", statement).strip())
+
+
+class RequestQueries:
+    """Statements issued while one request (or capture block) was active"""
+
+    def __init__(self):
+        self.count = 0
+        self.duration_ms = 0.0
+        self.fingerprints: Counter = Counter()
+
+    def record(self, statement: str, duration_ms: float):
+        self.count += 1
+        self.duration_ms += duration_ms
+        self.fingerprints[fingerprint(statement)] += 1
+
+    def repeated(self, threshold: int) -> List[tuple]:
+        """(fingerprint, count) of statements issued at least `threshold` times"""
+        return [(fp, n) for fp, n in self.fingerprints.most_common() if n >= threshold]
+
+    def server_timing(self) -> str:
+        return f'db;dur={self.duration_ms:.1f};desc="{self.count} queries"'
+
+
+_current: ContextVar[Optional[RequestQueries]] = ContextVar("request_queries", default=None)
+_captures: List[RequestQueries] = []
+_captures_lock = threading.Lock()
+_installed = False
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault("query_started", []).append(time.perf_counter())
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    started = conn.info.get("query_started")
+    if not started:
+        return
+    duration_ms = (time.perf_counter() - started.pop()) * 1000
+    current = _current.get()
+    if current is not None:
+        current.record(statement, duration_ms)
+    if _captures:
+        with _captures_lock:
+            for capture_block in _captures:
+                capture_block.record(statement, duration_ms)
+
+
+def _handle_error(context):
+    # The statement failed: after_cursor_execute will not run for it
+    if context.connection is not None:
+        started = context.connection.info.get("query_started")
+        if started:
+            started.pop()
+
+
+def install():
+    """Listen on all engines (sync, the async engine's sync_engine and test engines); idempotent"""
+    global _installed
+    if _installed:
+        return
+    event.listen(Engine, "before_cursor_execute", _before_cursor_execute)
+    event.listen(Engine, "after_cursor_execute", _after_cursor_execute)
+    event.listen(Engine, "handle_error", _handle_error)
+    _installed = True
+
+
+def begin_request() -> RequestQueries:
+    queries = RequestQueries()
+    _current.set(queries)
+    return queries
+
+
+@contextmanager
+def capture():
+    """Collect every statement executed inside the block, from any thread"""
+    install()
+    queries = RequestQueries()
+    with _captures_lock:
+        _captures.append(queries)
+    try:
+        yield queries
+    finally:
+        with _captures_lock:
+            _captures.remove(queries)
+
+
+class QueryReport:
+    """Rolling per-route query statistics for the admin panel"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._routes: Dict[str, dict] = {}
+        self._offenders: Deque[dict] = deque(maxlen=RECENT_OFFENDERS)
+
+    def add(self, route: str, queries: RequestQueries):
+        threshold = max(2, int(settings.N_PLUS_ONE_THRESHOLD))
+        repeated = queries.repeated(threshold)
+        with self._lock:
+            stats = self._routes.get(route)
+            if stats is None:
+                stats = self._routes[route] = {
+                    "requests": 0, "queries": 0, "max_queries": 0, "db_ms": 0.0, "n_plus_one": 0,
+                }
+            stats["requests"] += 1
+            stats["queries"] += queries.count
+            stats["max_queries"] = max(stats["max_queries"], queries.count)
+            stats["db_ms"] += queries.duration_ms
+            if repeated:
+                stats["n_plus_one"] += 1
+                self._offenders.append({
+                    "route": route,
+                    "queries": queries.count,
+                    "repeated": [{"statement": fp, "count": n} for fp, n in repeated[:3]],
+                })
+        if repeated:
+            fp, n = repeated[0]
+            logger.warning("Possible N+1 in %s: %d x %s", route, n, fp[:200])
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            routes = [
+                {
+                    "route": route,
+                    "requests": stats["requests"],
+                    "avg_queries": round(stats["queries"] / stats["requests"], 2),
+                    "max_queries": stats["max_queries"],
+                    "avg_db_ms": round(stats["db_ms"] / stats["requests"], 2),
+                    "n_plus_one": stats["n_plus_one"],
+                }
+                for route, stats in self._routes.items()
+            ]
+            offenders = list(self._offenders)
+        routes.sort(key=lambda row: row["avg_queries"] * row["requests"], reverse=True)
+        return {"routes": routes, "recent_n_plus_one": offenders}
+
+    def clear(self):
+        with self._lock:
+            self._routes.clear()
+            self._offenders.clear()
+
+
+report = QueryReport()
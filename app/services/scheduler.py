@@ -0,0 +1,289 @@
+"""
+In-app background job scheduler.
+
+Periodic maintenance that used to run on request paths (or not at all):
+
+    loot_expiry     sweep expired drops from the in-memory loot store
+    loot_spawn      spawn loot around connected players (loot_spawner.py)
+    buff_expiry     delete expired user_buffs rows
+    claim_decay     apply CLAIM_DECAY_RATE to claims
+    metrics_cleanup delete energy metrics older than METRICS_RETENTION_DAYS
+    stale_tracks    end tracks without points for TRACK_STALE_MINUTES
+    upload_expiry   delete photo uploads no log claimed within UPLOAD_TTL_SECONDS
+
+Database jobs are bounded: every statement touches at most
+SCHEDULER_BATCH_SIZE rows and a run issues at most SCHEDULER_MAX_BATCHES
+statements. They only run on the leader worker, elected with a session-level
+PostgreSQL advisory lock held on a dedicated connection (on SQLite the single
+process is always the leader). Per-process jobs (loot store and spawner) run on
+every worker. Run statistics are exposed at /api/admin/scheduler.
+"""
+import asyncio
+import logging
+import time
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+from typing import Callable, Dict, List, Optional
+
+from sqlalchemy import text
+from starlette.concurrency import run_in_threadpool
+
+from app.config import settings
+from app.database import engine, session_scope
+from app.models import get_cet_now
+
+logger = logging.getLogger(__name__)
+
+LEADER_LOCK_KEY = 0x436C61696D  # "Claim"
+TICK_SECONDS = 1.0
+
+
+@dataclass
+class Job:
+    """A periodic job: fn(db, now, batch_size) -> affected rows of one batch (db is None for memory jobs)"""
+
+    name: str
+    interval: float
+    fn: Callable
+    uses_db: bool = True
+    leader_only: bool = True
+    next_run: float = 0.0
+    runs: int = 0
+    skipped: int = 0
+    failures: int = 0
+    total_affected: int = 0
+    last_affected: int = 0
+    last_started_at: Optional[datetime] = None
+    last_duration_ms: Optional[float] = None
+    last_error: Optional[str] = None
+
+    def stats(self) -> dict:
+        return {
+            "name": self.name,
+            "interval_seconds": self.interval,
+            "leader_only": self.leader_only,
+            "runs": self.runs,
+            "skipped": self.skipped,
+            "failures": self.failures,
+            "total_affected": self.total_affected,
+            "last_affected": self.last_affected,
+            "last_started_at": self.last_started_at.isoformat() if self.last_started_at else None,
+            "last_duration_ms": self.last_duration_ms,
+            "last_error": self.last_error,
+        }
+
+
+class LeaderLock:
+    """Session-level advisory lock on a dedicated connection (always held on SQLite)"""
+
+    def __init__(self, key: int = LEADER_LOCK_KEY):
+        self.key = key
+        self._connection = None
+
+    @property
+    def is_leader(self) -> bool:
+        return not settings.is_postgresql() or self._connection is not None
+
+    def acquire(self) -> bool:
+        """Try to become (or check we still are) the leader; never blocks"""
+        if not settings.is_postgresql():
+            return True
+        if self._connection is not None:
+            try:
+                self._connection.execute(text("SELECT 1"))
+                # End the autobegun transaction: an idle-in-transaction session holds back
+                # vacuum and may be killed by idle_in_transaction_session_timeout (losing the lock)
+                self._connection.commit()
+                return True
+            except Exception as e:
+                # Connection lost: the server released the lock with it
+                logger.warning("Scheduler leader connection lost: %s", e)
+                self._close()
+        connection = engine.connect()
+        try:
+            acquired = connection.execute(text("SELECT pg_try_advisory_lock(:key)"), {"key": self.key}).scalar()
+            connection.commit()
+        except Exception:
+            connection.close()
+            raise
+        if not acquired:
+            connection.close()
+            return False
+        self._connection = connection
+        logger.info("This worker is the scheduler leader")
+        return True
+
+    def release(self):
+        if self._connection is None:
+            return
+        try:
+            self._connection.execute(text("SELECT pg_advisory_unlock(:key)"), {"key": self.key})
+            self._connection.commit()
+        except Exception:
+            pass
+        self._close()
+
+    def _close(self):
+        try:
+            self._connection.close()
+        except Exception:
+            pass
+        self._connection = None
+
+
+class Scheduler:
+    def __init__(self):
+        self.jobs: Dict[str, Job] = {}
+        self.leader = LeaderLock()
+        self._task: Optional[asyncio.Task] = None
+
+    def add_job(self, name: str, interval: float, fn: Callable, uses_db: bool = True, leader_only: bool = True):
+        # First run after one interval, not during startup
+        self.jobs[name] = Job(
+            name=name, interval=float(interval), fn=fn, uses_db=uses_db, leader_only=leader_only,
+            next_run=time.monotonic() + float(interval),
+        )
+
+    def run_job(self, job: Job, now: Optional[datetime] = None) -> int:
+        """Run one job to completion (bounded by SCHEDULER_MAX_BATCHES); blocking"""
+        now = now or get_cet_now()
+        batch_size = max(1, int(settings.SCHEDULER_BATCH_SIZE))
+        started = time.perf_counter()
+        job.last_started_at = now
+        affected = 0
+        try:
+            for _ in range(max(1, int(settings.SCHEDULER_MAX_BATCHES))):
+                if job.uses_db:
+                    with session_scope() as db:
+                        count = job.fn(db, now, batch_size)
+                else:
+                    count = job.fn(None, now, batch_size)
+                affected += count
+                if count < batch_size:
+                    break
+            job.last_error = None
+        except Exception as e:
+            job.failures += 1
+            job.last_error = f"{type(e).__name__}: {e}"
+            print(f"[WARN] Scheduled job {job.name} failed: {job.last_error}")
+            logger.warning("Scheduled job %s failed: %s", job.name, e)
+        job.runs += 1
+        job.last_affected = affected
+        job.total_affected += affected
+        job.last_duration_ms = round((time.perf_counter() - started) * 1000, 2)
+        return affected
+
+    def _due_jobs(self, now: float) -> List[Job]:
+        return [job for job in self.jobs.values() if job.next_run <= now]
+
+    async def tick(self):
+        now = time.monotonic()
+        due = self._due_jobs(now)
+        if not due:
+            return
+        is_leader = None
+        for job in due:
+            job.next_run = now + job.interval
+            if job.leader_only:
+                if is_leader is None:
+                    try:
+                        is_leader = await run_in_threadpool(self.leader.acquire)
+                    except Exception as e:
+                        logger.warning("Scheduler leader election failed: %s", e)
+                        is_leader = False
+                if not is_leader:
+                    job.skipped += 1
+                    continue
+            await run_in_threadpool(self.run_job, job)
+
+    async def _run(self):
+        while True:
+            await asyncio.sleep(TICK_SECONDS)
+            try:
+                await self.tick()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.warning("Scheduler tick failed: %s", e)
+
+    def start(self):
+        if self._task is None:
+            self._task = asyncio.get_running_loop().create_task(self._run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        await run_in_threadpool(self.leader.release)
+
+    def stats(self) -> dict:
+        return {
+            "running": self._task is not None,
+            "is_leader": self.leader.is_leader,
+            "jobs": [job.stats() for job in self.jobs.values()],
+        }
+
+
+# --- Jobs -------------------------------------------------------------------
+
+
+def _expire_loot(db, now: datetime, batch_size: int) -> int:
+    from app.services.loot_store import store
+    return len(store.expire(now))
+
+
+def _spawn_loot(db, now: datetime, batch_size: int) -> int:
+    from app.services import loot_spawner
+    return loot_spawner.run(db, now, batch_size)
+
+
+def _expire_buffs(db, now: datetime, batch_size: int) -> int:
+    from app.services import buff_service
+    return buff_service.cleanup_expired_buffs(db, now, batch_size)
+
+
+def _decay_claims(db, now: datetime, batch_size: int) -> int:
+    from app.services import log_service
+    return log_service.apply_claim_decay(db, now, batch_size)
+
+
+def _cleanup_metrics(db, now: datetime, batch_size: int) -> int:
+    from app.services.energy_service import EnergyService
+    return EnergyService.cleanup_old_metrics(db, days=settings.METRICS_RETENTION_DAYS, batch_size=batch_size)
+
+
+def _close_stale_tracks(db, now: datetime, batch_size: int) -> int:
+    from app.services import tracking_service
+    cutoff = now - timedelta(minutes=settings.TRACK_STALE_MINUTES)
+    return tracking_service.close_stale_tracks(db, cutoff, batch_size)
+
+
+def _expire_uploads(db, now: datetime, batch_size: int) -> int:
+    from app.services import photo_store
+    return photo_store.cleanup_expired_uploads()
+
+
+scheduler = Scheduler()
+
+
+def start():
+    """Register the maintenance jobs and start the scheduler loop (called from lifespan)"""
+    if not settings.SCHEDULER_ENABLED:
+        return
+    scheduler.add_job("loot_expiry", settings.LOOT_SWEEP_INTERVAL, _expire_loot, uses_db=False, leader_only=False)
+    scheduler.add_job("loot_spawn", settings.LOOT_SPAWN_TICK, _spawn_loot, leader_only=False)
+    scheduler.add_job("buff_expiry", settings.BUFF_SWEEP_INTERVAL, _expire_buffs)
+    scheduler.add_job("claim_decay", settings.CLAIM_DECAY_INTERVAL, _decay_claims)
+    scheduler.add_job("metrics_cleanup", settings.METRICS_SWEEP_INTERVAL, _cleanup_metrics)
+    scheduler.add_job("stale_tracks", settings.TRACK_SWEEP_INTERVAL, _close_stale_tracks)
+    # Shared photo storage: one worker scans it
+    scheduler.add_job("upload_expiry", settings.UPLOAD_SWEEP_INTERVAL, _expire_uploads, uses_db=False)
+    scheduler.start()
+
+
+async def stop():
+    await scheduler.stop()
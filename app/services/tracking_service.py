@@ -1,15 +1,15 @@
 from datetime import datetime
 from typing import List, Optional
-from sqlalchemy.orm import Session
-from sqlalchemy import func, text
-from geoalchemy2.functions import ST_MakeLine, ST_SetSRID, ST_MakePoint, ST_Length
-from geoalchemy2.elements import WKTElement
-from geoalchemy2.types import Geography
-from app.models import Track, TrackPoint, User
+from sqlalchemy.orm import Session, aliased
+from sqlalchemy import Integer, cast, func, select, update
+from app.database import seconds_between
+from app.models import Track, TrackPoint
+from app.services.user_cache import UserPrincipal
+from app.services import geo_service
 from app.schemas import TrackCreate, TrackPointCreate
 
 
-def create_track(db: Session, user: User, track_data: TrackCreate) -> Track:
+def create_track(db: Session, user: UserPrincipal, track_data: TrackCreate) -> Track:
     """Create a new track for a user"""
     track = Track(
         user_id=user.id,
@@ -37,10 +37,9 @@ def add_track_point(
     if not track:
         return None
     
-    point_wkt = f'POINT({point_data.longitude} {point_data.latitude})'
     track_point = TrackPoint(
         track_id=track_id,
-        location=WKTElement(point_wkt, srid=4326),
+        location=geo_service.point_value(point_data.latitude, point_data.longitude),
         altitude=point_data.altitude,
         accuracy=point_data.accuracy,
         heading=point_data.heading,
@@ -85,24 +84,16 @@ def update_track_stats(db: Session, track: Track):
     if len(points) < 2:
         return
     
-    # Build LineString from points (cast Geography to Geometry)
-    coords = []
-    for p in points:
-        coord = db.execute(
-            text("SELECT ST_X(location::geometry), ST_Y(location::geometry) FROM track_points WHERE id = :id"), 
-            {"id": p.id}
-        ).fetchone()
-        if coord:
-            lon, lat = coord
-            coords.append(f'{lon} {lat}')
-    linestring_wkt = f'LINESTRING({", ".join(coords)})'
-    
-    track.path = WKTElement(linestring_wkt, srid=4326)
-    
-    # Calculate distance in km using PostGIS
-    distance_meters = db.query(
-        ST_Length(track.path)
-    ).scalar()
+    # Build LineString from points (coordinates decoded in Python)
+    coordinates = geo_service.coordinates_map(db, points)
+    coords = [coordinates[p.id] for p in points if p.id in coordinates]
+    if len(coords) < 2:
+        return
+    
+    track.path = geo_service.line_value(coords)
+    
+    # Great-circle length of the path in km
+    distance_meters = geo_service.path_length_m(coords)
     
     if distance_meters:
         track.distance_km = distance_meters / 1000.0
@@ -131,3 +122,42 @@ def get_active_track(db: Session, user_id: int) -> Optional[Track]:
 def get_track_with_points(db: Session, track_id: int) -> Optional[Track]:
     """Get a track with all its points"""
     return db.query(Track).filter(Track.id == track_id).first()
+
+
+def close_stale_tracks(db: Session, cutoff: datetime, batch_size: Optional[int] = None) -> int:
+    """End active tracks without points since `cutoff` (set-based; at most batch_size tracks).
+
+    The track ends at its last point (or its start if it has none).
+    Returns the number of ended tracks.
+    """
+    def last_activity(track):
+        last_point = (
+            select(func.max(TrackPoint.timestamp))
+            .where(TrackPoint.track_id == track.id)
+            .correlate(track)
+            .scalar_subquery()
+        )
+        return func.coalesce(last_point, track.started_at)
+
+    candidate = aliased(Track)
+    stale = (
+        select(candidate.id)
+        .where(candidate.is_active == True, last_activity(candidate) < cutoff)
+        .order_by(candidate.id)
+    )
+    if batch_size:
+        stale = stale.limit(batch_size)
+
+    ended_at = last_activity(Track)
+    result = db.execute(
+        update(Track)
+        .where(Track.id.in_(stale))
+        .values(
+            is_active=False,
+            ended_at=ended_at,
+            duration_minutes=cast(seconds_between(ended_at, Track.started_at) / 60, Integer),
+        )
+        .execution_options(synchronize_session=False)
+    )
+    db.commit()
+    return int(result.rowcount or 0)
@@ -0,0 +1,119 @@
+"""
+Authenticated user principals.
+
+Every authenticated request used to load the full `User` row by the token
+subject. Most handlers only need the id (and the admin check the role), so
+get_current_user resolves the token to a small immutable UserPrincipal from
+this cache instead:
+
+- LRU-bounded to USER_CACHE_SIZE entries, keyed by token subject (username),
+- each entry lives USER_CACHE_TTL seconds, which also bounds how long another
+  worker may keep serving a stale role/active flag,
+- admin_service drops a user's entry on role, active, color changes and on
+  delete, so this worker sees them on the next request.
+
+Handlers that mutate the user (XP, claim points) load the ORM `User` through
+routers.auth.get_current_db_user.
+"""
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Dict, Optional, Tuple
+
+from sqlalchemy.orm import Session
+
+from app.config import settings
+from app.models import User, UserRole
+
+
+@dataclass(frozen=True)
+class UserPrincipal:
+    id: int
+    username: str
+    role: UserRole
+    is_active: bool
+    heatmap_color: Optional[str]
+
+
+class PrincipalCache:
+    """username -> (principal, expires_at) in LRU order"""
+
+    def __init__(self):
+        self._entries: "OrderedDict[str, Tuple[UserPrincipal, float]]" = OrderedDict()
+        self._usernames: Dict[int, str] = {}
+        self._lock = threading.Lock()
+        # Bumped by every invalidation; a load that raced with one is not stored
+        self._generation = 0
+        self.hits = 0
+        self.misses = 0
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def get(self, db: Session, username: str) -> Optional[UserPrincipal]:
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(username)
+            if entry is not None and entry[1] > now:
+                self._entries.move_to_end(username)
+                self.hits += 1
+                return entry[0]
+            self.misses += 1
+            generation = self._generation
+
+        row = (
+            db.query(User.id, User.username, User.role, User.is_active, User.heatmap_color)
+            .filter(User.username == username)
+            .first()
+        )
+        if row is None:
+            return None
+        principal = UserPrincipal(
+            id=row.id,
+            username=row.username,
+            role=row.role,
+            is_active=bool(row.is_active),
+            heatmap_color=row.heatmap_color,
+        )
+
+        with self._lock:
+            if generation == self._generation:
+                self._store(username, principal, now + max(0.0, float(settings.USER_CACHE_TTL)))
+        return principal
+
+    def _store(self, username: str, principal: UserPrincipal, expires_at: float):
+        self._entries[username] = (principal, expires_at)
+        self._entries.move_to_end(username)
+        self._usernames[principal.id] = username
+        while len(self._entries) > max(1, int(settings.USER_CACHE_SIZE)):
+            _, (evicted, _) = self._entries.popitem(last=False)
+            self._usernames.pop(evicted.id, None)
+
+    def invalidate(self, user_id: int):
+        """Drop a user's principal (after changing or deleting the user)"""
+        with self._lock:
+            self._generation += 1
+            username = self._usernames.pop(user_id, None)
+            if username is not None:
+                self._entries.pop(username, None)
+
+    def clear(self):
+        with self._lock:
+            self._generation += 1
+            self._entries.clear()
+            self._usernames.clear()
+            self.hits = 0
+            self.misses = 0
+
+
+principals = PrincipalCache()
+
+
+def get_principal(db: Session, username: str) -> Optional[UserPrincipal]:
+    """Principal for a token subject (None if no such user)"""
+    return principals.get(db, username)
+
+
+def invalidate_user(user_id: int):
+    principals.invalidate(user_id)
@@ -0,0 +1,260 @@
+"""
+Pub/sub brokers for fanning WebSocket messages out across workers.
+
+Every worker keeps its own sockets in a ConnectionManager. Broadcasts and
+personal messages are published as small JSON envelopes through a broker so
+that a player connected to worker A also receives events raised on worker B.
+
+Available brokers (selected via settings.WS_BROKER):
+- "memory":   In-process only (single worker, tests, development)
+- "postgres": PostgreSQL LISTEN/NOTIFY on the game database
+- "redis":    Redis pub/sub (works with any Redis-compatible server, incl. unix sockets)
+"""
+from __future__ import annotations
+
+import asyncio
+import json
+import logging
+import select
+import threading
+import uuid
+from abc import ABC, abstractmethod
+from typing import Awaitable, Callable, Optional
+
+from app.config import settings
+
+logger = logging.getLogger(__name__)
+
+DeliverCallback = Callable[[dict], Awaitable[None]]
+
+# PostgreSQL rejects NOTIFY payloads of 8000 bytes or more
+PG_NOTIFY_MAX_BYTES = 7900
+
+# Backoff (seconds) while the LISTEN connection cannot be re-established
+RECONNECT_MIN_DELAY = 1.0
+RECONNECT_MAX_DELAY = 30.0
+
+
+class Broker(ABC):
+    """Base class for WebSocket message brokers"""
+
+    # Whether messages can originate from other processes
+    is_distributed = False
+
+    def __init__(self):
+        self.worker_id = uuid.uuid4().hex
+        self._on_message: Optional[DeliverCallback] = None
+
+    async def start(self, on_message: DeliverCallback):
+        """Start receiving envelopes published by other workers"""
+        self._on_message = on_message
+
+    async def stop(self):
+        """Stop receiving envelopes and release resources"""
+        self._on_message = None
+
+    @abstractmethod
+    async def publish(self, envelope: dict):
+        """Publish an envelope to all other workers"""
+
+    async def _dispatch(self, envelope: dict):
+        """Hand a received envelope to the connection manager (skipping our own)"""
+        if envelope.get("origin") == self.worker_id or self._on_message is None:
+            return
+        try:
+            await self._on_message(envelope)
+        except Exception as e:
+            logger.error(f"Broker delivery failed: {e}")
+
+
+class InProcessBroker(Broker):
+    """Single-process broker: the connection manager already delivers locally"""
+
+    async def publish(self, envelope: dict):
+        return None
+
+
+class PostgresBroker(Broker):
+    """Broker using PostgreSQL LISTEN/NOTIFY (no extra infrastructure needed)"""
+
+    is_distributed = True
+
+    def __init__(self, dsn: str, channel: str = "claim_ws"):
+        super().__init__()
+        # psycopg2 does not understand SQLAlchemy driver suffixes
+        self.dsn = dsn.replace("postgresql+psycopg2://", "postgresql://", 1)
+        self.channel = channel
+        self._listen_conn = None
+        self._publish_conn = None
+        self._publish_lock = threading.Lock()
+        self._thread: Optional[threading.Thread] = None
+        self._running = False
+        self._stopping = threading.Event()
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+
+    def _connect(self):
+        import psycopg2
+        import psycopg2.extensions
+
+        conn = psycopg2.connect(self.dsn)
+        conn.set_isolation_level(psycopg2.extensions.ISOLATION_LEVEL_AUTOCOMMIT)
+        return conn
+
+    def _connect_listener(self):
+        conn = self._connect()
+        with conn.cursor() as cur:
+            cur.execute(f"LISTEN {self.channel}")
+        return conn
+
+    @staticmethod
+    def _close(conn):
+        try:
+            if conn is not None:
+                conn.close()
+        except Exception:
+            pass
+
+    async def start(self, on_message: DeliverCallback):
+        await super().start(on_message)
+        self._loop = asyncio.get_running_loop()
+        self._listen_conn = await self._loop.run_in_executor(None, self._connect_listener)
+        self._publish_conn = await self._loop.run_in_executor(None, self._connect)
+        self._stopping.clear()
+        self._running = True
+        self._thread = threading.Thread(target=self._listen_loop, name="ws-pg-listener", daemon=True)
+        self._thread.start()
+        logger.info(f"PostgreSQL WebSocket broker listening on '{self.channel}'")
+
+    def _listen_loop(self):
+        """Background thread: wait for notifications and forward them to the event loop.
+
+        A lost connection (server restart, network reset) is re-established with
+        backoff and LISTEN re-issued; notifications sent meanwhile are lost.
+        """
+        delay = RECONNECT_MIN_DELAY
+        while self._running:
+            try:
+                if self._listen_conn is None:
+                    self._listen_conn = self._connect_listener()
+                    delay = RECONNECT_MIN_DELAY
+                    logger.info(f"PostgreSQL WebSocket broker reconnected to '{self.channel}'")
+                conn = self._listen_conn
+                if select.select([conn], [], [], 1.0) == ([], [], []):
+                    continue
+                conn.poll()
+                while conn.notifies:
+                    notify = conn.notifies.pop(0)
+                    try:
+                        envelope = json.loads(notify.payload)
+                    except (TypeError, ValueError):
+                        continue
+                    asyncio.run_coroutine_threadsafe(self._dispatch(envelope), self._loop)
+            except Exception as e:
+                if not self._running:
+                    break
+                logger.error(f"PostgreSQL broker listener error: {e}; reconnecting in {delay:.0f}s")
+                self._close(self._listen_conn)
+                self._listen_conn = None
+                self._stopping.wait(delay)
+                delay = min(delay * 2, RECONNECT_MAX_DELAY)
+
+    def _notify(self, payload: str):
+        with self._publish_lock:
+            if self._publish_conn is None or self._publish_conn.closed:
+                self._publish_conn = self._connect()
+            try:
+                with self._publish_conn.cursor() as cur:
+                    cur.execute("SELECT pg_notify(%s, %s)", (self.channel, payload))
+            except Exception:
+                # Reconnect on the next publish
+                self._close(self._publish_conn)
+                self._publish_conn = None
+                raise
+
+    async def publish(self, envelope: dict):
+        payload = json.dumps(envelope, default=str)
+        if len(payload.encode("utf-8")) > PG_NOTIFY_MAX_BYTES:
+            logger.warning(f"WebSocket envelope too large for NOTIFY ({len(payload)} bytes), not fanned out")
+            return
+        await asyncio.get_running_loop().run_in_executor(None, self._notify, payload)
+
+    async def stop(self):
+        self._running = False
+        self._stopping.set()
+        if self._thread:
+            self._thread.join(timeout=2)
+        for conn in (self._listen_conn, self._publish_conn):
+            self._close(conn)
+        self._listen_conn = self._publish_conn = None
+        await super().stop()
+
+
+class RedisBroker(Broker):
+    """Broker using Redis pub/sub (redis://, rediss:// or unix:// URLs)"""
+
+    is_distributed = True
+
+    def __init__(self, url: str, channel: str = "claim_ws"):
+        super().__init__()
+        self.url = url
+        self.channel = channel
+        self._redis = None
+        self._pubsub = None
+        self._reader: Optional[asyncio.Task] = None
+
+    async def start(self, on_message: DeliverCallback):
+        import redis.asyncio as aioredis
+
+        await super().start(on_message)
+        self._redis = aioredis.from_url(self.url)
+        self._pubsub = self._redis.pubsub(ignore_subscribe_messages=True)
+        await self._pubsub.subscribe(self.channel)
+        self._reader = asyncio.create_task(self._read_loop())
+        logger.info(f"Redis WebSocket broker subscribed to '{self.channel}'")
+
+    async def _read_loop(self):
+        while True:
+            try:
+                message = await self._pubsub.get_message(timeout=1.0)
+                if not message:
+                    continue
+                try:
+                    envelope = json.loads(message["data"])
+                except (TypeError, ValueError):
+                    continue
+                await self._dispatch(envelope)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"Redis broker reader error: {e}")
+                await asyncio.sleep(1.0)
+
+    async def publish(self, envelope: dict):
+        await self._redis.publish(self.channel, json.dumps(envelope, default=str))
+
+    async def stop(self):
+        if self._reader:
+            self._reader.cancel()
+            try:
+                await self._reader
+            except (asyncio.CancelledError, Exception):
+                pass
+        if self._pubsub is not None:
+            await self._pubsub.close()
+        if self._redis is not None:
+            await self._redis.close()
+        self._reader = self._pubsub = self._redis = None
+        await super().stop()
+
+
+def create_broker() -> Broker:
+    """Create the broker configured via settings.WS_BROKER"""
+    kind = (settings.WS_BROKER or "memory").lower()
+    if kind == "postgres":
+        if not settings.is_postgresql():
+            logger.warning("WS_BROKER=postgres requires a PostgreSQL DATABASE_URL, using in-process broker")
+            return InProcessBroker()
+        return PostgresBroker(settings.DATABASE_URL)
+    if kind == "redis":
+        return RedisBroker(settings.WS_BROKER_URL or "redis://localhost:6379/0")
+    return InProcessBroker()
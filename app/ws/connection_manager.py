@@ -1,14 +1,61 @@
-from typing import Dict, Set
+from typing import Dict, Optional, Set, Tuple
 from fastapi import WebSocket
 from datetime import datetime
 import json
+import logging
+import time
+
+from app.services import metrics
+from app.ws.broker import Broker, InProcessBroker, create_broker
+
+logger = logging.getLogger(__name__)
 
 
 class ConnectionManager:
-    """Manages WebSocket connections"""
+    """Manages WebSocket connections of this worker.
+
+    Outgoing messages are delivered to local sockets immediately and published
+    through the broker so that other workers can deliver them to their sockets.
+    """
     
-    def __init__(self):
+    def __init__(self, broker: Optional[Broker] = None):
         self.active_connections: Dict[int, Set[WebSocket]] = {}
+        # Last reported (latitude, longitude, monotonic time) of connected players
+        self.positions: Dict[int, Tuple[float, float, float]] = {}
+        self.broker: Broker = broker or InProcessBroker()
+    
+    async def start(self):
+        """Start receiving messages from other workers"""
+        try:
+            await self.broker.start(self._on_broker_message)
+        except Exception as e:
+            logger.error(f"WebSocket broker failed to start ({type(self.broker).__name__}): {e}; using in-process broker")
+            self.broker = InProcessBroker()
+            await self.broker.start(self._on_broker_message)
+    
+    async def stop(self):
+        """Stop the broker"""
+        await self.broker.stop()
+    
+    async def _on_broker_message(self, envelope: dict):
+        """Deliver an envelope published by another worker to local sockets"""
+        message = envelope.get("message")
+        if not isinstance(message, dict):
+            return
+        if envelope.get("kind") == "personal":
+            await self._deliver_personal(message, envelope.get("user_id"))
+        elif envelope.get("kind") == "broadcast":
+            await self._deliver_broadcast(message, envelope.get("exclude_user"))
+    
+    async def _publish(self, envelope: dict):
+        """Fan an envelope out to other workers (no-op for the in-process broker)"""
+        if not self.broker.is_distributed:
+            return
+        envelope["origin"] = self.broker.worker_id
+        try:
+            await self.broker.publish(envelope)
+        except Exception as e:
+            logger.error(f"WebSocket broker publish failed: {e}")
     
     async def connect(self, websocket: WebSocket, user_id: int):
         """Connect a user's websocket"""
@@ -23,9 +70,30 @@ class ConnectionManager:
             self.active_connections[user_id].discard(websocket)
             if not self.active_connections[user_id]:
                 del self.active_connections[user_id]
+                self.positions.pop(user_id, None)
+    
+    def update_position(self, user_id: int, latitude, longitude):
+        """Remember a connected player's latest position (used by the loot spawner)"""
+        try:
+            latitude, longitude = float(latitude), float(longitude)
+        except (TypeError, ValueError):
+            return
+        if -90 <= latitude <= 90 and -180 <= longitude <= 180:
+            self.positions[user_id] = (latitude, longitude, time.monotonic())
     
     async def send_personal_message(self, message: dict, user_id: int):
-        """Send message to specific user"""
+        """Send message to specific user (on any worker)"""
+        await self._deliver_personal(message, user_id)
+        await self._publish({"kind": "personal", "user_id": user_id, "message": message})
+    
+    async def broadcast(self, message: dict, exclude_user: int = None):
+        """Broadcast message to all connected users (on all workers)"""
+        await self._deliver_broadcast(message, exclude_user)
+        await self._publish({"kind": "broadcast", "exclude_user": exclude_user, "message": message})
+    
+    async def _deliver_personal(self, message: dict, user_id: int):
+        """Send message to a specific user's sockets on this worker"""
+        sent = 0
         if user_id in self.active_connections:
             disconnected = []
             for connection in list(self.active_connections[user_id]):
@@ -33,6 +101,7 @@ class ConnectionManager:
                     # Check if connection is still open before sending
                     if connection.client_state.name != 'DISCONNECTED' and connection.application_state.name != 'DISCONNECTED':
                         await connection.send_json(message)
+                        sent += 1
                 except RuntimeError as e:
                     # Connection already closed - mark for removal
                     if "close" in str(e).lower() or "disconnected" in str(e).lower():
@@ -46,9 +115,11 @@ class ConnectionManager:
             # Clean up disconnected connections
             for conn in disconnected:
                 self.active_connections[user_id].discard(conn)
+        metrics.ws_fanout.observe(sent, message.get("event_type", "unknown"))
     
-    async def broadcast(self, message: dict, exclude_user: int = None):
-        """Broadcast message to all connected users"""
+    async def _deliver_broadcast(self, message: dict, exclude_user: int = None):
+        """Send message to all sockets on this worker"""
+        sent = 0
         for user_id, connections in list(self.active_connections.items()):
             if exclude_user and user_id == exclude_user:
                 continue
@@ -58,6 +129,7 @@ class ConnectionManager:
                     # Check if connection is still open before sending
                     if connection.client_state.name != 'DISCONNECTED' and connection.application_state.name != 'DISCONNECTED':
                         await connection.send_json(message)
+                        sent += 1
                 except RuntimeError as e:
                     # Connection already closed
                     if "close" in str(e).lower() or "disconnected" in str(e).lower():
@@ -71,6 +143,7 @@ class ConnectionManager:
             # Clean up disconnected connections
             for conn in disconnected:
                 connections.discard(conn)
+        metrics.ws_fanout.observe(sent, message.get("event_type", "unknown"))
     
     async def broadcast_position(
         self,
@@ -186,5 +259,5 @@ class ConnectionManager:
         await self.broadcast(message)
 
 
-# Global connection manager instance
-manager = ConnectionManager()
+# Global connection manager instance (broker selected via settings.WS_BROKER)
+manager = ConnectionManager(create_broker())
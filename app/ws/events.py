@@ -0,0 +1,150 @@
+"""
+Server-pushed game events.
+
+Instead of the client polling stats, spot cooldowns and the deployed version,
+the server pushes targeted events over the player's WebSocket:
+
+    stats_update     after a log, loot collect or item use changed the player's stats
+    cooldown_update  when a spot's cooldown marker changes (cooldown -> partial -> ready)
+    connected        carries the server's deploy signature ("version")
+
+Cooldown expiries are tracked in a timer wheel keyed by (user_id, spot_id).
+The helpers here are safe to call from route handlers on the event loop as
+well as from service code running in the threadpool.
+"""
+import asyncio
+import time
+from typing import Optional, Set
+
+from starlette.concurrency import run_in_threadpool
+
+from app.config import settings
+from app.database import session_scope
+from app.services.spot_service import PARTIAL_COOLDOWN_THRESHOLD_SECONDS
+from app.ws.connection_manager import manager
+from app.ws.timer_wheel import TimerWheel
+
+# Stats changes within this window are pushed once
+STATS_COALESCE_SECONDS = 0.5
+
+wheel = TimerWheel()
+
+# Deploy signature "commit|timestamp|cache_bust" (same format as the client's getCurrentDeployedSignature())
+server_version = ""
+
+_loop: Optional[asyncio.AbstractEventLoop] = None
+_tasks: Set[asyncio.Task] = set()
+_stats_pending: Set[int] = set()
+
+
+def start(version: str = ""):
+    """Start the cooldown timer wheel on the running loop (called from lifespan)"""
+    global _loop, server_version
+    _loop = asyncio.get_running_loop()
+    server_version = version
+    wheel.start(_on_timer)
+
+
+async def stop():
+    global _loop
+    await wheel.stop()
+    _loop = None
+
+
+def is_running() -> bool:
+    return _loop is not None
+
+
+def emit(coro):
+    """Schedule a coroutine on the server loop from any thread (fire and forget)"""
+    try:
+        running = asyncio.get_running_loop()
+    except RuntimeError:
+        running = None
+
+    if running is not None:
+        task = running.create_task(coro)
+        _tasks.add(task)
+        task.add_done_callback(_tasks.discard)
+        return task
+    if _loop is not None and not _loop.is_closed():
+        return asyncio.run_coroutine_threadsafe(coro, _loop)
+    coro.close()
+    return None
+
+
+def _wants_events(user_id: int) -> bool:
+    """Whether a push for user_id can reach a socket (here or, via the broker, on another worker)"""
+    return user_id in manager.active_connections or manager.broker.is_distributed
+
+
+def _load_stats(user_id: int) -> Optional[dict]:
+    from app.services import auth_service, progression_service
+
+    with session_scope() as db:
+        user = auth_service.get_user_by_id(db, user_id)
+        if user is None:
+            return None
+        return progression_service.get_user_stats(db, user)
+
+
+async def _push_stats(user_id: int):
+    try:
+        await asyncio.sleep(STATS_COALESCE_SECONDS)
+        _stats_pending.discard(user_id)
+        stats = await run_in_threadpool(_load_stats, user_id)
+        if stats is not None:
+            await manager.send_personal_message({"event_type": "stats_update", "data": stats}, user_id)
+    except Exception as e:
+        print(f"[ERROR] stats_update push failed for user {user_id}: {type(e).__name__}: {e}")
+    finally:
+        _stats_pending.discard(user_id)
+
+
+def stats_changed(user_id: int):
+    """Push fresh stats to the player (coalesced)"""
+    if user_id in _stats_pending or not _wants_events(user_id):
+        return
+    _stats_pending.add(user_id)
+    if emit(_push_stats(user_id)) is None:
+        _stats_pending.discard(user_id)
+
+
+async def _send_cooldown(user_id: int, spot_id: int, status: str, ready_at: float):
+    await manager.send_personal_message({
+        "event_type": "cooldown_update",
+        "data": {
+            "spot_id": spot_id,
+            "cooldown_status": status,
+            "remaining_seconds": max(0, int(round(ready_at - time.time()))),
+        }
+    }, user_id)
+
+
+async def _on_timer(key, payload):
+    user_id, spot_id = key
+    status, ready_at = payload
+    await _send_cooldown(user_id, spot_id, status, ready_at)
+    if status == "partial":
+        wheel.schedule(key, ready_at, ("ready", ready_at))
+
+
+def spot_logged(user_id: int, spot_id: int):
+    """A log started a fresh cooldown: push the marker state and schedule its transitions"""
+    if not _wants_events(user_id):
+        return
+    ready_at = time.time() + settings.LOG_COOLDOWN
+    partial_at = ready_at - PARTIAL_COOLDOWN_THRESHOLD_SECONDS
+    if partial_at > time.time():
+        status = "cooldown"
+        wheel.schedule((user_id, spot_id), partial_at, ("partial", ready_at))
+    else:
+        status = "partial"
+        wheel.schedule((user_id, spot_id), ready_at, ("ready", ready_at))
+    emit(_send_cooldown(user_id, spot_id, status, ready_at))
+
+
+def after_log(user_id: int, spot_id: int):
+    """Events for a committed log"""
+    spot_logged(user_id, spot_id)
+    stats_changed(user_id)
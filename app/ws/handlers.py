@@ -1,133 +1,168 @@
 from fastapi import WebSocket, WebSocketDisconnect
-from sqlalchemy.orm import Session
 from jose import JWTError, jwt
-from app.database import SessionLocal
+from app.database import run_db
 from app.config import settings
-from app.services import auth_service
+from app.services import geofence_service, user_cache
 from app.ws.connection_manager import manager
+from app.ws import events
+from app.ws.rpc import handle_rpc
 import json
 import asyncio
 from datetime import datetime
+from types import SimpleNamespace
+from typing import Optional, Tuple
+
+
+def _identity(db, username: str) -> Optional[Tuple[int, str]]:
+    user = user_cache.get_principal(db, username)
+    if user is None:
+        return None
+    return user.id, user.username
+
+
+async def _authenticate(token: str) -> Optional[Tuple[int, str]]:
+    """Resolve a JWT to (user_id, username) using a short-lived DB session.
+
+    The session is released before the socket starts listening, so connected
+    players do not hold pooled database connections.
+    """
+    try:
+        payload = jwt.decode(token, settings.SECRET_KEY, algorithms=[settings.ALGORITHM])
+        username: str = payload.get("sub")
+        if username is None:
+            return None
+    except JWTError:
+        return None
+    
+    return await run_db(_identity, username)
+
+
+async def _geofence(user_id: int, latitude, longitude, accuracy):
+    """Run geofencing for a position update and push created auto-logs"""
+    try:
+        for log in await geofence_service.process_position(user_id, latitude, longitude, accuracy):
+            await manager.send_personal_message({"event_type": "auto_log", "data": log}, user_id)
+    except Exception as e:
+        print(f"[{datetime.now().isoformat()}] Geofencing failed for user {user_id}: {e}")
 
 
 async def websocket_endpoint(websocket: WebSocket, token: str):
     """Main WebSocket endpoint"""
-    # Create DB session
-    db = SessionLocal()
     last_heartbeat = datetime.now()
     heartbeat_interval = 30  # Send heartbeat every 30 seconds
     
+    identity = await _authenticate(token)
+    if identity is None:
+        await websocket.close(code=1008)
+        return
+    user = SimpleNamespace(id=identity[0], username=identity[1])
+    
+    # Connect user
+    await manager.connect(websocket, user.id)
+    print(f"[{datetime.now().isoformat()}] User {user.username} connected to WebSocket")
+    
     try:
-        # Authenticate user
-        try:
-            payload = jwt.decode(token, settings.SECRET_KEY, algorithms=[settings.ALGORITHM])
-            username: str = payload.get("sub")
-            if username is None:
-                await websocket.close(code=1008)
-                return
-        except JWTError:
-            await websocket.close(code=1008)
-            return
-        
-        user = auth_service.get_user_by_username(db, username=username)
-        if user is None:
-            await websocket.close(code=1008)
-            return
+        # Send welcome message
+        await websocket.send_json({
+            "event_type": "connected",
+            "data": {
+                "user_id": user.id,
+                "username": user.username,
+                "message": "Connected to Claim WebSocket",
+                "server_auto_log": settings.SERVER_AUTO_LOG,
+                # Stats/cooldowns/deploys are pushed; clients can stop polling
+                "push_events": events.is_running(),
+                "version": events.server_version
+            }
+        })
         
-        # Connect user
-        await manager.connect(websocket, user.id)
-        print(f"[{datetime.now().isoformat()}] User {user.username} connected to WebSocket")
-        
-        try:
-            # Send welcome message
-            await websocket.send_json({
-                "event_type": "connected",
-                "data": {
-                    "user_id": user.id,
-                    "username": user.username,
-                    "message": "Connected to Claim WebSocket"
-                }
-            })
+        # Listen for messages with timeout handling
+        while True:
+            # Check if we need to send heartbeat
+            now = datetime.now()
+            if (now - last_heartbeat).total_seconds() >= heartbeat_interval:
+                try:
+                    await websocket.send_json({
+                        "event_type": "heartbeat",
+                        "data": {"timestamp": now.isoformat()}
+                    })
+                    last_heartbeat = now
+                except Exception as e:
+                    print(f"[{datetime.now().isoformat()}] Heartbeat failed for {user.username}: {e}")
+                    break
             
-            # Listen for messages with timeout handling
-            while True:
-                # Check if we need to send heartbeat
-                now = datetime.now()
-                if (now - last_heartbeat).total_seconds() >= heartbeat_interval:
-                    try:
-                        await websocket.send_json({
-                            "event_type": "heartbeat",
-                            "data": {"timestamp": now.isoformat()}
-                        })
-                        last_heartbeat = now
-                    except Exception as e:
-                        print(f"[{datetime.now().isoformat()}] Heartbeat failed for {user.username}: {e}")
-                        break
+            try:
+                # Wait for message with timeout
+                data = await asyncio.wait_for(websocket.receive_text(), timeout=heartbeat_interval + 10)
                 
                 try:
-                    # Wait for message with timeout
-                    data = await asyncio.wait_for(websocket.receive_text(), timeout=heartbeat_interval + 10)
+                    message = json.loads(data)
+                    event_type = message.get("event_type")
+                    event_data = message.get("data", {})
                     
-                    try:
-                        message = json.loads(data)
-                        event_type = message.get("event_type")
-                        event_data = message.get("data", {})
-                        
-                        # Handle different event types
-                        if event_type == "position_update":
-                            # Broadcast position to other users
-                            await manager.broadcast_position(
-                                user.id,
-                                user.username,
-                                event_data.get("latitude"),
-                                event_data.get("longitude"),
-                                event_data.get("heading")
-                            )
-                        
-                        elif event_type == "ping":
-                            # Respond to ping
-                            await websocket.send_json({
-                                "event_type": "pong",
-                                "data": {"timestamp": datetime.now().isoformat()}
-                            })
-                        
-                        elif event_type == "heartbeat":
-                            # Client heartbeat - just acknowledge
-                            pass
-                        
-                        else:
-                            # Echo unknown event types
-                            await websocket.send_json({
-                                "event_type": "error",
-                                "data": {"message": f"Unknown event type: {event_type}"}
-                            })
+                    # Handle different event types
+                    if event_type == "position_update":
+                        manager.update_position(user.id, event_data.get("latitude"), event_data.get("longitude"))
+                        # Broadcast position to other users
+                        await manager.broadcast_position(
+                            user.id,
+                            user.username,
+                            event_data.get("latitude"),
+                            event_data.get("longitude"),
+                            event_data.get("heading")
+                        )
+                        # Server-side geofencing: auto-log spots the player walked into
+                        asyncio.create_task(_geofence(
+                            user.id,
+                            event_data.get("latitude"),
+                            event_data.get("longitude"),
+                            event_data.get("accuracy")
+                        ))
                     
-                    except json.JSONDecodeError:
+                    elif event_type == "ping":
+                        # Respond to ping
+                        await websocket.send_json({
+                            "event_type": "pong",
+                            "data": {"timestamp": datetime.now().isoformat()}
+                        })
+                    
+                    elif event_type == "rpc":
+                        # Request/response call (log.create, loot.collect, track.point)
+                        await websocket.send_json(await handle_rpc(message, user.id))
+                    
+                    elif event_type == "heartbeat":
+                        # Client heartbeat - just acknowledge
+                        pass
+                    
+                    else:
+                        # Echo unknown event types
                         await websocket.send_json({
                             "event_type": "error",
-                            "data": {"message": "Invalid JSON"}
+                            "data": {"message": f"Unknown event type: {event_type}"}
                         })
                 
-                except asyncio.TimeoutError:
-                    # Timeout waiting for message - connection might be dead
-                    print(f"[{datetime.now().isoformat()}] WebSocket timeout for {user.username} (no data in {heartbeat_interval + 10}s)")
-                    break
-        
-        except WebSocketDisconnect:
-            manager.disconnect(websocket, user.id)
-            print(f"[{datetime.now().isoformat()}] User {user.username} disconnected")
-        
-        except Exception as e:
-            # Log the actual error message instead of just "Unknown error"
-            error_msg = str(e) if str(e) else type(e).__name__
-            print(f"[{datetime.now().isoformat()}] WebSocket error for user {user.username}: {error_msg}")
-            logger_ws = __import__('logging').getLogger(__name__)
-            logger_ws.error(f"WebSocket error for {user.username}: {error_msg}", exc_info=True)
-            try:
-                manager.disconnect(websocket, user.id)
-            except:
-                pass  # Already disconnected
+                except json.JSONDecodeError:
+                    await websocket.send_json({
+                        "event_type": "error",
+                        "data": {"message": "Invalid JSON"}
+                    })
+            
+            except asyncio.TimeoutError:
+                # Timeout waiting for message - connection might be dead
+                print(f"[{datetime.now().isoformat()}] WebSocket timeout for {user.username} (no data in {heartbeat_interval + 10}s)")
+                break
+    
+    except WebSocketDisconnect:
+        manager.disconnect(websocket, user.id)
+        print(f"[{datetime.now().isoformat()}] User {user.username} disconnected")
     
-    finally:
-        # Close DB session
-        db.close()
+    except Exception as e:
+        # Log the actual error message instead of just "Unknown error"
+        error_msg = str(e) if str(e) else type(e).__name__
+        print(f"[{datetime.now().isoformat()}] WebSocket error for user {user.username}: {error_msg}")
+        logger_ws = __import__('logging').getLogger(__name__)
+        logger_ws.error(f"WebSocket error for {user.username}: {error_msg}", exc_info=True)
+        try:
+            manager.disconnect(websocket, user.id)
+        except:
+            pass  # Already disconnected
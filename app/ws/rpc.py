@@ -0,0 +1,152 @@
+"""
+Request/response RPC over the game WebSocket.
+
+Clients send
+    {"event_type": "rpc", "id": "<client id>", "method": "log.create", "params": {...}}
+and receive exactly one correlated reply
+    {"event_type": "rpc_result", "id": "<client id>", "ok": true, "result": {...}}
+or
+    {"event_type": "rpc_result", "id": "<client id>", "ok": false, "error": {"code": 429, "message": "..."}}
+
+Handlers reuse the socket's authenticated identity (no JWT decode / user lookup
+per action) and call the same service functions as the HTTP routes. Each call
+runs in its own short-lived session (on the async engine when available, see
+database.run_db) so sockets never pin pooled connections.
+"""
+from typing import Any, Callable, Dict, Tuple
+
+from pydantic import ValidationError
+from sqlalchemy.orm import Session
+
+from app.database import run_db
+from app.models import Track
+from app.schemas import LogCreate, LogResponse, TrackPointCreate
+from app.services import auth_service, log_service, loot_service, spot_service, tracking_service
+from app.ws import events
+
+RpcHandler = Callable[[Session, int, dict], Any]
+
+_handlers: Dict[str, Tuple[RpcHandler, bool]] = {}
+
+
+class RpcError(Exception):
+    """Error returned to the client; code mirrors the equivalent HTTP status"""
+
+    def __init__(self, code: int, message: str):
+        super().__init__(message)
+        self.code = code
+        self.message = message
+
+
+def rpc_method(name: str, blocking: bool = False):
+    """Register a synchronous handler ``fn(db, user_id, params)`` for an RPC method.
+
+    blocking=True for handlers doing non-database I/O (see database.run_db).
+    """
+    def decorator(fn: RpcHandler) -> RpcHandler:
+        _handlers[name] = (fn, blocking)
+        return fn
+    return decorator
+
+
+async def handle_rpc(message: dict, user_id: int) -> dict:
+    """Dispatch an RPC message and build the correlated reply"""
+    request_id = message.get("id")
+    reply: Dict[str, Any] = {"event_type": "rpc_result", "id": request_id}
+
+    method = message.get("method")
+    params = message.get("params") or {}
+    handler, blocking = _handlers.get(method, (None, False))
+    try:
+        if handler is None:
+            raise RpcError(404, f"Unknown method: {method}")
+        if not isinstance(params, dict):
+            raise RpcError(422, "params must be an object")
+        reply["result"] = await run_db(handler, user_id, params, blocking=blocking)
+        reply["ok"] = True
+    except RpcError as e:
+        reply["ok"] = False
+        reply["error"] = {"code": e.code, "message": e.message}
+    except ValidationError as e:
+        reply["ok"] = False
+        reply["error"] = {"code": 422, "message": str(e.errors()[:3])}
+    except Exception as e:
+        print(f"[ERROR] RPC {method} failed for user {user_id}: {type(e).__name__}: {e}")
+        reply["ok"] = False
+        reply["error"] = {"code": 500, "message": "Internal server error"}
+    return reply
+
+
+def _load_user(db: Session, user_id: int):
+    user = auth_service.get_user_by_id(db, user_id)
+    if user is None or not user.is_active:
+        raise RpcError(401, "Could not validate credentials")
+    return user
+
+
+# Claims photo uploads (file moves) and checks/records cooldowns (Redis)
+@rpc_method("log.create", blocking=True)
+def rpc_log_create(db: Session, user_id: int, params: dict) -> dict:
+    """Same semantics as POST /api/logs/"""
+    log_data = LogCreate(**params)
+    user = _load_user(db, user_id)
+
+    # Serialize simultaneous logs of this user (same as the HTTP route)
+    log_service.lock_user_logs(db, user.id)
+    existing = log_service.get_log_by_client_key(db, user.id, log_data.client_key)
+    if existing:
+        return LogResponse.model_validate(existing).model_dump(mode="json")
+
+    if not spot_service.can_log_spot(db, user.id, log_data.spot_id, is_auto=log_data.is_auto):
+        remaining = spot_service.get_cooldown_remaining(db, user.id, log_data.spot_id)
+        raise RpcError(429, f"Cooldown active: {remaining // 60}m {remaining % 60}s remaining")
+
+    log = log_service.create_log(db, user, log_data, log_data.is_auto)
+    if not log:
+        raise RpcError(400, "Cannot log: spot not found or too far away")
+    events.after_log(user.id, log_data.spot_id)
+    return LogResponse.model_validate(log).model_dump(mode="json")
+
+
+@rpc_method("loot.collect")
+def rpc_loot_collect(db: Session, user_id: int, params: dict) -> dict:
+    """Same semantics as POST /api/loot/collect"""
+    try:
+        loot_spot_id = int(params["loot_spot_id"])
+        latitude = float(params["latitude"])
+        longitude = float(params["longitude"])
+    except (KeyError, TypeError, ValueError):
+        raise RpcError(422, "loot_spot_id, latitude and longitude are required")
+
+    result = loot_service.collect_loot(db, user_id, loot_spot_id, latitude, longitude)
+    if not result.get("success"):
+        raise RpcError(400, result.get("error") or "Error")
+    events.stats_changed(user_id)
+    return result
+
+
+@rpc_method("track.point")
+def rpc_track_point(db: Session, user_id: int, params: dict) -> dict:
+    """Same semantics as POST /api/tracks/{track_id}/points"""
+    try:
+        track_id = int(params.pop("track_id"))
+    except (KeyError, TypeError, ValueError):
+        raise RpcError(422, "track_id is required")
+    point_data = TrackPointCreate(**params)
+
+    owner_id = db.query(Track.user_id).filter(Track.id == track_id).scalar()
+    if owner_id is not None and owner_id != user_id:
+        raise RpcError(403, "Not authorized")
+
+    track_point = tracking_service.add_track_point(db, track_id, point_data)
+    if not track_point:
+        raise RpcError(404, "Track not found or not active")
+
+    return {
+        "id": track_point.id,
+        "latitude": point_data.latitude,
+        "longitude": point_data.longitude,
+        "timestamp": track_point.timestamp.isoformat() if track_point.timestamp else None,
+        "altitude": track_point.altitude,
+        "heading": track_point.heading,
+    }
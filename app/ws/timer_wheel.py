@@ -0,0 +1,97 @@
+"""
+Hashed timer wheel for cheap per-(user, spot) expiry notifications.
+
+Scheduling and cancelling are O(1); each tick only looks at one slot. Timers
+are keyed so rescheduling the same key replaces the previous timer.
+"""
+import asyncio
+import logging
+import math
+import threading
+import time
+from typing import Any, Awaitable, Callable, Dict, Hashable, List, Optional, Set, Tuple
+
+logger = logging.getLogger(__name__)
+
+TimerCallback = Callable[[Hashable, Any], Awaitable[None]]
+
+
+class TimerWheel:
+    """Timer wheel driven by an asyncio task"""
+
+    def __init__(self, tick_seconds: float = 1.0, slots: int = 512):
+        self.tick_seconds = tick_seconds
+        self.slots = slots
+        self._wheel: List[Set[Hashable]] = [set() for _ in range(slots)]
+        # key -> (due unix time, slot, payload)
+        self._timers: Dict[Hashable, Tuple[float, int, Any]] = {}
+        self._lock = threading.Lock()
+        self._task: Optional[asyncio.Task] = None
+        self._callback: Optional[TimerCallback] = None
+
+    def _slot_for(self, due: float) -> int:
+        return int(math.floor(due / self.tick_seconds)) % self.slots
+
+    def schedule(self, key: Hashable, due: float, payload: Any = None):
+        """Fire callback(key, payload) at unix time `due` (replaces an existing timer for key)"""
+        slot = self._slot_for(due)
+        with self._lock:
+            previous = self._timers.get(key)
+            if previous is not None:
+                self._wheel[previous[1]].discard(key)
+            self._timers[key] = (due, slot, payload)
+            self._wheel[slot].add(key)
+
+    def cancel(self, key: Hashable):
+        with self._lock:
+            previous = self._timers.pop(key, None)
+            if previous is not None:
+                self._wheel[previous[1]].discard(key)
+
+    def __len__(self) -> int:
+        return len(self._timers)
+
+    def pop_due(self, now: float, slot: int) -> List[Tuple[Hashable, Any]]:
+        """Remove and return timers in `slot` that are due at `now`"""
+        due = []
+        with self._lock:
+            bucket = self._wheel[slot]
+            for key in list(bucket):
+                when, _, payload = self._timers[key]
+                if when <= now:
+                    bucket.discard(key)
+                    del self._timers[key]
+                    due.append((key, payload))
+        return due
+
+    async def _run(self):
+        current_tick = int(math.floor(time.time() / self.tick_seconds))
+        while True:
+            await asyncio.sleep(self.tick_seconds)
+            now = time.time()
+            now_tick = int(math.floor(now / self.tick_seconds))
+            # Catch up on ticks missed while the loop was busy (bounded to one revolution)
+            first_tick = max(current_tick, now_tick - self.slots + 1)
+            for tick in range(first_tick, now_tick + 1):
+                for key, payload in self.pop_due(now, tick % self.slots):
+                    try:
+                        await self._callback(key, payload)
+                    except Exception as e:
+                        logger.error(f"Timer callback failed for {key}: {e}")
+            # Revisit the current slot next time: it may hold timers due later in this tick
+            current_tick = now_tick
+
+    def start(self, callback: TimerCallback):
+        """Start ticking on the running event loop"""
+        self._callback = callback
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except (asyncio.CancelledError, Exception):
+                pass
+            self._task = None
@@ -9,12 +9,28 @@ done
 echo "Database is ready!"
 
 # Run migrations
+echo "Running schema migration..."
+if ! python3 migrate_db.py 2>&1 | tee -a /tmp/migration.log; then
+    echo "Warning: Schema migration returned non-zero exit code. Check /tmp/migration.log for details."
+fi
+
 echo "Running spot types migration..."
 if ! python3 migrate_spot_types.py 2>&1 | tee -a /tmp/migration.log; then
     echo "Warning: Migration command returned non-zero exit code. This may be expected if migration was already applied."
     echo "Check /tmp/migration.log for details."
 fi
 
+echo "Running photo store migration..."
+if ! python3 migrate_photos.py 2>&1 | tee -a /tmp/migration.log; then
+    echo "Warning: Photo migration returned non-zero exit code. Check /tmp/migration.log for details."
+fi
+
+# After migrate_db.py: it merges duplicate inventory rows the unique index would reject
+echo "Running index migration..."
+if ! python3 migrate_indexes.py 2>&1 | tee -a /tmp/migration.log; then
+    echo "Warning: Index migration returned non-zero exit code. Check /tmp/migration.log for details."
+fi
+
 # Check if POIs already exist
 echo "Checking for existing POIs..."
 POI_COUNT=$(python3 count_pois.py 2>&1)
@@ -174,11 +174,20 @@ let autoLogCooldownUntil = 0;
 const spotsBeingLogged = new Set();
 // Track last auto-log time per spot to prevent rapid re-triggering
 const lastAutoLogTime = new Map();
+// Server-side geofencing announced in the WS welcome message (auto-logs are pushed, no client polling)
+let serverAutoLog = false;
+// Server pushes stats/cooldown/deploy events (announced in the WS welcome message)
+let pushEvents = false;
+let wsConnectedOnce = false;
 // Track retry attempts for autolog reliability
 const autoLogRetryCount = new Map();
 const AUTO_LOG_MAX_RETRIES = 2;
 const AUTO_LOG_RETRY_DELAY_MS = 2000;
 const AUTO_LOG_MAX_DELAY_MS = 10000; // Cap maximum retry delay
+// Auto-logs made without connectivity, replayed via /logs/sync
+const OFFLINE_LOG_QUEUE_KEY = 'offlineLogQueue';
+const OFFLINE_LOG_BATCH_SIZE = 100;
+let offlineLogSyncRunning = false;
 
 // Player trail configuration constants
 const TRAIL_DOT_RADIUS_FAST = 14;
@@ -1342,6 +1351,25 @@ async function checkForNewVersionInBackground() {
     showUpdateOverlay(remoteShort);
 }
 
+// True while the server pushes stats, cooldowns and deploys over the open socket (polling not needed)
+function pushEventsActive() {
+    return pushEvents && ws && ws.readyState === WebSocket.OPEN;
+}
+
+// Compare the server's deploy signature from the WS welcome message with the loaded page
+function checkPushedVersion(remoteSig) {
+    if (versionUpdatePrompted || !remoteSig) return;
+    if (!getCurrentDeployedCommitFull()) return;
+
+    const currentSig = getCurrentDeployedSignature();
+    if (remoteSig === currentSig) return;
+
+    versionUpdatePrompted = true;
+    if (window.debugLog) window.debugLog(`⬆️ New version pushed: ${currentSig} → ${remoteSig}`);
+    const remoteCommit = String(remoteSig.split('|')[0] || '').trim();
+    showUpdateOverlay(remoteCommit ? remoteCommit.substring(0, 8) : 'neu');
+}
+
 function startVersionMonitor() {
     if (versionCheckInterval) clearInterval(versionCheckInterval);
 
@@ -1354,6 +1382,8 @@ function startVersionMonitor() {
     versionCheckInterval = setInterval(() => {
         // Skip when tab is hidden to avoid unnecessary traffic
         if (document.visibilityState === 'hidden') return;
+        // New deploys restart the server; the reconnect's welcome message carries the new version
+        if (pushEventsActive()) return;
         checkForNewVersionInBackground();
     }, 60000);
 
@@ -1818,18 +1848,11 @@ async function initializeApp() {
         startAPIHeartbeat();
         if (window.debugLog) window.debugLog('💓 API heartbeat started (2m interval)');
         
-        // Cleanup expired loot before loading
-        try {
-            await apiRequest('/loot/cleanup', { method: 'POST' });
-            if (window.debugLog) window.debugLog('🧹 Expired loot cleaned up');
-        } catch (cleanupError) {
-            console.error('Loot cleanup failed:', cleanupError);
-        }
-        
         // Load initial data
         loadStats();
         loadNearbySpots();
-        trySpawnLoot(); // Try to spawn initial loot
+        flushOfflineLogs();
+        // Loot is spawned by the server around the WebSocket position and pushed as loot_spawn
         if (window.debugLog) window.debugLog('📊 Initial data loaded');
 
         // Load heatmap data:
@@ -1847,11 +1870,11 @@ async function initializeApp() {
         
         // Start update loops
         setInterval(updateAutoLog, 1000); // Check auto-log every 1 second
-        setInterval(loadStats, 30000); // Update stats every 30 seconds
-        setInterval(trySpawnLoot, 120000); // Try spawn loot every 2 minutes
+        // Stats and spot cooldowns are pushed over the WebSocket; poll only as a fallback
+        setInterval(() => { if (!pushEventsActive()) loadStats(); }, 30000); // Update stats every 30 seconds
         setInterval(updateLootBeaconBling, 1000); // Loot beacon pulse update
-        setInterval(loadNearbySpots, 15000); // Refresh spots every 15 seconds to update cooldown colors
-        if (window.debugLog) window.debugLog('⏱️ Update loops started (AutoLog: 1s, Stats: 30s, Spots: 15s, Loot: 2m)');
+        setInterval(() => { if (!pushEventsActive()) loadNearbySpots(); }, 15000); // Refresh spots every 15 seconds to update cooldown colors
+        if (window.debugLog) window.debugLog('⏱️ Update loops started (AutoLog: 1s, Stats: 30s, Spots: 15s)');
         
         // Start health check every 30 seconds
         startHealthCheck();
@@ -2455,7 +2478,8 @@ function startGPSTracking() {
                     data: {
                         latitude: currentPosition.lat,
                         longitude: currentPosition.lng,
-                        heading: currentPosition.heading
+                        heading: currentPosition.heading,
+                        accuracy: currentPosition.accuracy
                     }
                 }));
             }
@@ -2735,6 +2759,14 @@ function connectWebSocket() {
         const timestamp = new Date().toISOString();
         if (window.debugLog) window.debugLog(`🔴 WebSocket: Closed at ${timestamp}, reconnecting in 5s...`);
         console.log('WebSocket closed at', timestamp, 'reconnecting...');
+        // Fail pending RPC calls fast so callers can fall back to HTTP
+        pendingRpcCalls.forEach((pending, id) => {
+            clearTimeout(pending.timer);
+            const error = new Error('WebSocket closed');
+            error.transport = true;
+            pending.reject(error);
+        });
+        pendingRpcCalls.clear();
         setTimeout(connectWebSocket, 5000);
     };
 }
@@ -2752,14 +2784,40 @@ function handleWebSocketMessage(message) {
         case 'connected':
             if (window.debugLog) window.debugLog(`✅ WS connected`);
             console.log('Connected:', data.message);
+            serverAutoLog = !!data.server_auto_log;
+            pushEvents = !!data.push_events;
+            if (pushEvents) {
+                checkPushedVersion(data.version);
+                // Catch up on pushes missed while disconnected
+                if (wsConnectedOnce) {
+                    loadStats();
+                    loadNearbySpots();
+                }
+            }
+            if (wsConnectedOnce) {
+                flushOfflineLogs();
+            }
+            wsConnectedOnce = true;
             // Start WebSocket heartbeat after connection
             startWSHeartbeat();
             break;
             
+        case 'stats_update':
+            renderStats(data);
+            break;
+            
+        case 'cooldown_update':
+            applyCooldownUpdate(data);
+            break;
+            
         case 'heartbeat':
             // Server sent heartbeat - nothing to do, connection is alive
             break;
             
+        case 'rpc_result':
+            handleRpcResult(message);
+            break;
+            
         case 'pong':
             // Response to our ping
             lastSuccessfulWSMessage = Date.now();
@@ -2770,6 +2828,10 @@ function handleWebSocketMessage(message) {
             updateOtherPlayerPosition(data);
             break;
             
+        case 'auto_log':
+            handleServerAutoLog(data);
+            break;
+            
         case 'log_event':
             if (window.debugLog) window.debugLog(`📝 Log: +${data.xp_gained}XP`);
             showLogNotification(data);
@@ -2799,6 +2861,33 @@ function handleWebSocketMessage(message) {
     }
 }
 
+// Auto-log created by server-side geofencing (same feedback as a client-triggered auto-log)
+function handleServerAutoLog(response) {
+    if (window.debugLog) window.debugLog(`✅ Server AutoLog: spot ${response.spot_id} +${response.xp_gained}XP, +${response.claim_points}Claims`);
+    lastAutoLogTime.set(response.spot_id, Date.now());
+    
+    soundManager.playSound('log');
+    if (currentPosition) {
+        try {
+            playLogFX(currentPosition.lat, currentPosition.lng, response.xp_gained, response.claim_points, true);
+            markTerritoryActivity(currentPosition.lat, currentPosition.lng);
+        } catch (e) {
+            // ignore FX failures
+        }
+    }
+    
+    const buffLine = formatBuffDebugLine(response);
+    showNotification(
+        'Auto Log!',
+        `+${response.xp_gained} XP, +${response.claim_points} Claims${buffLine ? `\n${buffLine}` : ''}`,
+        'log-event'
+    );
+    
+    loadStats();
+    loadNearbySpots();
+    updateClaimHeatmap();
+}
+
 function updateOtherPlayerPosition(data) {
     const { user_id, username, latitude, longitude } = data;
     
@@ -2924,43 +3013,120 @@ async function apiRequest(endpoint, options = {}) {
     }
 }
 
+// WebSocket RPC (log.create, loot.collect, track.point) over the already open socket.
+// Saves a full HTTP request + JWT decode per gameplay action; falls back to HTTP when the socket is down.
+const WS_RPC_TIMEOUT_MS = 8000;
+const pendingRpcCalls = new Map();
+let rpcSequence = 0;
+
+function wsRpc(method, params) {
+    return new Promise((resolve, reject) => {
+        if (!ws || ws.readyState !== WebSocket.OPEN) {
+            const error = new Error('WebSocket not connected');
+            error.transport = true;
+            reject(error);
+            return;
+        }
+        const id = `${Date.now().toString(36)}-${++rpcSequence}`;
+        const timer = setTimeout(() => {
+            pendingRpcCalls.delete(id);
+            const error = new Error(`RPC timeout: ${method}`);
+            error.transport = true;
+            reject(error);
+        }, WS_RPC_TIMEOUT_MS);
+        pendingRpcCalls.set(id, { resolve, reject, timer });
+        try {
+            ws.send(JSON.stringify({ event_type: 'rpc', id, method, params }));
+        } catch (e) {
+            clearTimeout(timer);
+            pendingRpcCalls.delete(id);
+            e.transport = true;
+            reject(e);
+        }
+    });
+}
+
+function handleRpcResult(message) {
+    const pending = pendingRpcCalls.get(message.id);
+    if (!pending) return;
+    pendingRpcCalls.delete(message.id);
+    clearTimeout(pending.timer);
+    if (message.ok) {
+        pending.resolve(message.result);
+    } else {
+        const err = message.error || {};
+        const error = new Error(`API Error: ${err.message || 'RPC failed'}`);
+        error.status = err.code;
+        error.detail = err.message;
+        pending.reject(error);
+    }
+}
+
+// Try the WebSocket RPC first; only transport problems fall back to HTTP
+async function rpcOrHttp(method, params, httpFallback) {
+    try {
+        return await wsRpc(method, params);
+    } catch (error) {
+        if (error.transport) {
+            return httpFallback();
+        }
+        throw error;
+    }
+}
+
 // Data Loading
 async function loadStats() {
     try {
         if (window.debugLog) window.debugLog('📊 Loading stats...');
         const stats = await apiRequest('/items/stats');
-        
-        // Check for level-up
-        if (stats.level > currentLevel && currentLevel > 0) {
-            if (window.debugLog) window.debugLog(`⬆️ LEVEL UP: ${currentLevel} → ${stats.level}`);
-            // Only play sound if this is a real level-up (not on initial load)
-            soundManager.playSound('levelup');
-            showNotification('🎉 LEVEL UP!', `Du bist jetzt Level ${stats.level}!`, 'levelup');
-            currentLevel = stats.level;
-        } else {
-            // First load - just set level without sound
-            currentLevel = stats.level;
-        }
-        
-        document.getElementById('level').textContent = stats.level;
-        document.getElementById('claims').textContent = stats.total_claim_points;
-        document.getElementById('total-logs').textContent = stats.total_logs;
-        document.getElementById('spots-claimed').textContent = stats.total_spots_claimed;
-        document.getElementById('active-tracks').textContent = stats.active_tracks;
-        document.getElementById('inventory-count').textContent = stats.inventory_count;
-        
-        // Update XP bar
-        const xpProgress = (stats.xp % 100) / 100 * 100;
-        document.getElementById('xp-fill').style.width = xpProgress + '%';
-        document.getElementById('xp-text').textContent = `${stats.xp % 100}/100`;
-        
-        if (window.debugLog) window.debugLog(`✅ Stats: L${stats.level} | ${stats.total_claim_points}pts | ${stats.total_logs}logs`);
+        renderStats(stats);
     } catch (error) {
         if (window.debugLog) window.debugLog(`❌ Stats failed: ${error.message}`);
         console.error('Failed to load stats:', error);
     }
 }
 
+// Render stats from GET /items/stats or a pushed stats_update event
+function renderStats(stats) {
+    // Check for level-up
+    if (stats.level > currentLevel && currentLevel > 0) {
+        if (window.debugLog) window.debugLog(`⬆️ LEVEL UP: ${currentLevel} → ${stats.level}`);
+        // Only play sound if this is a real level-up (not on initial load)
+        soundManager.playSound('levelup');
+        showNotification('🎉 LEVEL UP!', `Du bist jetzt Level ${stats.level}!`, 'levelup');
+        currentLevel = stats.level;
+    } else {
+        // First load - just set level without sound
+        currentLevel = stats.level;
+    }
+    
+    document.getElementById('level').textContent = stats.level;
+    document.getElementById('claims').textContent = stats.total_claim_points;
+    document.getElementById('total-logs').textContent = stats.total_logs;
+    document.getElementById('spots-claimed').textContent = stats.total_spots_claimed;
+    document.getElementById('active-tracks').textContent = stats.active_tracks;
+    document.getElementById('inventory-count').textContent = stats.inventory_count;
+    
+    // Update XP bar
+    const xpProgress = (stats.xp % 100) / 100 * 100;
+    document.getElementById('xp-fill').style.width = xpProgress + '%';
+    document.getElementById('xp-text').textContent = `${stats.xp % 100}/100`;
+    
+    if (window.debugLog) window.debugLog(`✅ Stats: L${stats.level} | ${stats.total_claim_points}pts | ${stats.total_logs}logs`);
+}
+
+// Pushed cooldown transition for one spot: restyle its marker in place
+function applyCooldownUpdate(update) {
+    const marker = spotMarkers.get(update.spot_id);
+    const el = marker ? marker.getElement() : null;
+    // Spots outside the loaded area get their status on the next map move
+    if (!el) return;
+    ['ready', 'partial', 'cooldown'].forEach(status => el.classList.remove(`spot-marker-${status}`));
+    el.classList.add(`spot-marker-${update.cooldown_status}`);
+    marker._cooldownStatus = update.cooldown_status;
+    if (window.debugLog) window.debugLog(`⏳ Spot ${update.spot_id}: ${update.cooldown_status}`);
+}
+
 // Create dynamic popup content for spots with detailed info
 function createSpotPopupContent(spot) {
     const container = document.createElement('div');
@@ -3295,6 +3461,11 @@ function updateSpotVisibility() {
 
 // Auto-logging with improved reliability
 async function updateAutoLog() {
+    // Server geofencing handles auto-logs while the WebSocket is connected
+    if (serverAutoLog && ws && ws.readyState === WebSocket.OPEN) {
+        return;
+    }
+    
     // Validate prerequisites
     if (!currentPosition) {
         if (window.debugLog) window.debugLog('⏸️ AutoLog: No current position available');
@@ -3361,10 +3532,12 @@ async function apiRequestSilent429(endpoint, options = {}) {
     const response = await fetch(url, {
         ...options,
         headers
-    }).catch(err => {
-        // Network errors - return dummy 429 to silence console
-        return { ok: false, status: 429 };
-    });
+    }).catch(err => null);
+    
+    if (response === null) {
+        // Network error (offline) - the caller queues the log for /logs/sync
+        return { status: 0, offline: true };
+    }
     
     if (!response.ok && response.status === 429) {
         // Return silently for 429
@@ -3379,7 +3552,61 @@ async function apiRequestSilent429(endpoint, options = {}) {
     return response.json();
 }
 
-async function performAutoLog(spotId, retryAttempt = 0) {
+function newClientKey() {
+    if (window.crypto && crypto.randomUUID) return crypto.randomUUID();
+    return `${Date.now().toString(36)}-${Math.random().toString(36).slice(2, 12)}`;
+}
+
+function loadOfflineLogQueue() {
+    try {
+        return JSON.parse(localStorage.getItem(OFFLINE_LOG_QUEUE_KEY) || '[]');
+    } catch (e) {
+        return [];
+    }
+}
+
+function queueOfflineLog(intent) {
+    const queue = loadOfflineLogQueue();
+    if (queue.some(item => item.client_key === intent.client_key)) return;
+    queue.push(intent);
+    // Server rejects logs older than 24h anyway; keep the newest ones
+    localStorage.setItem(OFFLINE_LOG_QUEUE_KEY, JSON.stringify(queue.slice(-OFFLINE_LOG_BATCH_SIZE * 5)));
+    if (window.debugLog) window.debugLog(`📥 Offline: AutoLog spot ${intent.spot_id} queued (${queue.length} pending)`);
+}
+
+// Replay queued offline logs in batches; items are idempotent, so resending after a lost response is safe
+async function flushOfflineLogs() {
+    if (offlineLogSyncRunning || !authToken) return;
+    offlineLogSyncRunning = true;
+    let created = 0;
+    try {
+        let queue = loadOfflineLogQueue();
+        while (queue.length > 0) {
+            const batch = queue.slice(0, OFFLINE_LOG_BATCH_SIZE);
+            const data = await apiRequest('/logs/sync', {
+                method: 'POST',
+                body: JSON.stringify({ logs: batch })
+            });
+            const done = new Set(data.results.map(result => result.client_key));
+            created += data.results.filter(result => result.status === 'created').length;
+            queue = loadOfflineLogQueue().filter(item => !done.has(item.client_key));
+            localStorage.setItem(OFFLINE_LOG_QUEUE_KEY, JSON.stringify(queue));
+        }
+    } catch (error) {
+        if (window.debugLog) window.debugLog(`❌ Offline log sync failed: ${error.message}`);
+    } finally {
+        offlineLogSyncRunning = false;
+    }
+    if (created > 0) {
+        showNotification('Offline-Logs', `${created} Auto-Log(s) nachgetragen`, 'log-event');
+        loadStats();
+        loadNearbySpots();
+    }
+}
+
+window.addEventListener('online', () => flushOfflineLogs());
+
+async function performAutoLog(spotId, retryAttempt = 0, intent = null) {
     // Mark spot as being logged
     spotsBeingLogged.add(spotId);
     
@@ -3403,16 +3630,38 @@ async function performAutoLog(spotId, retryAttempt = 0) {
             window.debugLog(`📤 AutoLog POST: spot ${spotId}${retryMsg}`);
         }
         
-        const response = await apiRequestSilent429('/logs/', {
+        // One idempotency key per log intent, reused by retries and the offline queue
+        intent = intent || {
+            client_key: newClientKey(),
+            client_timestamp: new Date().toISOString(),
+            spot_id: spotId,
+            latitude: currentPosition.lat,
+            longitude: currentPosition.lng,
+            is_auto: true
+        };
+        const logBody = {
+            spot_id: spotId,
+            latitude: intent.latitude,
+            longitude: intent.longitude,
+            is_auto: true,
+            client_key: intent.client_key
+        };
+        const response = await rpcOrHttp('log.create', logBody, () => apiRequestSilent429('/logs/', {
             method: 'POST',
-            body: JSON.stringify({
-                spot_id: spotId,
-                latitude: currentPosition.lat,
-                longitude: currentPosition.lng,
-                is_auto: true
-            })
+            body: JSON.stringify(logBody)
+        })).catch(error => {
+            // RPC errors carry the HTTP-equivalent status (429 cooldown, 400 too far, ...)
+            if (error.status) return { status: error.status };
+            throw error;
         });
         
+        if (response.offline) {
+            queueOfflineLog(intent);
+            autoLogRetryCount.delete(spotId);
+            lastAutoLogTime.set(spotId, now);
+            return;
+        }
+        
         // Check if we got rate limited (429)
         if (response.status === 429) {
             // Set cooldown for 5 minutes to prevent repeated requests
@@ -3434,7 +3683,7 @@ async function performAutoLog(spotId, retryAttempt = 0) {
                 autoLogRetryCount.set(spotId, retryAttempt + 1);
                 
                 setTimeout(() => {
-                    performAutoLog(spotId, retryAttempt + 1);
+                    performAutoLog(spotId, retryAttempt + 1, intent);
                 }, delay);
                 return;
             } else {
@@ -3499,11 +3748,11 @@ async function performAutoLog(spotId, retryAttempt = 0) {
             autoLogRetryCount.set(spotId, retryAttempt + 1);
             
             setTimeout(() => {
-                performAutoLog(spotId, retryAttempt + 1);
+                performAutoLog(spotId, retryAttempt + 1, intent);
             }, delay);
         } else {
             if (window.debugLog) window.debugLog(`❌ AutoLog error after ${AUTO_LOG_MAX_RETRIES} retries: ${error.message}`);
-            soundManager.playSound('error');
+            if (intent) queueOfflineLog(intent);
             autoLogRetryCount.delete(spotId);
         }
     } finally {
@@ -3613,8 +3862,7 @@ async function submitLog(spotId, notes, photoFile) {
     if (!currentPosition) return;
     
     try {
-        let photoData = null;
-        let photoMime = null;
+        let photoUploadToken = null;
         
         // Process photo if provided
         if (photoFile) {
@@ -3623,11 +3871,10 @@ async function submitLog(spotId, notes, photoFile) {
                 return;
             }
             const uploadResult = await uploadPhoto(photoFile);
-            photoData = uploadResult.photo_data;
-            photoMime = uploadResult.mime_type;
+            photoUploadToken = uploadResult.upload_token;
         }
         
-        // Send log with binary photo data
+        // Send log referencing the uploaded photo
         const log = await apiRequest('/logs/', {
             method: 'POST',
             body: JSON.stringify({
@@ -3636,8 +3883,7 @@ async function submitLog(spotId, notes, photoFile) {
                 longitude: currentPosition.lng,
                 is_auto: false,
                 notes: notes || null,
-                photo_data: photoData,
-                photo_mime: photoMime
+                photo_upload_token: photoUploadToken
             })
         });
         
@@ -3848,15 +4094,14 @@ function startAPIHeartbeat() {
 
 // Loot Functions
 async function uploadPhoto(file) {
-    const formData = new FormData();
-    formData.append('file', file);
-    
+    // Raw image body: streamed to disk by the server, no multipart/base64 overhead
     const response = await fetch(`${API_BASE}/logs/upload`, {
         method: 'POST',
         headers: {
-            'Authorization': `Bearer ${authToken}`
+            'Authorization': `Bearer ${authToken}`,
+            'Content-Type': file.type || 'image/jpeg'
         },
-        body: formData
+        body: file
     });
     
     if (!response.ok) {
@@ -3864,7 +4109,7 @@ async function uploadPhoto(file) {
     }
     
     const data = await response.json();
-    return { photo_data: data.photo_data, mime_type: data.mime_type };
+    return { upload_token: data.upload_token, mime_type: data.mime_type };
 }
 
 // Loot Functions
@@ -3878,14 +4123,15 @@ window.collectLoot = async function(lootSpotId) {
     const lootLatLng = lootMarker && lootMarker.getLatLng ? lootMarker.getLatLng() : null;
     
     try {
-        const result = await apiRequest('/loot/collect', {
+        const collectBody = {
+            loot_spot_id: lootSpotId,
+            latitude: currentPosition.lat,
+            longitude: currentPosition.lng
+        };
+        const result = await rpcOrHttp('loot.collect', collectBody, () => apiRequest('/loot/collect', {
             method: 'POST',
-            body: JSON.stringify({
-                loot_spot_id: lootSpotId,
-                latitude: currentPosition.lat,
-                longitude: currentPosition.lng
-            })
-        });
+            body: JSON.stringify(collectBody)
+        }));
         
         if (result.success) {
             try { soundManager.playSound('collect'); } catch (e) {}
@@ -3926,9 +4172,6 @@ window.collectLoot = async function(lootSpotId) {
             
             // Reload spots to remove collected loot
             await loadNearbySpots();
-            
-            // Try to spawn new loot
-            await trySpawnLoot();
         }
     } catch (error) {
         // Remove "API Error: " prefix for cleaner display
@@ -3942,37 +4185,6 @@ window.collectLoot = async function(lootSpotId) {
     }
 };
 
-async function trySpawnLoot() {
-    if (!currentPosition) {
-        if (window.debugLog) window.debugLog('⏳ Loot: Waiting for GPS position...');
-        return;
-    }
-    
-    try {
-        if (window.debugLog) window.debugLog(`💎 Trying to spawn loot at (${currentPosition.lat.toFixed(6)}, ${currentPosition.lng.toFixed(6)})...`);
-        
-        const spots = await apiRequest('/loot/spawn', {
-            method: 'POST',
-            body: JSON.stringify({
-                latitude: currentPosition.lat,
-                longitude: currentPosition.lng,
-                radius_meters: 500
-            })
-        });
-        
-        if (spots && spots.length > 0) {
-            if (window.debugLog) window.debugLog(`✅ Spawned ${spots.length} loot spot(s)`);
-            await loadNearbySpots();
-        } else {
-            if (window.debugLog) window.debugLog('ℹ️ No loot spawned (max limit reached or cooldown active)');
-        }
-    } catch (error) {
-        // Silently fail - loot spawning is not critical
-        if (window.debugLog) window.debugLog(`❌ Loot spawn error: ${error.message}`);
-        console.error('Loot spawn failed:', error);
-    }
-}
-
 async function loadActiveLoot() {
     try {
         const lootSpots = await apiRequest('/loot/active');
@@ -4100,15 +4312,16 @@ async function addTrackPoint(position) {
     }
     
     try {
-        await apiRequest(`/tracks/${activeTrackId}/points`, {
+        const pointBody = {
+            latitude: position.lat,
+            longitude: position.lng,
+            heading: position.heading,
+            accuracy: position.accuracy
+        };
+        await rpcOrHttp('track.point', { track_id: activeTrackId, ...pointBody }, () => apiRequest(`/tracks/${activeTrackId}/points`, {
             method: 'POST',
-            body: JSON.stringify({
-                latitude: position.lat,
-                longitude: position.lng,
-                heading: position.heading,
-                accuracy: position.accuracy
-            })
-        });
+            body: JSON.stringify(pointBody)
+        }));
         
         // Add point to live track visualization
         activeTrackPoints.push([position.lat, position.lng]);
@@ -5557,7 +5770,7 @@ window.showSpotLogs = async function(spotId) {
                 if (!log.is_auto && log.has_photo) {
                     const img = dialog.querySelector(`#log-photo-${log.id}`);
                     if (img) {
-                        img.src = `/api/logs/${log.id}/photo?t=${Date.now()}`;
+                        img.src = `/api/logs/${log.id}/photo?size=thumb`;
                     }
                 }
             });
@@ -5599,7 +5812,7 @@ window.openPhotoModal = function(logId) {
     `;
     
     const img = document.createElement('img');
-    img.src = `/api/logs/${logId}/photo?t=${Date.now()}`;
+    img.src = `/api/logs/${logId}/photo?size=display`;
     img.style.cssText = `
         max-width: 95vw;
         max-height: 95vh;
@@ -63,6 +63,15 @@ def migrate():
         else:
             print("✓ notes column already exists")
         
+        # Idempotency key of offline-synced logs (unique index: migrate_indexes.py)
+        if 'client_key' not in logs_columns:
+            print("Adding client_key column...")
+            conn.execute(text("ALTER TABLE logs ADD COLUMN client_key VARCHAR(64)"))
+            conn.commit()
+            print("✓ client_key column added")
+        else:
+            print("✓ client_key column already exists")
+        
         # Check if heatmap_color column exists in users
         if 'heatmap_color' not in users_columns:
             print("Adding heatmap_color column...")
@@ -72,6 +81,34 @@ def migrate():
         else:
             print("✓ heatmap_color column already exists")
         
+        # Loot now lives in the in-memory loot store; drop leftover loot spots
+        result = conn.execute(text("""
+            DELETE FROM spots WHERE is_loot = TRUE
+              AND NOT EXISTS (SELECT 1 FROM logs WHERE logs.spot_id = spots.id)
+              AND NOT EXISTS (SELECT 1 FROM claims WHERE claims.spot_id = spots.id)
+        """))
+        conn.commit()
+        print(f"✓ Removed {result.rowcount} legacy loot spots")
+        
+        # One inventory row per (user, item) so loot can be upserted
+        # (unique index: migrate_indexes.py)
+        conn.execute(text("""
+            UPDATE inventory SET quantity = (
+                SELECT SUM(dup.quantity) FROM inventory dup
+                WHERE dup.user_id = inventory.user_id AND dup.item_id = inventory.item_id
+            )
+            WHERE id IN (
+                SELECT MIN(id) FROM inventory GROUP BY user_id, item_id HAVING COUNT(*) > 1
+            )
+        """))
+        result = conn.execute(text("""
+            DELETE FROM inventory WHERE id NOT IN (
+                SELECT MIN(id) FROM inventory GROUP BY user_id, item_id
+            )
+        """))
+        conn.commit()
+        print(f"✓ Merged {result.rowcount} duplicate inventory rows")
+        
         print("\nMigration complete!")
         return True
 
@@ -0,0 +1,97 @@
+#!/usr/bin/env python3
+"""
+Online migration: create the composite/partial indexes from app/models.py
+(HOT_PATH_INDEXES) on an existing database and drop RETIRED_INDEXES.
+
+PostgreSQL indexes are built with CREATE INDEX CONCURRENTLY, so logs, claims and
+spots stay writable while the migration runs. The script is idempotent: existing
+valid indexes are skipped, and indexes left INVALID by an interrupted concurrent
+build are dropped and rebuilt.
+"""
+
+import sys
+from sqlalchemy import text, inspect
+from sqlalchemy.schema import CreateIndex
+from app.database import engine
+from app.config import settings
+from app.models import HOT_PATH_INDEXES, RETIRED_INDEXES
+
+
+def _invalid_postgres_indexes(conn) -> set:
+    """Names of indexes left INVALID by a failed CREATE INDEX CONCURRENTLY"""
+    rows = conn.execute(text("""
+        SELECT c.relname
+        FROM pg_index i
+        JOIN pg_class c ON c.oid = i.indexrelid
+        WHERE NOT i.indisvalid
+    """))
+    return {row[0] for row in rows}
+
+
+def create_index_ddl(index, dialect) -> str:
+    """CREATE [UNIQUE] INDEX IF NOT EXISTS for an index, CONCURRENTLY on PostgreSQL.
+
+    The flag is set only while compiling: create_all() runs in a transaction,
+    where CONCURRENTLY is not allowed.
+    """
+    options = index.dialect_options["postgresql"]
+    options["concurrently"] = dialect.name == "postgresql"
+    try:
+        return str(CreateIndex(index, if_not_exists=True).compile(dialect=dialect))
+    finally:
+        options["concurrently"] = False
+
+
+def migrate():
+    """Create missing hot-path indexes"""
+    inspector = inspect(engine)
+    tables = set(inspector.get_table_names())
+
+    # CONCURRENTLY cannot run inside a transaction block
+    with engine.connect().execution_options(isolation_level="AUTOCOMMIT") as conn:
+        invalid = _invalid_postgres_indexes(conn) if settings.is_postgresql() else set()
+
+        for name in RETIRED_INDEXES:
+            print(f"Dropping retired index {name} (if present)...")
+            if settings.is_postgresql():
+                conn.execute(text(f"DROP INDEX CONCURRENTLY IF EXISTS {name}"))
+            else:
+                conn.execute(text(f"DROP INDEX IF EXISTS {name}"))
+
+        for index in HOT_PATH_INDEXES:
+            table = index.table.name
+            if table not in tables:
+                print(f"- {index.name}: table {table} does not exist yet (created by init_db)")
+                continue
+
+            existing = {ix["name"] for ix in inspector.get_indexes(table)}
+            if index.name in existing and index.name not in invalid:
+                print(f"✓ {index.name} already exists")
+                continue
+
+            if index.name in invalid:
+                print(f"Dropping invalid index {index.name}...")
+                conn.execute(text(f"DROP INDEX CONCURRENTLY IF EXISTS {index.name}"))
+
+            ddl = create_index_ddl(index, engine.dialect)
+
+            print(f"Creating {index.name}...")
+            conn.execute(text(ddl))
+            print(f"✓ {index.name} created")
+
+        if settings.is_postgresql():
+            # Refresh planner statistics for the new indexes
+            for table in ("logs", "claims", "track_points", "tracks", "spots", "inventory"):
+                if table in tables:
+                    conn.execute(text(f"ANALYZE {table}"))
+
+    print("\nIndex migration complete!")
+    return True
+
+
+if __name__ == "__main__":
+    try:
+        migrate()
+    except Exception as e:
+        print(f"Error during migration: {e}", file=sys.stderr)
+        sys.exit(1)
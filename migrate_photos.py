@@ -0,0 +1,93 @@
+#!/usr/bin/env python3
+"""
+Migration: move log photos out of the logs table into the content-addressed
+photo store (PHOTO_STORAGE_DIR).
+
+1. Adds logs.photo_sha256 / logs.photo_size if missing.
+2. Streams existing photo_data blobs to the store one row at a time (so memory
+   stays bounded by a single photo), records digest + size and clears the blob.
+
+Safe to re-run: rows that already have a digest are skipped. Run VACUUM on
+logs afterwards to give the freed space back to PostgreSQL.
+"""
+
+import sys
+from sqlalchemy import text, inspect
+from app.database import engine
+from app.services import photo_store
+
+BATCH_SIZE = 100
+
+
+def add_columns():
+    """Add the photo reference columns to logs"""
+    logs_columns = [col['name'] for col in inspect(engine).get_columns('logs')]
+    with engine.connect() as conn:
+        if 'photo_sha256' not in logs_columns:
+            print("Adding photo_sha256 column...")
+            conn.execute(text("ALTER TABLE logs ADD COLUMN photo_sha256 VARCHAR(64)"))
+            conn.commit()
+            print("✓ photo_sha256 column added")
+        else:
+            print("✓ photo_sha256 column already exists")
+
+        if 'photo_size' not in logs_columns:
+            print("Adding photo_size column...")
+            conn.execute(text("ALTER TABLE logs ADD COLUMN photo_size INTEGER"))
+            conn.commit()
+            print("✓ photo_size column added")
+        else:
+            print("✓ photo_size column already exists")
+
+
+def move_blobs() -> int:
+    """Move photo_data blobs into the photo store; returns the number of moved photos"""
+    moved = 0
+    last_id = 0
+    while True:
+        with engine.connect() as conn:
+            ids = [row[0] for row in conn.execute(text("""
+                SELECT id FROM logs
+                WHERE id > :last_id AND photo_data IS NOT NULL AND photo_sha256 IS NULL
+                ORDER BY id
+                LIMIT :limit
+            """), {"last_id": last_id, "limit": BATCH_SIZE})]
+        if not ids:
+            break
+
+        for log_id in ids:
+            last_id = log_id
+            with engine.connect() as conn:
+                data = conn.execute(
+                    text("SELECT photo_data FROM logs WHERE id = :id"), {"id": log_id}
+                ).scalar()
+                if not data:
+                    continue
+                sha256, size = photo_store.put_bytes(bytes(data))
+                conn.execute(text("""
+                    UPDATE logs
+                    SET photo_sha256 = :sha256, photo_size = :size, photo_data = NULL
+                    WHERE id = :id AND photo_sha256 IS NULL
+                """), {"sha256": sha256, "size": size, "id": log_id})
+                conn.commit()
+                moved += 1
+
+        print(f"  ... {moved} photos moved (up to log {last_id})")
+    return moved
+
+
+def migrate():
+    print(f"Photo store: {photo_store.storage_dir()}")
+    add_columns()
+    moved = move_blobs()
+    print(f"✓ {moved} photos moved to the photo store")
+    print("\nMigration complete!")
+    return True
+
+
+if __name__ == "__main__":
+    try:
+        migrate()
+    except Exception as e:
+        print(f"Error during migration: {e}", file=sys.stderr)
+        sys.exit(1)
@@ -96,6 +96,26 @@ if [ -f "migrate_db.py" ]; then
     fi
 fi
 
+# Photo store (adds photo reference columns, moves photo blobs out of logs)
+if [ -f "migrate_photos.py" ]; then
+    python3 migrate_photos.py
+    if [ $? -eq 0 ]; then
+        echo -e "${GREEN}✓ Photo migration completed!${NC}"
+    else
+        echo -e "${YELLOW}⚠ Photo migration had warnings${NC}"
+    fi
+fi
+
+# Hot-path indexes (CREATE INDEX CONCURRENTLY, safe while the game is running)
+if [ -f "migrate_indexes.py" ]; then
+    python3 migrate_indexes.py
+    if [ $? -eq 0 ]; then
+        echo -e "${GREEN}✓ Index migration completed!${NC}"
+    else
+        echo -e "${YELLOW}⚠ Index migration had warnings${NC}"
+    fi
+fi
+
 echo ""
 echo -e "${GREEN}================================${NC}"
 echo -e "${GREEN}All migrations completed!${NC}"
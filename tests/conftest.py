@@ -2,6 +2,8 @@
 Pytest configuration and fixtures for Claim tests
 """
 import os
+from contextlib import contextmanager
+
 import pytest
 from fastapi.testclient import TestClient
 from sqlalchemy import create_engine, event
@@ -16,6 +18,51 @@ from app.database import Base, get_db
 from app.main import app
 from app.models import User, UserRole
 from app.services.auth_service import get_password_hash
+from app.services import item_catalog, query_monitor
+from app.services.buff_service import modifier_cache
+from app.services.cooldown_store import store as cooldown_store
+from app.services.loot_store import store as loot_store
+from app.services.user_cache import principals
+
+
+@pytest.fixture(autouse=True)
+def reset_cooldown_store():
+    """The cooldown table is process-wide; every test starts with an empty one"""
+    cooldown_store.clear()
+    yield
+    cooldown_store.clear()
+
+
+@pytest.fixture(autouse=True)
+def reset_modifier_cache():
+    """Buff modifiers are cached per process; don't leak them between test databases"""
+    modifier_cache.clear()
+    yield
+    modifier_cache.clear()
+
+
+@pytest.fixture(autouse=True)
+def reset_item_catalog():
+    """The item catalog is process-wide; don't leak items between test databases"""
+    item_catalog.invalidate()
+    yield
+    item_catalog.invalidate()
+
+
+@pytest.fixture(autouse=True)
+def reset_loot_store():
+    """Loot drops live in process memory; every test starts without any"""
+    loot_store.clear()
+    yield
+    loot_store.clear()
+
+
+@pytest.fixture(autouse=True)
+def reset_principal_cache():
+    """Authenticated users are cached per process; test databases reuse user ids"""
+    principals.clear()
+    yield
+    principals.clear()
 
 
 # Test database engine with in-memory SQLite
@@ -149,3 +196,21 @@ def admin_headers(client, test_admin):
     assert response.status_code == 200
     token = response.json()["access_token"]
     return {"Authorization": f"Bearer {token}"}
+
+
+@pytest.fixture
+def query_budget():
+    """Fail when a block issues more SQL statements than declared.
+
+        with query_budget(3):
+            client.get("/api/spots/nearby", ...)
+    """
+    @contextmanager
+    def budget(max_queries: int):
+        with query_monitor.capture() as queries:
+            yield queries
+        if queries.count > max_queries:
+            repeated = "\n".join(f"  {n} x {fp}" for fp, n in queries.fingerprints.most_common(5))
+            pytest.fail(f"{queries.count} queries, budget {max_queries}:\n{repeated}")
+
+    return budget
@@ -0,0 +1,66 @@
+"""
+Tests for the async engine setup and its threadpool fallback
+"""
+import asyncio
+import threading
+from contextlib import contextmanager
+
+from sqlalchemy.orm import sessionmaker
+
+from app import database
+from app.database import async_database_url
+
+
+def test_async_database_urls():
+    assert async_database_url("postgresql://u:p@db:5432/claim") == "postgresql+asyncpg://u:p@db:5432/claim"
+    assert async_database_url("postgresql+psycopg2://u@db/claim") == "postgresql+asyncpg://u@db/claim"
+    assert async_database_url("sqlite:///./claim.db") == "sqlite+aiosqlite:///./claim.db"
+    # A second engine on an in-memory database would not see the app's tables
+    assert async_database_url("sqlite:///:memory:") is None
+    assert async_database_url("mysql://u@db/claim") is None
+
+
+def test_run_db_falls_back_to_the_threadpool(test_engine, monkeypatch):
+    TestingSessionLocal = sessionmaker(bind=test_engine)
+
+    @contextmanager
+    def scope():
+        db = TestingSessionLocal()
+        try:
+            yield db
+            db.commit()
+        finally:
+            db.close()
+
+    monkeypatch.setattr(database, "session_scope", scope)
+    assert database.get_async_session_factory() is None  # Tests run on in-memory SQLite
+
+    def work(db, value):
+        return value, threading.current_thread() is threading.main_thread(), db.bind is test_engine
+
+    assert asyncio.run(database.run_db(work, 7)) == (7, False, True)
+
+
+def test_blocking_callbacks_skip_the_async_engine(test_engine, monkeypatch):
+    TestingSessionLocal = sessionmaker(bind=test_engine)
+
+    @contextmanager
+    def scope():
+        db = TestingSessionLocal()
+        try:
+            yield db
+            db.commit()
+        finally:
+            db.close()
+
+    def no_async_session():
+        raise AssertionError("blocking callback was run on the event loop")
+
+    monkeypatch.setattr(database, "session_scope", scope)
+    monkeypatch.setattr(database, "get_async_session_factory", lambda: no_async_session)
+    monkeypatch.setattr(database, "async_session_scope", no_async_session)
+
+    def work(db):
+        return threading.current_thread() is threading.main_thread()
+
+    assert asyncio.run(database.run_db(work, blocking=True)) is False
@@ -0,0 +1,50 @@
+"""
+Tests for password hashing off the event loop
+"""
+import asyncio
+import threading
+import time
+
+from app.config import settings
+from app.services import auth_service
+
+
+def test_login_verifies_on_the_hashing_pool(client, test_user, monkeypatch):
+    threads = []
+    verify = auth_service.verify_password
+
+    def recording_verify(plain_password, hashed_password):
+        threads.append(threading.current_thread().name)
+        return verify(plain_password, hashed_password)
+
+    monkeypatch.setattr(auth_service, "verify_password", recording_verify)
+    response = client.post("/api/auth/token", data={"username": "testuser", "password": "TestPassword123!"})
+    assert response.status_code == 200
+    assert len(threads) == 1 and threads[0].startswith("bcrypt")
+
+
+def test_hashing_concurrency_is_bounded(monkeypatch):
+    monkeypatch.setattr(settings, "AUTH_HASH_WORKERS", 2)
+    auth_service.shutdown_hash_executor()
+    running, peak = [0], [0]
+    lock = threading.Lock()
+
+    def slow_verify(plain_password, hashed_password):
+        with lock:
+            running[0] += 1
+            peak[0] = max(peak[0], running[0])
+        time.sleep(0.05)
+        with lock:
+            running[0] -= 1
+        return True
+
+    monkeypatch.setattr(auth_service, "verify_password", slow_verify)
+
+    async def burst():
+        return await asyncio.gather(*(auth_service.verify_password_async("pw", "hash") for _ in range(6)))
+
+    try:
+        assert asyncio.run(burst()) == [True] * 6
+    finally:
+        auth_service.shutdown_hash_executor()
+    assert peak[0] == 2
@@ -0,0 +1,97 @@
+"""
+Tests for the cached buff modifiers
+"""
+from datetime import timedelta
+
+import pytest
+from sqlalchemy import event
+
+from app.config import settings
+from app.models import UserBuff, get_cet_now
+from app.services import buff_service
+from app.services.buff_service import modifier_cache
+
+
+@pytest.fixture
+def queries(test_engine):
+    statements = []
+
+    def capture(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+
+    event.listen(test_engine, "before_cursor_execute", capture)
+    yield statements
+    event.remove(test_engine, "before_cursor_execute", capture)
+
+
+def test_users_without_buffs_need_no_queries(test_db, test_user, queries):
+    buff_service.warm_modifier_cache(test_db)
+    queries.clear()
+
+    assert buff_service.get_active_modifiers(test_db, test_user.id) == buff_service.NO_BUFFS
+    assert buff_service.get_active_modifiers(test_db, 12345) == buff_service.NO_BUFFS
+    assert queries == []
+
+
+def test_new_buff_invalidates_cached_modifiers(test_db, test_user, queries):
+    user_id = test_user.id
+    buff_service.warm_modifier_cache(test_db)
+    buff_service.create_buff_from_item_effects(
+        test_db, user_id=user_id, xp_boost=0.5, claim_boost=0.0, range_boost=50.0, duration_seconds=600
+    )
+    queries.clear()
+
+    modifiers = buff_service.get_active_modifiers(test_db, user_id)
+    assert modifiers.xp_multiplier == pytest.approx(1.5) and modifiers.range_bonus_m == 50.0
+    assert len(queries) == 1
+
+    buff_service.get_active_modifiers(test_db, user_id)
+    assert len(queries) == 1  # Cached until the buff expires
+
+
+def test_entry_recomputes_when_earliest_buff_expires(test_db, test_user):
+    now = get_cet_now()
+    test_db.add_all([
+        UserBuff(user_id=test_user.id, xp_multiplier=2.0, expires_at=now + timedelta(minutes=5)),
+        UserBuff(user_id=test_user.id, xp_multiplier=1.5, expires_at=now + timedelta(minutes=30)),
+    ])
+    test_db.commit()
+
+    assert modifier_cache.get(test_db, test_user.id, now).xp_multiplier == pytest.approx(3.0)
+    assert modifier_cache.get(test_db, test_user.id, now + timedelta(minutes=10)).xp_multiplier == pytest.approx(1.5)
+    assert modifier_cache.get(test_db, test_user.id, now + timedelta(minutes=40)) == buff_service.NO_BUFFS
+
+
+def test_invalidation_during_load_is_not_overwritten(test_db, test_user, test_engine):
+    user_id = test_user.id
+    buff_service.warm_modifier_cache(test_db)
+    modifier_cache.invalidate(user_id)
+
+    def invalidate(conn, cursor, statement, parameters, context, executemany):
+        # A buff is granted between the lookup's query and its write-back
+        if "user_buffs" in statement:
+            modifier_cache.invalidate(user_id)
+
+    event.listen(test_engine, "after_cursor_execute", invalidate)
+    try:
+        assert buff_service.get_active_modifiers(test_db, user_id) == buff_service.NO_BUFFS
+    finally:
+        event.remove(test_engine, "after_cursor_execute", invalidate)
+
+    test_db.add(UserBuff(user_id=user_id, xp_multiplier=1.5, expires_at=get_cet_now() + timedelta(minutes=10)))
+    test_db.commit()
+    assert buff_service.get_active_modifiers(test_db, user_id).xp_multiplier == pytest.approx(1.5)
+
+
+def test_buffs_from_other_workers_show_up_after_the_ttl(test_db, test_user, monkeypatch):
+    user_id = test_user.id
+    buff_service.warm_modifier_cache(test_db)
+    assert buff_service.get_active_modifiers(test_db, user_id) == buff_service.NO_BUFFS
+
+    # Granted by another worker: this process never sees an invalidation
+    test_db.add(UserBuff(user_id=user_id, xp_multiplier=1.5, expires_at=get_cet_now() + timedelta(minutes=10)))
+    test_db.commit()
+    assert buff_service.get_active_modifiers(test_db, user_id) == buff_service.NO_BUFFS
+
+    monkeypatch.setattr(settings, "BUFF_CACHE_TTL", 0.0)
+    assert buff_service.get_active_modifiers(test_db, user_id).xp_multiplier == pytest.approx(1.5)
@@ -0,0 +1,127 @@
+"""
+Tests for the in-memory log cooldown table
+"""
+from datetime import timedelta
+
+import pytest
+from sqlalchemy import event
+
+from app.config import settings
+from app.models import Log, Spot, get_cet_now
+from app.schemas import LogCreate
+from app.services import log_service, spot_service
+from app.services.cooldown_store import CooldownStore, MemoryCooldownBackend, store
+
+
+def _spot(db):
+    spot = Spot(name="Fountain", location="POINT(11.5 48.1)", is_permanent=True, is_loot=False)
+    db.add(spot)
+    db.commit()
+    return spot
+
+
+def _log(db, user, spot, is_auto, seconds_ago):
+    db.add(Log(
+        user_id=user.id,
+        spot_id=spot.id,
+        location="POINT(11.5 48.1)",
+        is_auto=is_auto,
+        timestamp=get_cet_now() - timedelta(seconds=seconds_ago),
+    ))
+    db.commit()
+
+
+def test_lazy_warm_reads_recent_logs(test_db, test_user):
+    spot = _spot(test_db)
+    _log(test_db, test_user, spot, is_auto=True, seconds_ago=60)
+    # Outside the cooldown window: ignored
+    _log(test_db, test_user, spot, is_auto=False, seconds_ago=settings.LOG_COOLDOWN + 60)
+
+    status = spot_service.get_log_status(test_db, test_user.id, spot.id)
+    assert status["last_log_type"] == "auto"
+    assert not status["can_auto_log"]
+    assert status["can_manual_log"]
+    assert settings.LOG_COOLDOWN - 62 <= status["auto_cooldown_remaining"] <= settings.LOG_COOLDOWN - 59
+
+    assert not spot_service.can_log_spot(test_db, test_user.id, spot.id, is_auto=True)
+    assert spot_service.can_log_spot(test_db, test_user.id, spot.id, is_auto=False)
+
+
+def test_write_through_manual_log_blocks_both(test_db, test_user):
+    spot = _spot(test_db)
+    assert spot_service.can_log_spot(test_db, test_user.id, spot.id, is_auto=True)
+
+    store.record(test_user.id, spot.id, False, get_cet_now())
+
+    assert not spot_service.can_log_spot(test_db, test_user.id, spot.id, is_auto=True)
+    assert not spot_service.can_log_spot(test_db, test_user.id, spot.id, is_auto=False)
+    assert spot_service.get_cooldown_remaining(test_db, test_user.id, spot.id) >= settings.LOG_COOLDOWN - 1
+    assert spot_service.get_log_status(test_db, test_user.id, spot.id)["last_log_type"] == "manual"
+
+
+def test_warm_loads_all_users(test_db, test_user, test_admin):
+    spot = _spot(test_db)
+    _log(test_db, test_user, spot, is_auto=True, seconds_ago=10)
+    _log(test_db, test_admin, spot, is_auto=False, seconds_ago=10)
+
+    cooldowns = CooldownStore()
+    assert cooldowns.warm(test_db, get_cet_now()) == 2
+
+    now = get_cet_now()
+    since_auto, since_manual = cooldowns.last_logs(test_db, test_user.id, spot.id, now)
+    assert since_auto is not None and since_manual is None
+    since_auto, since_manual = cooldowns.last_logs(test_db, test_admin.id, spot.id, now)
+    assert since_auto is None and since_manual is not None
+
+
+def test_memory_backend_evicts_expired_entries():
+    backend = MemoryCooldownBackend()
+    backend.record(1, 1, True, 1000.0, ttl_seconds=300)
+    backend.SWEEP_INTERVAL_SECONDS = -1  # Sweep on the next write
+    backend.record(1, 2, False, 2000.0, ttl_seconds=300)
+
+    assert len(backend) == 1
+    assert backend.get(1, 1) == (0.0, 0.0)
+    assert backend.get(1, 2) == (0.0, 2000.0)
+
+
+def _request_log(db, user, spot):
+    """The route's sequence: lock, check cooldown, create"""
+    log_service.lock_user_logs(db, user.id)
+    if not spot_service.can_log_spot(db, user.id, spot.id, is_auto=False):
+        db.rollback()
+        return None
+    return log_service.create_log(db, user, LogCreate(spot_id=spot.id, latitude=48.1, longitude=11.5))
+
+
+def test_cooldown_is_recorded_before_the_lock_is_released(test_db, test_user):
+    spot = _spot(test_db)
+    store.warm(test_db, get_cet_now())
+    waiting = []
+
+    def second_request(session):
+        # A request blocked on lock_user_logs gets the lock as soon as this commit ends
+        waiting.append(spot_service.can_log_spot(test_db, test_user.id, spot.id, is_auto=False))
+
+    event.listen(test_db, "after_commit", second_request, once=True)
+    assert _request_log(test_db, test_user, spot) is not None
+    assert waiting == [False]
+
+    assert _request_log(test_db, test_user, spot) is None
+    assert test_db.query(Log).filter(Log.spot_id == spot.id).count() == 1
+
+
+def test_cooldown_is_reverted_when_the_commit_fails(test_db, test_user, monkeypatch):
+    spot = _spot(test_db)
+    store.warm(test_db, get_cet_now())
+
+    def failing_commit():
+        raise RuntimeError("connection lost")
+
+    monkeypatch.setattr(test_db, "commit", failing_commit)
+    with pytest.raises(RuntimeError):
+        _request_log(test_db, test_user, spot)
+    monkeypatch.undo()
+    test_db.rollback()
+
+    assert spot_service.can_log_spot(test_db, test_user.id, spot.id, is_auto=False)
@@ -0,0 +1,110 @@
+"""
+Tests for the geo backend (coordinate decoding, spot radius index) and
+gameplay on SQLite without PostGIS
+"""
+import random
+import struct
+from datetime import timedelta
+
+import pytest
+
+from app.models import Spot, get_cet_now
+from app.services import geo_service
+from app.services.geo_service import SpotIndex
+
+
+@pytest.fixture(autouse=True)
+def fresh_spot_index(monkeypatch):
+    monkeypatch.setattr(geo_service, "spot_index", SpotIndex())
+
+
+def _spot(db, name, lat, lon, **fields):
+    spot = Spot(name=name, location=geo_service.point_value(lat, lon), is_permanent=True, is_loot=False)
+    for key, value in fields.items():
+        setattr(spot, key, value)
+    db.add(spot)
+    db.commit()
+    return spot
+
+
+def test_point_coordinates_decodes_wkt_and_ewkb():
+    ewkb = struct.pack("<BII", 1, 0x20000001, 4326) + struct.pack("<dd", 11.5, 48.1)
+    wkb_big_endian = struct.pack(">BI", 0, 1) + struct.pack(">dd", 11.5, 48.1)
+
+    assert geo_service.point_coordinates("POINT(11.5 48.1)") == (48.1, 11.5)
+    assert geo_service.point_coordinates(ewkb) == (48.1, 11.5)
+    assert geo_service.point_coordinates(ewkb.hex()) == (48.1, 11.5)
+    assert geo_service.point_coordinates(memoryview(wkb_big_endian)) == (48.1, 11.5)
+    assert geo_service.point_coordinates("LINESTRING(1 2, 3 4)") is None
+    assert geo_service.point_coordinates(None) is None
+
+
+@pytest.mark.parametrize("vectorized", [True, False])
+def test_spot_index_matches_brute_force(monkeypatch, vectorized):
+    if not vectorized:
+        monkeypatch.setattr(geo_service, "np", None)
+    rng = random.Random(7)
+    points = {i: (48.1 + rng.uniform(-0.02, 0.02), 11.5 + rng.uniform(-0.03, 0.03)) for i in range(1, 500)}
+    index = SpotIndex()
+    index._append(points)
+
+    hits = dict(index.within(48.1, 11.5, 800))
+    expected = {
+        spot_id for spot_id, (lat, lon) in points.items()
+        if geo_service.haversine_m(48.1, 11.5, lat, lon) <= 800
+    }
+    assert set(hits) == expected
+    for spot_id, distance in hits.items():
+        assert distance == pytest.approx(geo_service.haversine_m(48.1, 11.5, *points[spot_id]))
+
+
+def test_spot_index_picks_up_new_spots(test_db):
+    _spot(test_db, "Old", 48.1, 11.5)
+    index = geo_service.spot_index
+    index.refresh(test_db)
+    assert len(index) == 1
+
+    _spot(test_db, "New", 48.1001, 11.5)
+    index.refresh(test_db)  # Not stale yet: only ids above the newest known one are loaded
+    assert len(index) == 2
+
+
+def test_nearby_spots_on_sqlite(client, auth_headers, test_db, test_user):
+    near = _spot(test_db, "Near", 48.1002, 11.5)
+    _spot(test_db, "Far", 48.2, 11.5)
+    _spot(test_db, "Expired loot", 48.1001, 11.5, is_permanent=False, is_loot=True,
+          loot_expires_at=get_cet_now() - timedelta(minutes=1))
+
+    response = client.get("/api/spots/nearby?latitude=48.1&longitude=11.5&radius=500", headers=auth_headers)
+    assert response.status_code == 200
+    spots = response.json()
+    assert [spot["name"] for spot in spots] == ["Near"]
+    assert (spots[0]["latitude"], spots[0]["longitude"]) == (48.1002, 11.5)
+
+    details = client.get(f"/api/spots/{near.id}/details?latitude=48.1&longitude=11.5", headers=auth_headers)
+    assert 20 < details.json()["distance_meters"] < 25
+
+
+def test_log_distance_check_on_sqlite(client, auth_headers, test_db):
+    spot = _spot(test_db, "Fountain", 48.1, 11.5)
+    body = {"spot_id": spot.id, "latitude": 48.1, "longitude": 11.5015, "is_auto": True}  # ~110m east
+    assert client.post("/api/logs/", json=body, headers=auth_headers).status_code == 400
+
+    body["longitude"] = 11.5001  # ~7m
+    response = client.post("/api/logs/", json=body, headers=auth_headers)
+    assert response.status_code == 201
+    assert 5 < response.json()["distance"] < 10
+
+
+def test_track_distance_on_sqlite(client, auth_headers):
+    track = client.post("/api/tracks/", json={}, headers=auth_headers).json()
+    for lat in (48.1, 48.101, 48.102):
+        response = client.post(
+            f"/api/tracks/{track['id']}/points", json={"latitude": lat, "longitude": 11.5}, headers=auth_headers
+        )
+        assert response.status_code == 200
+        assert response.json()["latitude"] == lat
+
+    detail = client.get(f"/api/tracks/{track['id']}", headers=auth_headers).json()
+    assert len(detail["points"]) == 3
+    assert detail["distance_km"] == pytest.approx(0.2224, abs=0.001)
@@ -0,0 +1,100 @@
+"""
+Tests for server-side geofencing of auto-logs
+"""
+import asyncio
+
+from app.models import Spot
+from app.services import geo_service, geofence_service
+from app.services.geofence_service import GeofenceEngine, SpotFence
+
+
+def test_haversine_matches_known_distance():
+    # Marienplatz -> Odeonsplatz (Munich), roughly 575m
+    distance = geo_service.haversine_m(48.13743, 11.57549, 48.14249, 11.57746)
+    assert 560 < distance < 590
+
+
+def test_parse_point_wkt():
+    assert geo_service.parse_point_wkt("POINT(11.5 48.1)") == (48.1, 11.5)
+    assert geo_service.parse_point_wkt("SRID=4326;POINT(11.5 48.1)") == (48.1, 11.5)
+    assert geo_service.parse_point_wkt(None) is None
+
+
+def test_fences_containing_uses_radius():
+    engine = GeofenceEngine()
+    engine.build([
+        SpotFence(1, 48.1, 11.5, 20.0),
+        SpotFence(2, 48.1005, 11.5, 20.0),  # ~55m north
+    ])
+    hits = engine.fences_containing(48.10005, 11.5)  # ~5.5m from spot 1
+    assert [fence.spot_id for fence in hits] == [1]
+
+
+def test_fences_across_cell_border():
+    engine = GeofenceEngine()
+    # Spot sits right below a grid line, player right above it
+    engine.build([SpotFence(1, 47.99999, 11.5, 20.0)])
+    assert [fence.spot_id for fence in engine.fences_containing(48.00001, 11.5)] == [1]
+
+
+def test_claim_candidates_respects_in_flight_and_cooldown():
+    engine = GeofenceEngine()
+    engine.build([SpotFence(1, 48.1, 11.5, 20.0)])
+
+    assert engine.claim_candidates(7, 48.1, 11.5) == [1]
+    # Still in flight: not claimed twice
+    assert engine.claim_candidates(7, 48.1, 11.5) == []
+    # Other players are independent
+    assert engine.claim_candidates(8, 48.1, 11.5) == [1]
+
+    engine.release(7, 1, retry_after_seconds=300)
+    assert engine.claim_candidates(7, 48.1, 11.5) == []
+
+    engine.release(8, 1, retry_after_seconds=0)
+    assert engine.claim_candidates(8, 48.1, 11.5) == [1]
+
+
+def test_load_reads_permanent_spots(test_db):
+    test_db.add_all([
+        Spot(name="Fountain", location="POINT(11.5 48.1)", is_permanent=True, is_loot=False),
+        Spot(name="Loot", location="POINT(11.6 48.2)", is_permanent=False, is_loot=True),
+    ])
+    test_db.commit()
+
+    engine = GeofenceEngine()
+    engine.load(test_db)
+
+    hits = engine.fences_containing(48.1, 11.5)
+    assert [fence.radius_m for fence in hits] == [20.0]
+    assert engine.fences_containing(48.2, 11.6) == []
+    assert not engine.needs_reload()
+
+    engine.invalidate()
+    assert engine.needs_reload()
+
+
+def test_process_position_ignores_inaccurate_fix(monkeypatch):
+    engine = GeofenceEngine()
+    engine.build([SpotFence(1, 48.1, 11.5, 20.0)])
+    monkeypatch.setattr(geofence_service, "engine", engine)
+
+    assert asyncio.run(geofence_service.process_position(7, 48.1, 11.5, accuracy=120.0)) == []
+    # Nothing was claimed by the rejected update
+    assert engine.claim_candidates(7, 48.1, 11.5) == [1]
+
+
+def test_reload_and_auto_logs_run_off_the_event_loop(monkeypatch):
+    engine = GeofenceEngine()  # Never loaded: the first update reloads it
+    monkeypatch.setattr(geofence_service, "engine", engine)
+    calls = []
+
+    async def fake_run_db(fn, *args, blocking=False):
+        calls.append((fn.__name__, blocking))
+        if fn is geofence_service._reload:
+            engine.build([SpotFence(1, 48.1, 11.5, 20.0)])
+            return None
+        return None, 0
+
+    monkeypatch.setattr(geofence_service, "run_db", fake_run_db)
+    asyncio.run(geofence_service.process_position(7, 48.1, 11.5))
+    assert calls == [("_reload", True), ("_auto_log", True)]
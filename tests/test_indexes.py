@@ -0,0 +1,49 @@
+"""
+Tests for the hot-path composite indexes
+"""
+from sqlalchemy import inspect, text
+from sqlalchemy.dialects import postgresql
+
+import migrate_indexes
+from app.models import HOT_PATH_INDEXES, RETIRED_INDEXES
+
+
+def test_create_all_creates_hot_path_indexes(test_engine):
+    inspector = inspect(test_engine)
+    for index in HOT_PATH_INDEXES:
+        names = {ix["name"] for ix in inspector.get_indexes(index.table.name)}
+        assert index.name in names
+
+
+def test_cooldown_lookup_uses_composite_index(test_engine):
+    with test_engine.connect() as conn:
+        plan = conn.execute(text(
+            "EXPLAIN QUERY PLAN SELECT timestamp FROM logs "
+            "WHERE user_id = 1 AND spot_id = 2 AND is_auto = 1 AND timestamp > '2024-01-01'"
+        )).fetchall()
+    assert any("ix_logs_user_spot_auto_timestamp" in str(row) for row in plan)
+
+
+def test_migration_drops_retired_indexes(test_engine, monkeypatch):
+    with test_engine.begin() as conn:
+        conn.execute(text("CREATE INDEX ix_spots_loot_owner_expires ON spots (owner_id, loot_expires_at)"))
+    monkeypatch.setattr(migrate_indexes, "engine", test_engine)
+
+    assert migrate_indexes.migrate()
+    names = {ix["name"] for ix in inspect(test_engine).get_indexes("spots")}
+    assert not names & set(RETIRED_INDEXES)
+
+
+def test_postgres_index_builds_are_concurrent():
+    for index in HOT_PATH_INDEXES:
+        ddl = migrate_indexes.create_index_ddl(index, postgresql.dialect())
+        assert "CONCURRENTLY" in ddl, ddl
+        assert index.name in ddl
+    # The model indexes themselves stay plain for create_all()
+    assert all(not index.dialect_options["postgresql"]["concurrently"] for index in HOT_PATH_INDEXES)
+
+
+def test_inventory_unique_index_builds_without_blocking_writes():
+    index = next(index for index in HOT_PATH_INDEXES if index.name == "uq_inventory_user_item")
+    ddl = migrate_indexes.create_index_ddl(index, postgresql.dialect())
+    assert ddl.startswith("CREATE UNIQUE INDEX CONCURRENTLY IF NOT EXISTS uq_inventory_user_item ON inventory")
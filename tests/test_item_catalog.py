@@ -0,0 +1,71 @@
+"""
+Tests for the cached item catalog (alias sampling, durations, invalidation)
+"""
+import random
+from collections import Counter
+
+import pytest
+from sqlalchemy import event
+
+from app.models import InventoryItem, Item, UserBuff
+from app.schemas import ItemCreate
+from app.services import item_catalog, item_service
+
+
+def test_alias_table_matches_weights():
+    items = [
+        Item(id=1, name="Pebble", rarity="common"),
+        Item(id=2, name="Gem", rarity="rare"),
+        Item(id=3, name="Crown", rarity="legendary"),
+    ]
+    catalog = item_catalog.build(items)
+    rng = random.Random(3)
+    draws = Counter(catalog.sample(rng).id for _ in range(90000))
+
+    total = 60 + 25 + 5
+    for item_id, weight in ((1, 60), (2, 25), (3, 5)):
+        assert draws[item_id] / 90000 == pytest.approx(weight / total, abs=0.01)
+    assert item_catalog.build([]).sample(rng) is None
+
+
+def test_default_items_get_precomputed_durations(test_db):
+    item_service.initialize_default_items(test_db)
+    durations = {item.name: item.duration_seconds for item in item_service.get_all_items(test_db)}
+    assert durations["XP Boost"] == 3600
+    assert durations["Mega XP Boost"] == 1800
+    assert durations["Lucky Charm"] == 0  # No effect, no buff
+
+
+def test_catalog_is_cached_until_invalidated(test_engine, test_db):
+    item_service.initialize_default_items(test_db)
+    first = item_catalog.get(test_db)
+
+    statements = []
+
+    def capture(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+
+    event.listen(test_engine, "before_cursor_execute", capture)
+    try:
+        assert item_catalog.get(test_db) is first
+        assert item_service.get_item_by_id(test_db, first.items[0].id) == first.items[0]
+    finally:
+        event.remove(test_engine, "before_cursor_execute", capture)
+    assert statements == []
+
+    item_service.create_item(test_db, ItemCreate(name="Compass", item_type="tool", rarity="epic", range_boost=10))
+    second = item_catalog.get(test_db)
+    assert second.version > first.version
+    assert "Compass" in {item.name for item in second.items}
+
+
+def test_use_item_uses_catalog_duration(test_db, test_user):
+    item_service.initialize_default_items(test_db)
+    mega = next(item for item in item_service.get_all_items(test_db) if item.name == "Mega XP Boost")
+    test_db.add(InventoryItem(user_id=test_user.id, item_id=mega.id, quantity=1))
+    test_db.commit()
+
+    result = item_service.use_item(test_db, test_user.id, mega.id)
+    assert result["success"] and result["remaining"] == 0
+    buff = test_db.query(UserBuff).filter(UserBuff.user_id == test_user.id).one()
+    assert round((buff.expires_at - buff.created_at).total_seconds()) == 1800
@@ -0,0 +1,105 @@
+"""
+Tests for keyset-paginated log history
+"""
+from datetime import datetime, timedelta
+
+import pytest
+from sqlalchemy import event
+
+from app.models import Log, Spot
+from app.services import log_service
+
+BASE_TIME = datetime(2024, 5, 1, 12, 0, 0)
+
+
+@pytest.fixture
+def spot(test_db):
+    spot = Spot(name="Fountain", location="POINT(11.5 48.1)", is_permanent=True, is_loot=False)
+    test_db.add(spot)
+    test_db.commit()
+    return spot
+
+
+@pytest.fixture
+def history(test_db, test_user, spot):
+    """7 logs; logs 3 and 4 share a timestamp to exercise the id tie-breaker"""
+    offsets = [0, 1, 2, 3, 3, 5, 6]
+    logs = []
+    for index, minutes in enumerate(offsets):
+        log = Log(user_id=test_user.id, spot_id=spot.id, location="POINT(11.5 48.1)", distance=5.0,
+                  timestamp=BASE_TIME + timedelta(minutes=minutes),
+                  photo_sha256="a" * 64 if index == 2 else None)
+        test_db.add(log)
+        logs.append(log)
+    test_db.commit()
+    return logs
+
+
+def _expected_order(logs):
+    return [log.id for log in sorted(logs, key=lambda log: (log.timestamp, log.id), reverse=True)]
+
+
+def test_cursor_round_trip_and_validation():
+    cursor = log_service.encode_cursor(BASE_TIME, 42)
+    assert log_service.decode_cursor(cursor) == (BASE_TIME, 42)
+    with pytest.raises(ValueError):
+        log_service.decode_cursor("not-a-cursor")
+
+
+def test_pages_cover_history_without_gaps_or_duplicates(test_db, test_user, history):
+    seen = []
+    cursor = None
+    while True:
+        logs, cursor = log_service.get_user_logs(test_db, test_user.id, limit=3, cursor=cursor)
+        seen.extend(log.id for log in logs)
+        assert all(log.username == test_user.username for log in logs)
+        if cursor is None:
+            break
+    assert seen == _expected_order(history)
+
+
+def test_history_query_skips_heavy_columns(test_engine, test_db, spot, history):
+    statements = []
+
+    def capture(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+
+    spot_id = spot.id
+    test_db.expire_all()
+    event.listen(test_engine, "before_cursor_execute", capture)
+    try:
+        logs, _ = log_service.get_spot_logs(test_db, spot_id, limit=10)
+        flags = {log.id: bool(log.has_photo) for log in logs}
+        usernames = {log.username for log in logs}
+    finally:
+        event.remove(test_engine, "before_cursor_execute", capture)
+
+    assert len(statements) == 1  # Usernames joined, no per-row queries
+    select_list = statements[0].split(" FROM ")[0]
+    # photo_data only appears inside the has_photo expression, never as a loaded column
+    assert "photo_data AS" not in select_list and "location" not in select_list
+    assert flags[history[2].id] is True and sum(flags.values()) == 1
+    assert usernames == {"testuser"}
+
+
+def test_spot_logs_endpoint_returns_next_cursor(client, auth_headers, spot, history):
+    response = client.get(f"/api/logs/spot/{spot.id}?limit=4", headers=auth_headers)
+    assert response.status_code == 200
+    first_page = [log["id"] for log in response.json()]
+    cursor = response.headers["x-next-cursor"]
+
+    response = client.get(f"/api/logs/spot/{spot.id}?limit=4&cursor={cursor}", headers=auth_headers)
+    assert "x-next-cursor" not in response.headers
+    assert first_page + [log["id"] for log in response.json()] == _expected_order(history)
+
+    assert client.get("/api/logs/me?cursor=garbage", headers=auth_headers).status_code == 400
+
+
+def test_admin_logs_cursor(client, admin_headers, spot, history):
+    response = client.get("/api/admin/logs?limit=5", headers=admin_headers)
+    body = response.json()
+    assert [log["spot"] for log in body["logs"]] == ["Fountain"] * 5
+
+    rest = client.get(f"/api/admin/logs?limit=5&cursor={body['next_cursor']}", headers=admin_headers).json()
+    assert rest["next_cursor"] is None
+    assert [log["id"] for log in body["logs"] + rest["logs"]] == _expected_order(history)
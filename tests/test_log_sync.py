@@ -0,0 +1,82 @@
+"""
+Tests for batched offline log sync
+"""
+from datetime import timedelta
+
+import pytest
+
+from app.models import Log, Spot
+from app.services.log_service import get_current_cet
+
+
+@pytest.fixture
+def spots(test_db):
+    spots = [
+        Spot(name=f"Spot {i}", location="POINT(11.5 48.1)", is_permanent=True, is_loot=False)
+        for i in range(2)
+    ]
+    test_db.add_all(spots)
+    test_db.commit()
+    return spots
+
+
+def _item(key, spot, minutes_ago, is_auto=True):
+    return {
+        "client_key": key,
+        "spot_id": spot.id,
+        "latitude": 48.1,
+        "longitude": 11.5,
+        "is_auto": is_auto,
+        "client_timestamp": (get_current_cet() - timedelta(minutes=minutes_ago)).isoformat(),
+    }
+
+
+def _sync(client, headers, items):
+    response = client.post("/api/logs/sync", json={"logs": items}, headers=headers)
+    assert response.status_code == 200
+    return [(r["client_key"], r["status"]) for r in response.json()["results"]]
+
+
+def test_sync_applies_cooldown_in_client_time_order(client, auth_headers, test_db, spots):
+    first, second = spots
+    items = [
+        _item("offline-0003", first, minutes_ago=30),   # 10 min after -0001: fine
+        _item("offline-0002", first, minutes_ago=38),   # 2 min after -0001: cooldown
+        _item("offline-0001", first, minutes_ago=40),
+        _item("offline-0004", second, minutes_ago=39),  # Other spot: independent
+        _item("offline-0005", first, minutes_ago=60 * 48),
+    ]
+    assert _sync(client, auth_headers, items) == [
+        ("offline-0003", "created"),
+        ("offline-0002", "cooldown"),
+        ("offline-0001", "created"),
+        ("offline-0004", "created"),
+        ("offline-0005", "rejected"),
+    ]
+
+    logs = test_db.query(Log).order_by(Log.timestamp).all()
+    assert [log.client_key for log in logs] == ["offline-0001", "offline-0004", "offline-0003"]
+    # Logs keep the device time
+    assert round((logs[2].timestamp - logs[0].timestamp).total_seconds()) == 600
+
+
+def test_resending_a_batch_is_idempotent(client, auth_headers, test_db, spots):
+    items = [_item("retry-0001", spots[0], minutes_ago=20), _item("retry-0002", spots[1], minutes_ago=20)]
+    assert _sync(client, auth_headers, items) == [("retry-0001", "created"), ("retry-0002", "created")]
+    assert _sync(client, auth_headers, items) == [("retry-0001", "duplicate"), ("retry-0002", "duplicate")]
+    assert test_db.query(Log).count() == 2
+
+
+def test_create_log_with_client_key_is_idempotent(client, auth_headers, test_db, spots):
+    body = {"spot_id": spots[0].id, "latitude": 48.1, "longitude": 11.5, "is_auto": True,
+            "client_key": "single-0001"}
+    first = client.post("/api/logs/", json=body, headers=auth_headers)
+    assert first.status_code == 201
+
+    retry = client.post("/api/logs/", json=body, headers=auth_headers)
+    assert retry.json()["id"] == first.json()["id"]
+
+    # A new intent for the same spot still hits the cooldown
+    body["client_key"] = "single-0002"
+    assert client.post("/api/logs/", json=body, headers=auth_headers).status_code == 429
+    assert test_db.query(Log).count() == 1
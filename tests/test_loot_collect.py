@@ -0,0 +1,83 @@
+"""
+Tests for the loot collection fast path (atomic XP award, inventory upsert)
+"""
+from datetime import timedelta
+
+from sqlalchemy import event
+
+from app.models import InventoryItem, Item, User
+from app.services import item_catalog, loot_service
+from app.services.auth_service import award_xp
+from app.services.item_service import increment_inventory
+from app.services.loot_store import store
+
+
+def _drop(owner_id, item=None, xp=30):
+    now = loot_service.get_current_cet()
+    return store.add(owner_id=owner_id, latitude=48.1, longitude=11.5, xp=xp,
+                     expires_at=now + timedelta(minutes=10), now=now,
+                     item_id=item.id if item else None, item_name=item.name if item else None)
+
+
+def _gem(test_db):
+    gem = Item(name="Gem", item_type="collectible", rarity="rare")
+    test_db.add(gem)
+    test_db.commit()
+    item_catalog.invalidate()
+    item_catalog.get(test_db)
+    return gem
+
+
+def test_collect_is_one_short_transaction(test_engine, test_db, test_user):
+    user_id = test_user.id
+    gem = _gem(test_db)
+    drop = _drop(user_id, gem)
+    statements = []
+
+    def capture(conn, cursor, statement, parameters, context, executemany):
+        statements.append(" ".join(statement.split()).upper())
+
+    event.listen(test_engine, "before_cursor_execute", capture)
+    try:
+        result = loot_service.collect_loot(test_db, user_id, drop.id, 48.1, 11.5)
+    finally:
+        event.remove(test_engine, "before_cursor_execute", capture)
+
+    assert result["success"] and result["total_xp"] == 30
+    writes = [s for s in statements if not s.startswith("SELECT")]
+    assert len(writes) == 2
+    assert writes[0].startswith("UPDATE USERS") and "RETURNING" in writes[0]
+    assert writes[1].startswith("INSERT INTO INVENTORY") and "ON CONFLICT" in writes[1]
+    assert not any("FROM USERS" in s or "FROM INVENTORY" in s for s in statements)
+
+
+def test_collected_items_stack(test_db, test_user):
+    user_id = test_user.id
+    gem = _gem(test_db)
+    for _ in range(3):
+        drop = _drop(user_id, gem)
+        assert loot_service.collect_loot(test_db, user_id, drop.id, 48.1, 11.5)["success"]
+
+    stacks = test_db.query(InventoryItem).filter(InventoryItem.user_id == user_id).all()
+    assert [(stack.item_id, stack.quantity) for stack in stacks] == [(gem.id, 3)]
+
+
+def test_award_xp_levels_up_once(test_db, test_user):
+    user_id = test_user.id
+    xp, level, level_up = award_xp(test_db, user_id, 10_000)
+    test_db.commit()
+    assert xp == 10_000 and level > 1 and level_up
+    assert award_xp(test_db, user_id, 0) == (10_000, level, False)
+    assert test_db.get(User, user_id).level == level
+    assert award_xp(test_db, 999_999, 10) is None
+
+
+def test_missing_user_keeps_the_drop(test_db, test_user):
+    drop = _drop(999_999)
+    result = loot_service.collect_loot(test_db, 999_999, drop.id, 48.1, 11.5)
+    assert result == {"success": False, "error": "User not found"}
+    assert store.get(drop.id) == drop
+
+    increment_inventory(test_db, test_user.id, _gem(test_db).id, quantity=2)
+    test_db.commit()
+    assert test_db.query(InventoryItem).one().quantity == 2
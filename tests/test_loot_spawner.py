@@ -0,0 +1,75 @@
+"""
+Tests for server-driven loot spawning
+"""
+import time
+from datetime import datetime
+
+import pytest
+
+from app.config import settings
+from app.models import GameSetting
+from app.services import loot_service, loot_spawner
+from app.services.loot_service import MAX_ACTIVE_LOOT
+from app.services.loot_spawner import LootSpawner
+from app.services.loot_store import store
+
+NOW = datetime(2024, 5, 1, 12, 0, 0)
+
+
+@pytest.fixture
+def pushed(monkeypatch):
+    drops = []
+    monkeypatch.setattr(loot_service, "notify_loot_spawn", drops.append)
+    return drops
+
+
+def test_attempts_are_spread_over_the_interval(monkeypatch):
+    monkeypatch.setattr(settings, "LOOT_SPAWN_INTERVAL", 100.0)
+    spawner = LootSpawner()
+    positions = {user_id: (48.1, 11.5, 0.0) for user_id in range(1, 201)}
+
+    assert spawner.due_players(positions, 0.0, limit=1000) == []  # First sighting only assigns a phase
+    due_per_tick = [len(spawner.due_players(positions, float(t), limit=1000)) for t in range(10, 101, 10)]
+    assert sum(due_per_tick) == 200
+    assert max(due_per_tick) < 50  # Roughly 20 per tick, never everyone at once
+
+    # Players that disconnected are forgotten
+    assert spawner.due_players({}, 200.0, limit=1000) == []
+    assert spawner._next_attempt == {}
+
+
+def test_stale_positions_do_not_spawn(monkeypatch):
+    spawner = LootSpawner()
+    spawner._next_attempt = {1: 0.0, 2: 0.0}
+    positions = {1: (48.1, 11.5, 990.0), 2: (48.1, 11.5, 10.0)}
+    assert spawner.due_players(positions, 1000.0, limit=10) == [(1, 48.1, 11.5)]
+
+
+def test_tick_uses_game_settings_and_max_active(test_db, pushed):
+    test_db.add_all([
+        GameSetting(setting_name="loot_spawn_rate", setting_value="1.0", data_type="float"),
+        GameSetting(setting_name="loot_spawn_radius_min", setting_value="60", data_type="int"),
+        GameSetting(setting_name="loot_spawn_radius_max", setting_value="70", data_type="int"),
+    ])
+    test_db.commit()
+    assert loot_spawner.spawn_settings(test_db) == (1.0, 60.0, 70.0)
+
+    spawner = LootSpawner()
+    positions = {7: (48.1, 11.5, time.monotonic())}
+    for _ in range(MAX_ACTIVE_LOOT + 2):
+        spawner._next_attempt[7] = 0.0
+        spawner.tick(test_db, NOW, limit=10, positions=positions)
+
+    drops = store.active_for(7, NOW)
+    assert len(drops) == MAX_ACTIVE_LOOT == len(pushed)
+    for distance in (d for _, d in store.within(48.1, 11.5, 1000, NOW)):
+        assert 59 < distance < 71
+
+
+def test_zero_spawn_rate_spawns_nothing(test_db, pushed):
+    test_db.add(GameSetting(setting_name="loot_spawn_rate", setting_value="0", data_type="float"))
+    test_db.commit()
+    spawner = LootSpawner()
+    spawner._next_attempt[7] = 0.0
+    assert spawner.tick(test_db, NOW, limit=10, positions={7: (48.1, 11.5, time.monotonic())}) == 1
+    assert pushed == [] and len(store) == 0
@@ -0,0 +1,101 @@
+"""
+Tests for the in-memory loot store and the loot endpoints on top of it
+"""
+import threading
+from datetime import datetime, timedelta
+
+from app.models import InventoryItem, Item, Spot
+from app.services import geo_service, item_catalog, loot_service, loot_store
+from app.services.loot_store import LootStore
+
+NOW = datetime(2024, 5, 1, 12, 0, 0)
+
+
+def _add(store, owner_id=1, lat=48.1, lon=11.5, minutes=10, xp=20):
+    return store.add(owner_id=owner_id, latitude=lat, longitude=lon, xp=xp,
+                     expires_at=NOW + timedelta(minutes=minutes), now=NOW)
+
+
+def test_drops_expire_in_heap_order():
+    store = LootStore()
+    short = _add(store, minutes=5)
+    long = _add(store, minutes=15)
+    assert short.id < 0 and long.id < 0 and short.id != long.id
+
+    assert store.expire(NOW + timedelta(minutes=6)) == [short]
+    assert store.active_for(1, NOW + timedelta(minutes=6)) == [long]
+    assert store.active_for(1, NOW + timedelta(minutes=16)) == []
+    assert len(store) == 0
+
+
+def test_within_uses_owner_grids():
+    store = LootStore()
+    near = _add(store, owner_id=1, lat=48.1005)        # ~55m
+    other = _add(store, owner_id=2, lat=48.0995)       # ~55m, other player
+    _add(store, owner_id=1, lat=48.2)                  # ~11km
+
+    hits = store.within(48.1, 11.5, 100, NOW)
+    assert sorted(drop.id for drop, _ in hits) == sorted([near.id, other.id])
+    assert [drop.id for drop, _ in store.within(48.1, 11.5, 100, NOW, owner_id=2)] == [other.id]
+    assert store.within(48.1, 11.5, 100, NOW + timedelta(minutes=11)) == []
+
+
+def test_claim_is_won_by_exactly_one_collector():
+    store = LootStore()
+    drop = _add(store)
+    winners = []
+    barrier = threading.Barrier(8)
+
+    def collect():
+        barrier.wait()
+        if store.claim(drop.id, NOW):
+            winners.append(threading.get_ident())
+
+    threads = [threading.Thread(target=collect) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert len(winners) == 1
+
+    store.restore(drop)
+    assert store.claim(drop.id, NOW) == drop
+    assert store.claim(drop.id, NOW) is None
+
+
+def test_snapshot_round_trip(tmp_path, monkeypatch):
+    monkeypatch.setattr(loot_store, "store", LootStore())
+    kept = _add(loot_store.store, minutes=10)
+    _add(loot_store.store, minutes=1)
+    path = str(tmp_path / "loot.json")
+    loot_store.save_snapshot(path)
+    assert not loot_store.store.dirty
+
+    monkeypatch.setattr(loot_store, "store", LootStore())
+    assert loot_store.load_snapshot(path, NOW + timedelta(minutes=2)) == 1
+    assert loot_store.store.get(kept.id) == kept
+    assert _add(loot_store.store).id < kept.id  # New ids don't reuse restored ones
+
+
+def test_spawn_collect_without_spots_table(client, auth_headers, test_db, test_user, monkeypatch):
+    test_db.add(Item(name="XP Boost", item_type="consumable", rarity="common", xp_boost=0.5))
+    test_db.commit()
+    item_catalog.invalidate()
+    monkeypatch.setattr("app.services.loot_service.random.random", lambda: 0.0)  # Always roll an item
+
+    drop = loot_service.spawn_loot(test_db, test_user.id, 48.1, 11.5, 20, 150)
+    assert drop.id < 0 and 19 < geo_service.haversine_m(48.1, 11.5, drop.latitude, drop.longitude) < 151
+
+    active = client.get("/api/loot/active", headers=auth_headers).json()
+    assert [(spot["id"], spot["is_loot"]) for spot in active] == [(drop.id, True)]
+    nearby = client.get("/api/spots/nearby?latitude=48.1&longitude=11.5&radius=500", headers=auth_headers).json()
+    assert drop.id in [spot["id"] for spot in nearby]
+
+    body = {"loot_spot_id": drop.id, "latitude": drop.latitude, "longitude": drop.longitude}
+    response = client.post("/api/loot/collect", json=body, headers=auth_headers)
+    assert response.status_code == 200
+    assert response.json()["rewards"]["items"][0]["name"] == "XP Boost"
+    assert test_db.query(InventoryItem).count() == 1
+
+    assert client.post("/api/loot/collect", json=body, headers=auth_headers).status_code == 400
+    assert test_db.query(Spot).count() == 0
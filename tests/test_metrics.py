@@ -0,0 +1,61 @@
+"""
+Tests for the Prometheus metrics endpoint and the sharded counters
+"""
+import threading
+
+from app.config import settings
+from app.services import loot_service, metrics
+from app.services.metrics import Counter, Histogram
+
+
+def test_counters_sum_per_thread_shards():
+    counter = Counter("test_total", "Test counter", ("kind",))
+    histogram = Histogram("test_seconds", "Test histogram", ("route",), buckets=(0.1, 1.0))
+
+    def work():
+        for _ in range(1000):
+            counter.inc("a")
+            histogram.observe(0.5, "/x")
+
+    threads = [threading.Thread(target=work) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    counter.inc("b", amount=2)
+
+    assert counter.values() == {("a",): 4000, ("b",): 2}
+    lines = histogram.render()
+    assert 'test_seconds_bucket{route="/x",le="0.1"} 0' in lines
+    assert 'test_seconds_bucket{route="/x",le="1"} 4000' in lines
+    assert 'test_seconds_bucket{route="/x",le="+Inf"} 4000' in lines
+    assert 'test_seconds_count{route="/x"} 4000' in lines
+
+
+def test_metrics_endpoint(client, auth_headers, test_user):
+    client.get(f"/api/logs/spot/{test_user.id}", headers=auth_headers)
+    body = client.get("/metrics").text
+
+    assert 'claim_http_request_duration_seconds_count{method="GET",route="/api/logs/spot/{spot_id}"}' in body
+    assert 'claim_http_requests_total{method="GET",route="/api/logs/spot/{spot_id}",status="200"}' in body
+    assert "claim_ws_connections 0" in body
+    assert 'claim_user_cache_lookups_total{result="hit"}' in body
+    assert "# TYPE claim_db_pool_connections gauge" in body
+
+
+def test_metrics_token(client, monkeypatch):
+    monkeypatch.setattr(settings, "METRICS_TOKEN", "scrape-secret")
+    assert client.get("/metrics").status_code == 401
+    response = client.get("/metrics", headers={"Authorization": "Bearer scrape-secret"})
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/plain; version=0.0.4")
+
+
+def test_game_events_are_counted(test_db, test_user):
+    before = metrics.loot_events.values().get(("spawned",), 0)
+    assert loot_service.spawn_loot(test_db, test_user.id, 48.1, 11.5, 20, 50) is not None
+    assert metrics.loot_events.values()[("spawned",)] == before + 1
+
+
+def test_health_reports_open_sockets(client):
+    assert client.get("/api/health").json()["active_connections"] == 0
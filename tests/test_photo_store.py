@@ -0,0 +1,206 @@
+"""
+Tests for the content-addressed photo store
+"""
+import asyncio
+import hashlib
+import os
+
+import pytest
+from starlette.requests import Request
+
+import migrate_photos
+from app.config import settings
+from app.models import Log, Spot
+from app.services import photo_store
+
+JPEG = b"\xff\xd8\xff\xe0" + b"photo" * 100
+
+
+@pytest.fixture
+def photo_dir(tmp_path, monkeypatch):
+    monkeypatch.setattr(settings, "PHOTO_STORAGE_DIR", str(tmp_path / "photos"))
+    return tmp_path / "photos"
+
+
+@pytest.fixture
+def spot(test_db):
+    spot = Spot(name="Fountain", location="POINT(11.5 48.1)", is_permanent=True, is_loot=False)
+    test_db.add(spot)
+    test_db.commit()
+    return spot
+
+
+def _log(db, user, spot, **photo):
+    log = Log(user_id=user.id, spot_id=spot.id, location="POINT(11.5 48.1)", **photo)
+    db.add(log)
+    db.commit()
+    return log
+
+
+def test_put_bytes_is_content_addressed(photo_dir):
+    sha256, size = photo_store.put_bytes(JPEG)
+    assert sha256 == hashlib.sha256(JPEG).hexdigest()
+    assert size == len(JPEG)
+
+    path = photo_store.path_for(sha256)
+    assert path == str(photo_dir / sha256[:2] / sha256[2:4] / sha256)
+    with open(path, "rb") as f:
+        assert f.read() == JPEG
+
+    # Same content: same file, no temp files left behind
+    assert photo_store.put_bytes(JPEG) == (sha256, size)
+    assert [name for name in os.listdir(photo_dir) if name.startswith(".upload-")] == []
+
+
+def test_path_for_rejects_non_digests(photo_dir):
+    with pytest.raises(ValueError):
+        photo_store.path_for("../../etc/passwd")
+    assert photo_store.open_path("../secret") is None
+
+
+def test_photo_endpoint_serves_file_with_etag(client, test_db, test_user, spot, photo_dir):
+    sha256, size = photo_store.put_bytes(JPEG)
+    log = _log(test_db, test_user, spot, photo_sha256=sha256, photo_size=size, photo_mime="image/jpeg")
+
+    response = client.get(f"/api/logs/{log.id}/photo")
+    assert response.status_code == 200
+    assert response.content == JPEG
+    assert response.headers["etag"] == f'"{sha256}"'
+    assert "immutable" in response.headers["cache-control"]
+
+    cached = client.get(f"/api/logs/{log.id}/photo", headers={"If-None-Match": f'"{sha256}"'})
+    assert cached.status_code == 304
+    assert cached.content == b""
+
+
+def test_photo_endpoint_legacy_blob_and_missing(client, test_db, test_user, spot, photo_dir):
+    legacy = _log(test_db, test_user, spot, photo_data=JPEG, photo_mime="image/png")
+    no_photo = _log(test_db, test_user, spot)
+
+    response = client.get(f"/api/logs/{legacy.id}/photo")
+    assert response.status_code == 200
+    assert response.content == JPEG
+    assert response.headers["content-type"] == "image/png"
+
+    assert client.get(f"/api/logs/{no_photo.id}/photo").status_code == 404
+    assert client.get("/api/logs/999999/photo").status_code == 404
+
+
+def test_has_photo_is_computed_in_sql(test_db, test_user, spot, photo_dir):
+    sha256, size = photo_store.put_bytes(JPEG)
+    stored = _log(test_db, test_user, spot, photo_sha256=sha256, photo_size=size)
+    legacy = _log(test_db, test_user, spot, photo_data=JPEG)
+    plain = _log(test_db, test_user, spot)
+    test_db.expire_all()
+
+    flags = {log.id: bool(log.has_photo) for log in test_db.query(Log)}
+    assert flags == {stored.id: True, legacy.id: True, plain.id: False}
+
+
+def test_migration_moves_blobs(test_engine, test_db, test_user, spot, photo_dir, monkeypatch):
+    legacy = _log(test_db, test_user, spot, photo_data=JPEG, photo_mime="image/jpeg")
+    monkeypatch.setattr(migrate_photos, "engine", test_engine)
+
+    assert migrate_photos.move_blobs() == 1
+    assert migrate_photos.move_blobs() == 0  # Idempotent
+
+    test_db.expire_all()
+    log = test_db.query(Log).get(legacy.id)
+    assert log.photo_sha256 == hashlib.sha256(JPEG).hexdigest()
+    assert log.photo_size == len(JPEG)
+    assert log.photo_data is None
+    assert photo_store.open_path(log.photo_sha256) is not None
+
+
+def test_raw_upload_then_log_references_token(client, auth_headers, test_db, test_user, photo_dir):
+    response = client.post(
+        "/api/logs/upload",
+        content=JPEG,
+        headers={**auth_headers, "Content-Type": "image/jpeg"},
+    )
+    assert response.status_code == 200
+    body = response.json()
+    assert body["size"] == len(JPEG)
+    assert "photo_data" not in body
+    token = body["upload_token"]
+
+    # Only the uploader can claim it, and only once
+    assert photo_store.claim_upload(token, test_user.id + 1) is None
+    assert photo_store.claim_upload(token, test_user.id) == (
+        hashlib.sha256(JPEG).hexdigest(), len(JPEG), "image/jpeg"
+    )
+    assert photo_store.claim_upload(token, test_user.id) is None
+
+
+def test_multipart_upload(client, auth_headers, test_user, photo_dir):
+    response = client.post(
+        "/api/logs/upload",
+        files={"file": ("photo.png", JPEG, "image/png")},
+        headers=auth_headers,
+    )
+    assert response.status_code == 200
+    sha256, size, mime = photo_store.claim_upload(response.json()["upload_token"], test_user.id)
+    assert (size, mime) == (len(JPEG), "image/png")
+    assert photo_store.open_path(sha256) is not None
+
+
+def test_multipart_upload_streams_without_spooling(client, auth_headers, photo_dir, monkeypatch):
+    async def no_form(self, **kwargs):
+        raise AssertionError("multipart body was spooled by request.form()")
+
+    monkeypatch.setattr(Request, "form", no_form)
+    response = client.post(
+        "/api/logs/upload",
+        data={"note": "before the file"},
+        files={"file": ("photo.jpg", JPEG, "image/jpeg")},
+        headers=auth_headers,
+    )
+    assert response.status_code == 200
+    assert response.json()["size"] == len(JPEG)
+
+    monkeypatch.setattr(photo_store, "MAX_PHOTO_BYTES", 100)
+    response = client.post(
+        "/api/logs/upload", files={"file": ("photo.jpg", JPEG, "image/jpeg")}, headers=auth_headers
+    )
+    assert response.status_code == 413
+
+    response = client.post(
+        "/api/logs/upload", files={"other": ("photo.jpg", JPEG, "image/jpeg")}, headers=auth_headers
+    )
+    assert response.status_code == 400
+
+
+def test_upload_rejects_non_images_and_oversize(client, auth_headers, photo_dir, monkeypatch):
+    response = client.post(
+        "/api/logs/upload", content=b"hello", headers={**auth_headers, "Content-Type": "text/plain"}
+    )
+    assert response.status_code == 400
+
+    monkeypatch.setattr(photo_store, "MAX_PHOTO_BYTES", 100)
+    response = client.post(
+        "/api/logs/upload", content=JPEG, headers={**auth_headers, "Content-Type": "image/jpeg"}
+    )
+    assert response.status_code == 413
+    # Partial upload was removed
+    assert os.listdir(photo_store.uploads_dir()) == []
+
+
+def test_unclaimed_uploads_are_swept_by_the_scheduler(photo_dir):
+    from app.services import scheduler
+
+    os.makedirs(photo_store.uploads_dir())
+    stale = os.path.join(photo_store.uploads_dir(), "stale-upload")
+    with open(stale, "wb") as f:
+        f.write(JPEG)
+    os.utime(stale, (0, 0))
+
+    async def chunks():
+        yield JPEG
+
+    info = asyncio.run(photo_store.save_upload(chunks(), 1, "image/jpeg"))
+    # Uploading does not scan the directory any more
+    assert os.path.exists(stale)
+
+    assert scheduler._expire_uploads(None, None, 100) == 1
+    assert not os.path.exists(stale)
+    assert photo_store.claim_upload(info["upload_token"], 1) is not None
@@ -0,0 +1,95 @@
+"""
+Tests for thumbnail/display photo variants
+"""
+import io
+
+import pytest
+
+from app.config import settings
+from app.models import Log, Spot
+from app.services import photo_store, photo_variants
+
+Image = pytest.importorskip("PIL.Image")
+
+
+@pytest.fixture
+def photo_dir(tmp_path, monkeypatch):
+    monkeypatch.setattr(settings, "PHOTO_STORAGE_DIR", str(tmp_path / "photos"))
+    monkeypatch.setattr(settings, "IMAGE_WORKERS", 0)
+    return tmp_path / "photos"
+
+
+def _jpeg(width, height, orientation=None):
+    buffer = io.BytesIO()
+    image = Image.new("RGB", (width, height), (200, 40, 40))
+    exif = Image.Exif()
+    if orientation:
+        exif[0x0112] = orientation
+    image.save(buffer, "JPEG", exif=exif)
+    return buffer.getvalue()
+
+
+def _photo_log(db, user, data):
+    spot = Spot(name="Fountain", location="POINT(11.5 48.1)", is_permanent=True, is_loot=False)
+    db.add(spot)
+    db.commit()
+    sha256, size = photo_store.put_bytes(data)
+    log = Log(user_id=user.id, spot_id=spot.id, location="POINT(11.5 48.1)",
+              photo_sha256=sha256, photo_size=size, photo_mime="image/jpeg")
+    db.add(log)
+    db.commit()
+    return log
+
+
+def test_render_variants_caps_size_and_applies_exif_rotation(photo_dir):
+    # Orientation 6: stored landscape, displayed portrait
+    sha256, _ = photo_store.put_bytes(_jpeg(3000, 2000, orientation=6))
+
+    written = photo_variants.render_variants(photo_store.path_for(sha256))
+    assert set(written) == {"thumb", "display"}
+    assert photo_variants.render_variants(photo_store.path_for(sha256)) == {}  # Already rendered
+
+    for variant, (edge, _) in photo_variants.VARIANTS.items():
+        path, _ = photo_variants.variant_path(sha256, variant)
+        with Image.open(path) as image:
+            assert max(image.size) == edge
+            assert image.size[1] > image.size[0]
+
+
+def test_photo_endpoint_serves_variant(client, test_db, test_user, photo_dir):
+    original = _jpeg(2000, 1500)
+    log = _photo_log(test_db, test_user, original)
+
+    response = client.get(f"/api/logs/{log.id}/photo?size=thumb")
+    assert response.status_code == 200
+    assert response.headers["etag"] == f'"{log.photo_sha256}-thumb"'
+    assert len(response.content) < len(original)
+    with Image.open(io.BytesIO(response.content)) as image:
+        assert max(image.size) == 320
+
+    cached = client.get(
+        f"/api/logs/{log.id}/photo?size=thumb",
+        headers={"If-None-Match": f'"{log.photo_sha256}-thumb"'},
+    )
+    assert cached.status_code == 304
+
+    assert client.get(f"/api/logs/{log.id}/photo").content == original
+    assert client.get(f"/api/logs/{log.id}/photo?size=huge").status_code == 400
+
+
+def test_undecodable_photo_falls_back_to_original(client, test_db, test_user, photo_dir):
+    log = _photo_log(test_db, test_user, b"\xff\xd8\xff\xe0 not really a jpeg")
+
+    response = client.get(f"/api/logs/{log.id}/photo?size=display")
+    assert response.status_code == 200
+    assert response.headers["etag"] == f'"{log.photo_sha256}"'
+
+
+def test_process_pool_renders_variants(photo_dir, monkeypatch):
+    monkeypatch.setattr(settings, "IMAGE_WORKERS", 1)
+    sha256, _ = photo_store.put_bytes(_jpeg(800, 600))
+    try:
+        written = photo_variants._submit(sha256).result(timeout=60)
+    finally:
+        photo_variants.shutdown()
+    assert set(written) == {"thumb", "display"}
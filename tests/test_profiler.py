@@ -0,0 +1,99 @@
+"""
+Tests for the on-demand sampling profiler
+"""
+import threading
+import time
+
+import pytest
+
+from app.services import profiler
+
+
+def _spin_until(stop: threading.Event):
+    while not stop.is_set():
+        sum(range(1000))
+
+
+def _profile_spinning_thread(seconds: float = 0.2) -> profiler.Profile:
+    stop = threading.Event()
+    worker = threading.Thread(target=_spin_until, args=(stop,), name="spinner")
+    worker.start()
+    sampler = profiler.start("test", interval_ms=2)
+    try:
+        time.sleep(seconds)
+    finally:
+        profile = profiler.stop(sampler)
+        stop.set()
+        worker.join()
+    return profile
+
+
+def test_collapsed_and_speedscope_output():
+    profile = _profile_spinning_thread()
+
+    assert profile.samples > 0
+    spinner = [line for line in profile.collapsed().splitlines() if line.startswith("thread:spinner;")]
+    assert spinner
+    assert any("_spin_until (tests/test_profiler.py:" in line for line in spinner)
+    assert int(spinner[0].rsplit(" ", 1)[1]) > 0
+    # The sampler does not profile itself
+    assert "thread:profiler" not in profile.collapsed()
+
+    document = profile.speedscope()
+    frames = document["shared"]["frames"]
+    sampled = document["profiles"][0]
+    assert sampled["type"] == "sampled"
+    assert len(sampled["samples"]) == len(sampled["weights"])
+    assert all(0 <= index < len(frames) for sample in sampled["samples"] for index in sample)
+    assert any(frame["name"] == "_spin_until" for frame in frames)
+
+
+def test_only_one_profile_at_a_time():
+    sampler = profiler.start("first")
+    try:
+        with pytest.raises(profiler.ProfilerBusy):
+            profiler.start("second")
+    finally:
+        profiler.stop(sampler)
+    profiler.stop(profiler.start("third"))
+
+
+def test_profile_endpoint(client, admin_headers, auth_headers):
+    response = client.post("/api/admin/profile?seconds=0.05&interval_ms=5", headers=admin_headers)
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/plain")
+    assert "collapsed.txt" in response.headers["content-disposition"]
+    assert all(line.rsplit(" ", 1)[1].isdigit() for line in response.text.splitlines())
+
+    response = client.post("/api/admin/profile?seconds=0.05&format=speedscope", headers=admin_headers)
+    assert response.status_code == 200
+    assert response.json()["profiles"][0]["unit"] == "seconds"
+
+    assert client.post("/api/admin/profile?seconds=0.05&format=pprof", headers=admin_headers).status_code == 400
+    assert client.post("/api/admin/profile?seconds=0.05", headers=auth_headers).status_code == 403
+
+    sampler = profiler.start("busy")
+    try:
+        assert client.post("/api/admin/profile?seconds=0.05", headers=admin_headers).status_code == 409
+    finally:
+        profiler.stop(sampler)
+
+
+def test_profile_header_on_admin_requests_only(client, admin_headers, auth_headers):
+    # Warm the principal cache: the middleware runs before the route's own get_db override
+    client.get("/api/admin/queries", headers=admin_headers)
+    client.get("/api/auth/me", headers=auth_headers)
+
+    response = client.get("/api/admin/queries", headers={**admin_headers, "X-Profile": "1"})
+    assert response.status_code == 200
+    profile_id = response.headers["X-Profile-Id"]
+
+    stored = client.get(f"/api/admin/profiles/{profile_id}?format=speedscope", headers=admin_headers)
+    assert stored.status_code == 200
+    assert stored.json()["name"] == "GET /api/admin/queries"
+    assert client.get(f"/api/admin/profiles/{profile_id}", headers=auth_headers).status_code == 403
+    assert client.get("/api/admin/profiles/missing", headers=admin_headers).status_code == 404
+
+    response = client.get("/api/auth/me", headers={**auth_headers, "X-Profile": "1"})
+    assert response.status_code == 200
+    assert "X-Profile-Id" not in response.headers
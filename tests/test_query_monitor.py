@@ -0,0 +1,69 @@
+"""
+Tests for per-request query instrumentation and the query budget fixture
+"""
+from app.models import Spot
+from app.services import query_monitor
+from app.services.query_monitor import QueryReport, RequestQueries
+
+
+def _spots(test_db, creators):
+    for i, creator in enumerate(creators):
+        test_db.add(Spot(name=f"Spot {i}", location=f"POINT(11.5{i} 48.1)", is_permanent=True,
+                         is_loot=False, creator_id=creator.id))
+    test_db.commit()
+
+
+def test_fingerprints_collapse_in_lists():
+    a = query_monitor.fingerprint("SELECT * FROM spots\n WHERE id IN (?, ?, ?)")
+    b = query_monitor.fingerprint("SELECT * FROM spots WHERE id IN (?, ?)")
+    assert a == b == "SELECT * FROM spots WHERE id IN (?)"
+
+
+def test_repeated_statements_are_reported():
+    queries = RequestQueries()
+    for _ in range(6):
+        queries.record("SELECT users.username FROM users WHERE users.id = ?", 0.5)
+    queries.record("SELECT spots.id FROM spots", 1.0)
+
+    report = QueryReport()
+    report.add("GET /api/admin/spots", queries)
+    snapshot = report.snapshot()
+    assert snapshot["routes"][0]["n_plus_one"] == 1 and snapshot["routes"][0]["max_queries"] == 7
+    assert snapshot["recent_n_plus_one"][0]["repeated"][0]["count"] == 6
+    assert queries.server_timing() == 'db;dur=4.0;desc="7 queries"'
+
+
+def test_responses_carry_server_timing(client, auth_headers):
+    response = client.get("/api/logs/me", headers=auth_headers)
+    assert response.status_code == 200
+    assert response.headers["Server-Timing"].startswith("db;dur=")
+
+
+def test_admin_spot_list_loads_creators_in_one_query(client, admin_headers, test_db, test_user, test_admin, query_budget):
+    _spots(test_db, [test_user, test_admin, test_user, test_admin, test_user, test_admin])
+    client.get("/api/admin/spots", headers=admin_headers)  # Principal cached
+
+    with query_budget(2):
+        response = client.get("/api/admin/spots", headers=admin_headers)
+    assert response.status_code == 200
+    assert {spot["creator"] for spot in response.json()["spots"]} == {"testuser", "admin"}
+
+
+def test_hot_endpoints_stay_within_budget(client, auth_headers, test_db, test_user, query_budget):
+    _spots(test_db, [test_user] * 3)
+    nearby = "/api/spots/nearby?latitude=48.1&longitude=11.5&radius=5000"
+    client.get(nearby, headers=auth_headers)  # Principal cached, spot index loaded
+
+    with query_budget(0):
+        client.get("/api/loot/active", headers=auth_headers)
+    with query_budget(3):
+        client.get(nearby, headers=auth_headers)
+    with query_budget(2):
+        client.get("/api/logs/me", headers=auth_headers)
+
+
+def test_query_report_is_admin_only(client, auth_headers, admin_headers):
+    assert client.get("/api/admin/queries", headers=auth_headers).status_code == 403
+    response = client.get("/api/admin/queries?reset=true", headers=admin_headers)
+    assert response.status_code == 200
+    assert "routes" in response.json()
@@ -0,0 +1,137 @@
+"""
+Tests for the background scheduler and its batched sweeps
+"""
+import asyncio
+from contextlib import contextmanager
+from datetime import datetime, timedelta
+
+import pytest
+from sqlalchemy import event
+
+from app.config import settings
+from app.models import Claim, Spot, Track, TrackPoint, UserBuff
+from app.services import buff_service, scheduler
+from app.services.scheduler import Scheduler
+
+NOW = datetime(2024, 5, 1, 12, 0, 0)
+
+
+@pytest.fixture
+def sweeper(test_db, monkeypatch):
+    """A scheduler whose jobs run against the test database with batches of 2"""
+    @contextmanager
+    def test_session():
+        yield test_db
+        test_db.commit()
+
+    monkeypatch.setattr(scheduler, "session_scope", test_session)
+    monkeypatch.setattr(settings, "SCHEDULER_BATCH_SIZE", 2)
+    return Scheduler()
+
+
+def test_buff_sweep_runs_in_batches(sweeper, test_db, test_user):
+    for minutes in (-5, -4, -3, -2, -1, 30):
+        test_db.add(UserBuff(user_id=test_user.id, xp_multiplier=1.5, expires_at=NOW + timedelta(minutes=minutes)))
+    test_db.commit()
+
+    sweeper.add_job("buff_expiry", 60, scheduler._expire_buffs)
+    assert sweeper.run_job(sweeper.jobs["buff_expiry"], now=NOW) == 5
+    assert test_db.query(UserBuff).count() == 1
+    assert sweeper.stats()["jobs"][0]["runs"] == 1
+
+
+def test_active_modifiers_do_not_delete(test_engine, test_db, test_user):
+    test_db.add(UserBuff(user_id=test_user.id, xp_multiplier=2.0, expires_at=datetime(2000, 1, 1)))
+    test_db.commit()
+    statements = []
+
+    def capture(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+
+    event.listen(test_engine, "before_cursor_execute", capture)
+    try:
+        assert buff_service.get_active_modifiers(test_db, test_user.id).xp_multiplier == 1.0
+    finally:
+        event.remove(test_engine, "before_cursor_execute", capture)
+    assert not any(statement.lstrip().upper().startswith("DELETE") for statement in statements)
+
+
+def test_claim_decay_is_set_based(sweeper, test_db, test_user):
+    spot = Spot(name="Fountain", location="POINT(11.5 48.1)", is_permanent=True, is_loot=False)
+    test_db.add(spot)
+    test_db.commit()
+    decayed = Claim(user_id=test_user.id, spot_id=spot.id, claim_value=1.0, dominance=1.0,
+                    last_decay=NOW - timedelta(hours=10))
+    emptied = Claim(user_id=test_user.id, spot_id=spot.id, claim_value=0.05, dominance=0.0,
+                    last_decay=NOW - timedelta(hours=10))
+    test_db.add_all([decayed, emptied])
+    test_db.commit()
+
+    sweeper.add_job("claim_decay", 60, scheduler._decay_claims)
+    assert sweeper.run_job(sweeper.jobs["claim_decay"], now=NOW) == 2
+    test_db.expire_all()
+    assert decayed.claim_value == pytest.approx(1.0 - 10 * settings.CLAIM_DECAY_RATE)
+    assert decayed.dominance == pytest.approx(1.0 - 10 * settings.CLAIM_DECAY_RATE * 0.1)
+    assert emptied.claim_value == 0.0
+    assert decayed.last_decay == NOW
+
+    # Already decayed up to NOW: nothing to do
+    assert sweeper.run_job(sweeper.jobs["claim_decay"], now=NOW) == 0
+
+
+def test_stale_tracks_end_at_their_last_point(sweeper, test_db, test_user, monkeypatch):
+    monkeypatch.setattr(settings, "TRACK_STALE_MINUTES", 60)
+    stale = Track(user_id=test_user.id, is_active=True, started_at=NOW - timedelta(hours=5))
+    fresh = Track(user_id=test_user.id, is_active=True, started_at=NOW - timedelta(hours=5))
+    test_db.add_all([stale, fresh])
+    test_db.commit()
+    test_db.add_all([
+        TrackPoint(track_id=stale.id, location="POINT(11.5 48.1)", timestamp=NOW - timedelta(hours=3)),
+        TrackPoint(track_id=fresh.id, location="POINT(11.5 48.1)", timestamp=NOW - timedelta(minutes=5)),
+    ])
+    test_db.commit()
+
+    sweeper.add_job("stale_tracks", 60, scheduler._close_stale_tracks)
+    assert sweeper.run_job(sweeper.jobs["stale_tracks"], now=NOW) == 1
+    test_db.expire_all()
+    assert stale.is_active is False and fresh.is_active is True
+    assert stale.ended_at == NOW - timedelta(hours=3)
+    assert stale.duration_minutes == 120
+
+
+def test_followers_skip_leader_jobs(monkeypatch):
+    sweeper = Scheduler()
+    ran = []
+    sweeper.add_job("memory", 0, lambda db, now, batch: ran.append("memory") or 0, uses_db=False, leader_only=False)
+    sweeper.add_job("database", 0, lambda db, now, batch: ran.append("database") or 0, uses_db=False)
+    monkeypatch.setattr(sweeper.leader, "acquire", lambda: False)
+
+    asyncio.run(sweeper.tick())
+    assert ran == ["memory"]
+    assert sweeper.jobs["database"].skipped == 1
+
+
+def test_leader_ping_does_not_leave_a_transaction_open(monkeypatch):
+    class Connection:
+        def __init__(self):
+            self.in_transaction = False
+
+        def execute(self, statement, parameters=None):
+            self.in_transaction = True  # SQLAlchemy 2.0 autobegin
+
+        def commit(self):
+            self.in_transaction = False
+
+    lock = scheduler.LeaderLock()
+    lock._connection = Connection()
+    monkeypatch.setattr(settings, "DATABASE_URL", "postgresql://claim@localhost/claim")
+
+    assert lock.acquire() is True
+    assert lock._connection.in_transaction is False
+
+
+def test_admin_scheduler_stats(client, admin_headers, auth_headers):
+    assert client.get("/api/admin/scheduler", headers=auth_headers).status_code == 403
+    response = client.get("/api/admin/scheduler", headers=admin_headers)
+    assert response.status_code == 200
+    assert {job["name"] for job in response.json()["jobs"]} >= {"loot_expiry", "buff_expiry", "stale_tracks"}
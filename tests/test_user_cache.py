@@ -0,0 +1,68 @@
+"""
+Tests for the cached authentication principals
+"""
+import time
+
+from sqlalchemy import event
+
+from app.config import settings
+from app.models import User
+from app.services import user_cache
+from app.services.user_cache import PrincipalCache
+
+
+def _user_queries(test_engine, fn):
+    statements = []
+
+    def capture(conn, cursor, statement, parameters, context, executemany):
+        if "FROM users" in statement:
+            statements.append(statement)
+
+    event.listen(test_engine, "before_cursor_execute", capture)
+    try:
+        fn()
+    finally:
+        event.remove(test_engine, "before_cursor_execute", capture)
+    return statements
+
+
+def test_authenticated_requests_reuse_the_principal(client, test_engine, auth_headers):
+    assert client.get("/api/loot/active", headers=auth_headers).status_code == 200
+    queries = _user_queries(
+        test_engine, lambda: [client.get("/api/loot/active", headers=auth_headers) for _ in range(3)]
+    )
+    assert queries == []
+
+    # Handlers returning the full user still load it
+    me = _user_queries(test_engine, lambda: client.get("/api/auth/me", headers=auth_headers))
+    assert len(me) == 1
+
+
+def test_admin_changes_invalidate_the_principal(client, test_user, auth_headers, admin_headers):
+    assert client.get("/api/admin/scheduler", headers=auth_headers).status_code == 403
+
+    response = client.put(f"/api/admin/users/{test_user.id}/role", json={"role": "admin"}, headers=admin_headers)
+    assert response.status_code == 200
+    assert client.get("/api/admin/scheduler", headers=auth_headers).status_code == 200
+
+    assert client.delete(f"/api/admin/users/{test_user.id}", headers=admin_headers).status_code == 200
+    assert client.get("/api/loot/active", headers=auth_headers).status_code == 401
+
+
+def test_lru_bound_and_ttl(test_db, monkeypatch):
+    monkeypatch.setattr(settings, "USER_CACHE_SIZE", 2)
+    for name in ("ann", "bob", "cid"):
+        test_db.add(User(username=name, email=f"{name}@example.com", hashed_password="x"))
+    test_db.commit()
+
+    cache = PrincipalCache()
+    ann = cache.get(test_db, "ann")
+    cache.get(test_db, "bob")
+    assert cache.get(test_db, "ann") is ann      # Hit, ann is now most recent
+    cache.get(test_db, "cid")                     # Evicts bob
+    assert len(cache) == 2 and (cache.hits, cache.misses) == (1, 3)
+    assert cache.get(test_db, "nobody") is None
+
+    later = time.monotonic() + settings.USER_CACHE_TTL + 1
+    monkeypatch.setattr(user_cache.time, "monotonic", lambda: later)
+    assert cache.get(test_db, "ann") == ann and cache.get(test_db, "ann") is not ann
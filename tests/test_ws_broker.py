@@ -0,0 +1,149 @@
+"""
+Tests for cross-worker WebSocket fan-out via brokers
+"""
+import asyncio
+import json
+import time
+from types import SimpleNamespace
+
+from app.ws import broker as broker_module
+from app.ws.broker import Broker, InProcessBroker, PostgresBroker, create_broker
+from app.ws.connection_manager import ConnectionManager
+
+
+class FakeWebSocket:
+    """Minimal stand-in for a connected starlette WebSocket"""
+
+    def __init__(self):
+        self.client_state = SimpleNamespace(name="CONNECTED")
+        self.application_state = SimpleNamespace(name="CONNECTED")
+        self.sent = []
+
+    async def send_json(self, message):
+        self.sent.append(message)
+
+
+class LoopbackBroker(Broker):
+    """Distributed broker that forwards envelopes to peer brokers in-memory"""
+
+    is_distributed = True
+
+    def __init__(self, bus):
+        super().__init__()
+        self.bus = bus
+        bus.append(self)
+
+    async def publish(self, envelope):
+        for broker in self.bus:
+            await broker._dispatch(dict(envelope))
+
+
+def _two_workers():
+    bus = []
+    worker_a = ConnectionManager(LoopbackBroker(bus))
+    worker_b = ConnectionManager(LoopbackBroker(bus))
+    return worker_a, worker_b
+
+
+def test_default_broker_is_in_process():
+    assert isinstance(create_broker(), InProcessBroker)
+
+
+def test_in_process_broadcast_reaches_local_sockets():
+    async def scenario():
+        manager = ConnectionManager()
+        await manager.start()
+        ws1, ws2 = FakeWebSocket(), FakeWebSocket()
+        manager.active_connections = {1: {ws1}, 2: {ws2}}
+        await manager.broadcast({"event_type": "test"}, exclude_user=1)
+        await manager.stop()
+        return ws1, ws2
+
+    ws1, ws2 = asyncio.run(scenario())
+    assert ws1.sent == []
+    assert ws2.sent == [{"event_type": "test"}]
+
+
+def test_broadcast_crosses_workers_once():
+    async def scenario():
+        worker_a, worker_b = _two_workers()
+        await worker_a.start()
+        await worker_b.start()
+        ws_a, ws_b = FakeWebSocket(), FakeWebSocket()
+        worker_a.active_connections = {1: {ws_a}}
+        worker_b.active_connections = {2: {ws_b}}
+        await worker_a.broadcast({"event_type": "claim_update"})
+        return ws_a, ws_b
+
+    ws_a, ws_b = asyncio.run(scenario())
+    # Local socket receives the message exactly once (own envelope is skipped)
+    assert ws_a.sent == [{"event_type": "claim_update"}]
+    assert ws_b.sent == [{"event_type": "claim_update"}]
+
+
+def test_personal_message_reaches_user_on_other_worker():
+    async def scenario():
+        worker_a, worker_b = _two_workers()
+        await worker_a.start()
+        await worker_b.start()
+        ws_b, ws_other = FakeWebSocket(), FakeWebSocket()
+        worker_b.active_connections = {7: {ws_b}, 8: {ws_other}}
+        await worker_a.send_personal_message({"event_type": "loot_spawn"}, 7)
+        return ws_b, ws_other
+
+    ws_b, ws_other = asyncio.run(scenario())
+    assert ws_b.sent == [{"event_type": "loot_spawn"}]
+    assert ws_other.sent == []
+
+
+class FakePgConnection:
+    """psycopg2 connection stand-in: fails on poll or delivers one notification"""
+
+    def __init__(self, fail=False, payload=None):
+        self.fail = fail
+        self.payload = payload
+        self.notifies = []
+        self.closed = False
+
+    def poll(self):
+        if self.fail:
+            raise ConnectionError("server closed the connection unexpectedly")
+        if self.payload is not None:
+            self.notifies.append(SimpleNamespace(payload=self.payload))
+            self.payload = None
+
+    def close(self):
+        self.closed = True
+
+
+def test_postgres_listener_reconnects_after_connection_loss(monkeypatch):
+    envelope = {"kind": "broadcast", "origin": "other-worker", "message": {"event_type": "claim_update"}}
+    connections = [FakePgConnection(fail=True), FakePgConnection(payload=json.dumps(envelope))]
+    opened = list(connections)
+
+    def fake_select(readers, writers, errors, timeout):
+        time.sleep(0.01)
+        return readers, [], []
+
+    monkeypatch.setattr(broker_module, "RECONNECT_MIN_DELAY", 0.01)
+    monkeypatch.setattr(broker_module.select, "select", fake_select)
+
+    async def scenario():
+        received = []
+
+        async def on_message(message):
+            received.append(message)
+
+        broker = PostgresBroker("postgresql://claim@localhost/claim")
+        monkeypatch.setattr(broker, "_connect_listener", lambda: connections.pop(0))
+        monkeypatch.setattr(broker, "_connect", lambda: FakePgConnection())
+        await broker.start(on_message)
+        for _ in range(200):
+            if received:
+                break
+            await asyncio.sleep(0.01)
+        await broker.stop()
+        return received
+
+    assert asyncio.run(scenario()) == [envelope]
+    assert opened[0].closed
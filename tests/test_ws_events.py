@@ -0,0 +1,132 @@
+"""
+Tests for pushed WebSocket events (timer wheel, cooldown and stats pushes)
+"""
+import asyncio
+import time
+
+import pytest
+
+from app.config import settings
+from app.services import progression_service
+from app.ws import events
+from app.ws.timer_wheel import TimerWheel
+
+
+def test_timer_wheel_pops_due_timers_only():
+    wheel = TimerWheel(tick_seconds=1.0, slots=8)
+    now = 1000.0
+    wheel.schedule("a", now, "payload-a")
+    # Same slot one revolution later: must stay scheduled
+    wheel.schedule("b", now + 8, "payload-b")
+
+    slot = wheel._slot_for(now)
+    assert wheel.pop_due(now, slot) == [("a", "payload-a")]
+    assert len(wheel) == 1
+    assert wheel.pop_due(now + 8, slot) == [("b", "payload-b")]
+
+
+def test_timer_wheel_reschedule_replaces_and_cancel():
+    wheel = TimerWheel(tick_seconds=1.0, slots=8)
+    wheel.schedule("a", 1000.0, 1)
+    wheel.schedule("a", 1003.0, 2)
+    assert len(wheel) == 1
+    assert wheel.pop_due(1000.0, wheel._slot_for(1000.0)) == []
+
+    wheel.cancel("a")
+    assert len(wheel) == 0
+    assert wheel.pop_due(1003.0, wheel._slot_for(1003.0)) == []
+
+
+def test_timer_wheel_runs_callback():
+    fired = []
+
+    async def callback(key, payload):
+        fired.append((key, payload))
+
+    async def run():
+        wheel = TimerWheel(tick_seconds=0.01, slots=16)
+        wheel.start(callback)
+        wheel.schedule("k", time.time() + 0.02, "p")
+        await asyncio.sleep(0.1)
+        await wheel.stop()
+
+    asyncio.run(run())
+    assert fired == [("k", "p")]
+
+
+def test_timer_wheel_fires_timer_due_later_in_current_tick(monkeypatch):
+    from types import SimpleNamespace
+    from app.ws import timer_wheel
+
+    # Clock readings of _run: start, then one per tick
+    readings = iter([100.000, 100.012, 100.021])
+    monkeypatch.setattr(timer_wheel, "time", SimpleNamespace(time=lambda: next(readings, 100.021)))
+    fired = []
+
+    async def callback(key, payload):
+        fired.append(key)
+
+    async def run():
+        wheel = TimerWheel(tick_seconds=0.01, slots=16)
+        # Same tick as the 100.012 reading, but not yet due at that moment
+        wheel.schedule("k", 100.015)
+        wheel.start(callback)
+        await asyncio.sleep(0.1)
+        await wheel.stop()
+
+    asyncio.run(run())
+    assert fired == ["k"]
+
+
+@pytest.fixture
+def pushed(monkeypatch):
+    """Capture personal messages and pretend user 7 is connected"""
+    messages = []
+
+    async def send_personal_message(message, user_id):
+        messages.append((user_id, message))
+
+    monkeypatch.setattr(events.manager, "send_personal_message", send_personal_message)
+    monkeypatch.setattr(events.manager, "active_connections", {7: set()})
+    monkeypatch.setattr(events, "wheel", TimerWheel())
+    return messages
+
+
+def test_spot_logged_pushes_and_schedules_transitions(pushed):
+    async def run():
+        events.spot_logged(7, 42)
+        await asyncio.sleep(0)
+        key, (status, ready_at) = next(
+            (k, v[2]) for k, v in events.wheel._timers.items()
+        )
+        assert key == (7, 42)
+        assert status == "partial"
+        assert ready_at == pytest.approx(time.time() + settings.LOG_COOLDOWN, abs=2)
+
+        # partial fires and schedules ready
+        await events._on_timer(key, (status, ready_at))
+        assert events.wheel._timers[key][2] == ("ready", ready_at)
+
+    asyncio.run(run())
+    statuses = [message["data"]["cooldown_status"] for _, message in pushed]
+    assert statuses == ["cooldown", "partial"]
+    assert all(user_id == 7 for user_id, _ in pushed)
+
+
+def test_spot_logged_ignores_disconnected_users(pushed):
+    async def run():
+        events.spot_logged(8, 42)
+        events.stats_changed(8)
+        await asyncio.sleep(0)
+
+    asyncio.run(run())
+    assert pushed == []
+    assert len(events.wheel) == 0
+
+
+def test_get_user_stats(test_db, test_user):
+    stats = progression_service.get_user_stats(test_db, test_user)
+    assert stats["level"] == 1
+    assert stats["total_logs"] == 0
+    assert stats["inventory_count"] == 0
+    assert stats["xp_to_next_level"] > 0
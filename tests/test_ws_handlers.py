@@ -0,0 +1,108 @@
+"""
+Tests for the WebSocket endpoint
+"""
+import asyncio
+from contextlib import contextmanager
+
+import pytest
+from sqlalchemy.orm import sessionmaker
+
+from app import database
+from app.models import Track
+from app.services.auth_service import create_access_token
+from app.ws import handlers, rpc
+
+
+@pytest.fixture
+def ws_sessions(test_engine, monkeypatch):
+    """Route the WebSocket layer's short-lived sessions to the test database"""
+    TestingSessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=test_engine)
+    opened = []
+
+    @contextmanager
+    def scope():
+        db = TestingSessionLocal()
+        opened.append(db)
+        try:
+            yield db
+            db.commit()
+        finally:
+            db.close()
+
+    # No async engine on in-memory SQLite: run_db uses session_scope in the threadpool
+    monkeypatch.setattr(database, "session_scope", scope)
+    return opened
+
+
+def test_authenticate_rejects_invalid_token(ws_sessions):
+    assert asyncio.run(handlers._authenticate("not-a-jwt")) is None
+    # Token is rejected before any session is opened
+    assert ws_sessions == []
+
+
+def test_authenticate_releases_session(ws_sessions, test_user):
+    token = create_access_token({"sub": test_user.username})
+    assert asyncio.run(handlers._authenticate(token)) == (test_user.id, test_user.username)
+    assert len(ws_sessions) == 1
+
+
+def test_websocket_connect_does_not_hold_session(client, ws_sessions, test_user):
+    token = create_access_token({"sub": test_user.username})
+    with client.websocket_connect(f"/ws?token={token}") as ws:
+        welcome = ws.receive_json()
+        assert welcome["event_type"] == "connected"
+        assert welcome["data"]["user_id"] == test_user.id
+
+        ws.send_json({"event_type": "ping"})
+        assert ws.receive_json()["event_type"] == "pong"
+
+        # Only the authentication session was opened while the socket is live
+        assert len(ws_sessions) == 1
+
+
+def test_rpc_unknown_method(ws_sessions, test_user):
+    reply = asyncio.run(rpc.handle_rpc({"id": "1", "method": "nope"}, test_user.id))
+    assert reply == {
+        "event_type": "rpc_result",
+        "id": "1",
+        "ok": False,
+        "error": {"code": 404, "message": "Unknown method: nope"},
+    }
+
+
+def test_rpc_validation_error(ws_sessions, test_user):
+    reply = asyncio.run(rpc.handle_rpc({"id": "2", "method": "log.create", "params": {"spot_id": 1}}, test_user.id))
+    assert reply["ok"] is False
+    assert reply["error"]["code"] == 422
+
+
+def test_rpc_track_point_checks_ownership(ws_sessions, test_db, test_user, test_admin):
+    track = Track(user_id=test_admin.id, is_active=True)
+    test_db.add(track)
+    test_db.commit()
+
+    params = {"track_id": track.id, "latitude": 48.1, "longitude": 11.5}
+    reply = asyncio.run(rpc.handle_rpc({"id": "3", "method": "track.point", "params": params}, test_user.id))
+    assert reply["error"]["code"] == 403
+
+
+def test_rpc_over_websocket(client, ws_sessions, test_db, test_user):
+    track = Track(user_id=test_user.id, is_active=False)
+    test_db.add(track)
+    test_db.commit()
+
+    token = create_access_token({"sub": test_user.username})
+    with client.websocket_connect(f"/ws?token={token}") as ws:
+        ws.receive_json()
+        ws.send_json({
+            "event_type": "rpc",
+            "id": "abc",
+            "method": "track.point",
+            "params": {"track_id": track.id, "latitude": 48.1, "longitude": 11.5},
+        })
+        reply = ws.receive_json()
+
+    assert reply["event_type"] == "rpc_result"
+    assert reply["id"] == "abc"
+    assert reply["ok"] is False
+    assert reply["error"] == {"code": 404, "message": "Track not found or not active"}